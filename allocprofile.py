@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""Allocation profiling of the curve arithmetic and the protocols on
+top of it, with a report per operation.
+
+    with allocprofile.Profile() as prof:
+        ecdsa.ecdsa_verify_digest(obj, public, digest, sig)
+    prof.report()
+
+While a Profile is active the point additions and doublings of every
+curve class, the curve.mul* functions, sqrt_modp and the protocol
+calls (ecdsa_sign, ecdsa_verify, ecdh, keygen, eddsa_sign,
+eddsa_verify) are wrapped. What is allocated inside each call is
+attributed to it, inclusive of what it calls and exclusive of the
+other wrapped operations it calls.
+
+There are two modes.
+
+  tracemalloc: bytes, from tracemalloc.get_traced_memory(). The peak
+               of an operation is the most one call raised the peak
+               of traced memory. A call that stays under a peak set
+               earlier shows 0.
+  count: the number of integers and points created. This needs the
+         code to run on costmodel.instrument() curves, which create
+         their integers as costmodel.Counted. There is no peak, the
+         report has the most one call created instead.
+
+The default is tracemalloc if it can be imported.
+
+XXX: tracemalloc is Python 3.4 and later (or a patched 2.7), so here it
+is usually the count mode. The count is deterministic, which is what the
+allocation test wants anyway.
+"""
+
+import sys
+
+import asymmetric
+import costmodel
+import curve
+import ecdh
+import ecdsa
+import eddsa
+import numbertheory
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+def _targets():
+    """(owner, attribute, name to report it as)."""
+
+    targets = []
+    for cls in (curve.ShortWeierstrass, curve.MontgomeryCurve,
+                curve.EdwardsCurve, curve.TwistedEdwardsCurve):
+        for attr in sorted(vars(cls)):
+            if attr.startswith(('add_points', 'double_point', 'diffadd_points')):
+                targets.append((cls, attr, '%s.%s' % (cls.__name__, attr)))
+
+    for attr in sorted(vars(curve)):
+        if attr.startswith(('mul', '_mul2')):
+            targets.append((curve, attr, 'curve.' + attr))
+
+    targets += [
+        (numbertheory, 'sqrt_modp', 'sqrt_modp'),
+        (ecdsa, '_sign_hash', 'ecdsa_sign'),
+        (ecdsa, '_verify_hash', 'ecdsa_verify'),
+        (ecdh, 'ecdh', 'ecdh'),
+        (asymmetric.ECCBase, 'generate_key_pair', 'keygen'),
+        (eddsa.Ed25519, 'sign', 'eddsa_sign'),
+        (eddsa.Ed25519, 'signature', 'eddsa_sign'),
+        (eddsa.SigningKey, '_sign', 'eddsa_sign'),
+        (eddsa.Ed25519, 'checkvalid', 'eddsa_verify'),
+        (eddsa.Ed25519, 'checkvalid_fast', 'eddsa_verify'),
+        (eddsa.VerifyingKey, '_verify', 'eddsa_verify'),
+        ]
+    return targets
+
+
+class _Frame(object):
+    __slots__ = ['start', 'children', 'mark']
+
+    def __init__(self, start, mark):
+        self.start = start
+        self.children = 0
+        # The peak of traced memory at the start.
+        self.mark = mark
+
+
+class Profile(object):
+    def __init__(self, mode=None):
+        if mode is None:
+            mode = 'tracemalloc' if tracemalloc is not None else 'count'
+        if mode == 'tracemalloc' and tracemalloc is None:
+            raise ValueError('tracemalloc not available')
+        if mode not in ('tracemalloc', 'count'):
+            raise ValueError('unknown mode %r' % mode)
+
+        self.mode = mode
+        self.unit = 'bytes' if mode == 'tracemalloc' else 'objects'
+
+        # name: [calls, inclusive, exclusive]
+        self.stats = {}
+        # Of traced memory, tracemalloc mode only.
+        self.peak = None
+        # name: peak (tracemalloc) or most created by one call (count)
+        self.peaks = {}
+
+        self._stack = []
+        self._patched = []
+        self._objects = 0
+
+    def _now(self):
+        if self.mode == 'tracemalloc':
+            return tracemalloc.get_traced_memory()[0]
+        return costmodel.allocated() + self._objects
+
+    def _mark(self):
+        if self.mode == 'tracemalloc':
+            return tracemalloc.get_traced_memory()[1]
+        return 0
+
+    def _wrap(self, func, name):
+        def wrapper(*args, **kwargs):
+            frame = _Frame(self._now(), self._mark())
+            self._stack.append(frame)
+            result = None
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                self._stack.pop()
+                if type(result) is tuple:
+                    # The point itself.
+                    self._objects += 1
+                total = self._now() - frame.start
+
+                stats = self.stats.setdefault(name, [0, 0, 0])
+                stats[0] += 1
+                stats[1] += total
+                stats[2] += total - frame.children
+                if self._stack:
+                    self._stack[-1].children += total
+
+                if self.mode == 'tracemalloc':
+                    peak = self._mark() - frame.mark
+                else:
+                    peak = total
+                self.peaks[name] = max(self.peaks.get(name, 0), peak)
+            return result
+
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        return wrapper
+
+    def start(self):
+        for owner, attr, name in _targets():
+            original = vars(owner)[attr]
+            wrapper = self._wrap(original, name)
+
+            # Functions imported with from ... import ... are patched
+            # where they were imported too.
+            owners = [owner] + [m for m in sys.modules.values()
+                                if m is not None and m is not owner and
+                                getattr(m, attr, None) is original]
+            for o in owners:
+                self._patched.append((o, attr, original))
+                setattr(o, attr, wrapper)
+
+        if self.mode == 'tracemalloc':
+            tracemalloc.start()
+
+    def stop(self):
+        if self.mode == 'tracemalloc':
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        while self._patched:
+            owner, attr, original = self._patched.pop()
+            setattr(owner, attr, original)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def per_call(self, name):
+        """Inclusive allocations per call of name."""
+
+        calls, inclusive, exclusive = self.stats[name]
+        return float(inclusive) / calls
+
+    def report(self, out=sys.stdout):
+        out.write('%-45s %8s %14s %14s %12s\n' % (
+            'operation', 'calls', '%s/call' % self.unit, 'exclusive',
+            'peak' if self.mode == 'tracemalloc' else 'max/call'))
+        for name, (calls, inclusive, exclusive) in sorted(
+                self.stats.items(), key=lambda item: -item[1][1]):
+            out.write('%-45s %8d %14.1f %14d %12d\n' % (
+                name, calls, float(inclusive) / calls, exclusive, self.peaks[name]))
+        if self.peak is not None:
+            out.write('peak: %d %s\n' % (self.peak, self.unit))
+
+
+def profile(func, mode=None):
+    """Runs func() under a Profile and returns the Profile."""
+
+    with Profile(mode) as prof:
+        func()
+    return prof
+
+
+if __name__ == '__main__':
+    # The costmodel cases run on instrumented curves, so this works in
+    # both modes.
+    for name in sys.argv[1:] or sorted(costmodel.CASES):
+        print name
+        profile(costmodel.CASES[name]()).report()
+        print
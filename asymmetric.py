@@ -3,8 +3,11 @@
 
 import random
 
-import field
+import codec
 import curve
+import field
+import registry
+import tablecache
 import util
 import ecdh
 import util
@@ -15,18 +18,125 @@ class ECCBase(object):
     order = None
     base_point = None
 
+    # field.ScalarField of the order.
+    scalars = None
+
+    # Registry name of the precomputed base point table, if there is one.
+    base_table_name = None
+
     def generate_private_key(self, seed):
-        return util.randint(1, self.order - 1)
+        return self.generate_private_keys(1)[0]
+
+    def generate_private_keys(self, count):
+        """count random private keys, with the random bytes for all of
+        them read at once."""
+
+        return util.scalars(count, self.order)
+
+    def scalarmult(self, n, P):
+        """Multiply the affine point P by n, returns an affine point.
+
+        Subclasses override this to use faster coordinates.
+        """
+
+        return curve.mul(n, P, self.curve)
+
+    def scalarmult2(self, n1, P1, n2, P2):
+        """n1*P1 + n2*P2 for affine points, returns an affine point."""
+
+        return self.curve.add_points(self.scalarmult(n1, P1),
+                                     self.scalarmult(n2, P2))
+
+    def scalarmult_base(self, n):
+        """n times the base point. Subclasses with a base_table_name
+        override this to use the table."""
+
+        return self.scalarmult(n, self.base_point)
+
+    def base_table(self):
+        return registry.get(self.base_table_name)
 
     def derive_public_key(self, private):
-        return curve.mul(private, self.base_point, self.curve)
+        return self.scalarmult_base(private)
 
     def generate_key_pair(self, seed):
         private = self.generate_private_key(seed)
-        public = curve.mul(private, self.base_point, self.curve)
+        public = self.scalarmult_base(private)
 
         return (public, private)
 
+    def public_keys(self, privates):
+        """derive_public_key() of every private key. Subclasses override
+        this to keep the points projective and normalise them all with
+        one inversion."""
+
+        return [self.derive_public_key(private) for private in privates]
+
+    def public_key_size(self):
+        return len(self.canonical_binary_form_public(self.base_point))
+
+    def private_key_size(self):
+        return len(self.canonical_binary_form_private(self.order - 1))
+
+    def encode_public_keys(self, publics, buf, offset=0):
+        """Writes the canonical binary forms of publics back to back into
+        buf, starting at offset."""
+
+        size = self.public_key_size()
+        for i, public in enumerate(publics):
+            pos = offset + i * size
+            buf[pos:pos + size] = self.canonical_binary_form_public(public)
+
+    def encode_private_keys(self, privates, buf, offset=0):
+        size = self.private_key_size()
+        for i, private in enumerate(privates):
+            pos = offset + i * size
+            buf[pos:pos + size] = self.canonical_binary_form_private(private)
+
+    def generate_key_pairs(self, count, processes=None, public_buf=None, private_buf=None):
+        """count new key pairs as (public_buf, private_buf), each the
+        canonical binary forms back to back: key i is at i *
+        public_key_size() and i * private_key_size().
+
+        The buffers are allocated if not given (any bytearray or writable
+        mmap large enough will do). With processes, the keys are made
+        in that many worker processes.
+        """
+
+        if public_buf is None:
+            public_buf = bytearray(count * self.public_key_size())
+        if private_buf is None:
+            private_buf = bytearray(count * self.private_key_size())
+        if len(public_buf) < count * self.public_key_size() or \
+                len(private_buf) < count * self.private_key_size():
+            raise ValueError('buffer too small')
+
+        if processes:
+            # Not at the top, so importing this module does not import
+            # multiprocessing.
+            import workers
+
+            chunks = [count // processes + (i < count % processes) for i in xrange(processes)]
+            pool = workers.pool(processes, filter(None, [self.base_table_name]))
+            try:
+                results = pool.map(_generate_key_pairs, [(self, n) for n in chunks if n])
+            finally:
+                pool.close()
+                pool.join()
+
+            public_pos = private_pos = 0
+            for publics, privates in results:
+                public_buf[public_pos:public_pos + len(publics)] = publics
+                private_buf[private_pos:private_pos + len(privates)] = privates
+                public_pos += len(publics)
+                private_pos += len(privates)
+        else:
+            privates = self.generate_private_keys(count)
+            self.encode_private_keys(privates, private_buf)
+            self.encode_public_keys(self.public_keys(privates), public_buf)
+
+        return (public_buf, private_buf)
+
     def canonical_binary_form_private(self, private):
         raise NotImplementedError()
 
@@ -40,13 +150,48 @@ class ECCBase(object):
         raise NotImplementedError()
 
 
+def _generate_key_pairs(args):
+    # Run in the workers of generate_key_pairs().
+    curve_obj, count = args
+    public_buf, private_buf = curve_obj.generate_key_pairs(count)
+    return str(public_buf), str(private_buf)
+
+
+def _public_keys_extended(obj, privates):
+    c = obj.curve
+    G = c.affine_to_extended(obj.base_point)
+
+    return c.extended_to_affine_batch([curve.mul_extended(private, G, c) for private in privates])
+
+
 class ECC_Curve25519(ECCBase):
-    curve = curve.MontgomeryCurve(486662, 1, field.Field(2**255 - 19))
+    curve = registry.Lazy('curve25519')
+    scalars = registry.Lazy('curve25519.scalars')
     order = 2**252 + 27742317777372353535851937790883648493L
     base_point = (9L, 14781619447589544791020593568409986887264606134616475288964881837755586237401L)
 
-    def generate_private_key(self, seed):
-        return 2**254 + 8 * util.randint(0, 2**251 - 1)
+    def generate_private_keys(self, count):
+        return [self.scalars.clamp(util.random_bytes(32), 3, 254) for i in xrange(count)]
+
+    def public_keys(self, privates):
+        # x-only ladders, y recovered at the end.
+        c = self.curve
+        P = self.base_point
+        P_xy = c.affine_to_xy(P)
+
+        points = []
+        for private in privates:
+            Q, R = curve.mul_xy(private, P_xy, c)
+            points.append(c.recover_y_xy(P, Q, R))
+
+        Zinvs = c.gf.inv_batch([Z for X, Y, Z in points])
+        return [(c.gf.mul(X, Zinv), c.gf.mul(Y, Zinv)) for (X, Y, Z), Zinv in zip(points, Zinvs)]
+
+    def encode_public_keys(self, publics, buf, offset=0):
+        codec.encode_ints([x for x, y in publics], 32, buf, offset)
+
+    def encode_private_keys(self, privates, buf, offset=0):
+        codec.encode_ints(privates, 32, buf, offset)
 
     def canonical_binary_form_private(self, private):
         return util.int2le(private, 32)
@@ -97,30 +242,244 @@ class ECC_Curve25519(ECCBase):
 
 
 class ECC_Ed25519(ECC_Curve25519):
-    curve = curve.TwistedEdwardsCurve(
-        -1,
-         field.Field(2**255 - 19).div(-121665, 121666),
-         field.Field(2**255 - 19))
+    curve = registry.Lazy('ed25519')
     base_point = (15112221349535400772501151409588531511454012693041857206046113283949847762202L, 46316835694926478169428394003475163141307993866256225615783033603165251855960L)
 
+    def canonical_binary_form_public(self, public):
+        """The Ed25519 encoding: y little endian, the low bit of x on top."""
+
+        x, y = public
+        return util.int2le(((x & 1) << 255) | y, 32)
+
+    def public_keys(self, privates):
+        return _public_keys_extended(self, privates)
+
+    def encode_public_keys(self, publics, buf, offset=0):
+        codec.encode_edwards_points(publics, 32, buf, offset)
+
+    def binary_to_public(self, public_bin):
+        if len(public_bin) != 32:
+            raise ValueError('invalid Ed25519 point encoding')
+
+        v = util.le2int(public_bin)
+        y = v & ((1 << 255) - 1)
+        x = self.curve.recover_x(y, v >> 255)
+        if x is None or y >= self.curve.gf.p:
+            raise ValueError('point not on curve')
+
+        return (x, y)
+
+
+class ECCWeierstrassBase(ECCBase):
+    """Short Weierstrass curves, multiplied using the complete
+    projective formulas so there are no special cases in the loop."""
+
+    def scalarmult(self, n, P):
+        return self.curve.projective_to_affine(
+            curve.mul_complete(n, self.curve.affine_to_projective(P), self.curve))
+
+    def scalarmult2(self, n1, P1, n2, P2):
+        return self.curve.projective_to_affine(
+            curve.mul2_complete(n1, self.curve.affine_to_projective(P1),
+                                n2, self.curve.affine_to_projective(P2),
+                                self.curve))
+
+    def build_base_table(self):
+        """[2^i]G in projective coordinates with Z = 1, loaded from the
+        table cache if possible."""
+
+        c = self.curve
+        nbits = util.count_bits(self.order)
+
+        def build():
+            table = curve.precompute(c.affine_to_projective(self.base_point), nbits,
+                                     c.double_point_complete)
+            zinv = c.gf.inv_batch([Z for X, Y, Z in table])
+            return [(c.gf.mul(X, zi), c.gf.mul(Y, zi)) for (X, Y, Z), zi in zip(table, zinv)]
+
+        return tablecache.cached_table(self.base_table_name, c, self.base_point, nbits,
+                                       build, curve.PointMap(c, 'affine_to_projective'))
 
-class ECC_NISTP256(ECCBase):
-    curve = curve.ShortWeierstrass(-3, 41058363725152142129326129780047268409114441015993725554835256314039467401291L, field.Field(2**256 - 2**224 + 2**192 + 2**96 - 1))
+    def scalarmult_base(self, n):
+        # The base point has prime order so n can be reduced.
+        return self.curve.projective_to_affine(
+            curve.mul_precomputed(self.scalars.reduce(n), self.base_table(),
+                                  self.curve.neutral_point_projective(),
+                                  self.curve.add_points_complete))
+
+    def public_keys(self, privates):
+        c = self.curve
+        table = self.base_table()
+
+        return c.projective_to_affine_batch([
+            curve.mul_precomputed(self.scalars.reduce(private), table,
+                                  c.neutral_point_projective(), c.add_points_complete)
+            for private in privates])
+
+    def encode_public_keys(self, publics, buf, offset=0):
+        # Uncompressed, 0x04 || x || y as one integer.
+        size = self.byte_size()
+        codec.encode_ints([(4 << 16 * size) | (x << 8 * size) | y for x, y in publics],
+                          1 + 2 * size, buf, offset, 'big')
+
+    def encode_private_keys(self, privates, buf, offset=0):
+        codec.encode_ints(privates, self.private_key_size(), buf, offset, 'big')
+
+    def byte_size(self):
+        return (util.count_bits(self.curve.gf.p) + 7) // 8
+
+    def canonical_binary_form_private(self, private):
+        return util.int2be(private, (util.count_bits(self.order) + 7) // 8)
+
+    def binary_to_private(self, private_bin):
+        """Raises ValueError unless it is in 1 .. order - 1."""
+
+        private = util.be2int(private_bin)
+        if not 1 <= private < self.order:
+            raise ValueError('private key out of range')
+        return private
+
+    def canonical_binary_form_public(self, public, compressed=False):
+        """SEC1 encoding: 0x04 || x || y, or 0x02/0x03 || x if compressed.
+
+        The point at infinity is not a public key, binary_to_public()
+        rejects its encoding 0x00, so it raises ValueError here too.
+        """
+
+        if public is None:
+            raise ValueError('point at infinity')
+
+        x, y = public
+        size = self.byte_size()
+
+        if compressed:
+            return chr(2 + (y & 1)) + util.int2be(x, size)
+        return '\x04' + util.int2be(x, size) + util.int2be(y, size)
+
+    def binary_to_public(self, public_bin):
+        """Decodes any SEC1 encoding, raises ValueError unless it is a
+        point on the curve."""
+
+        size = self.byte_size()
+        prefix = public_bin[:1]
+
+        if prefix == '\x04' and len(public_bin) == 1 + 2*size:
+            P = (util.be2int(public_bin[1:1+size]), util.be2int(public_bin[1+size:]))
+            if P[0] >= self.curve.gf.p or P[1] >= self.curve.gf.p or \
+                    not self.curve.point_on_curve(P):
+                raise ValueError('point not on curve')
+            return P
+
+        if prefix in ('\x02', '\x03') and len(public_bin) == 1 + size:
+            return self._decompress(util.be2int(public_bin[1:]), ord(prefix) & 1)
+
+        raise ValueError('invalid SEC1 encoding')
+
+    def binary_to_public_batch(self, buf, count=None, offset=0):
+        """Decodes count compressed points stored back to back (1 + size
+        bytes each) in buf. Raises ValueError for the first invalid one."""
+
+        size = self.byte_size()
+        points = []
+
+        for i, v in enumerate(codec.decode_ints(buf, 1 + size, count, offset, 'big')):
+            prefix = v >> (8 * size)
+            if prefix not in (2, 3):
+                raise ValueError('invalid SEC1 encoding at %d' % i)
+            try:
+                points.append(self._decompress(v & ((1 << (8 * size)) - 1), prefix & 1))
+            except ValueError:
+                raise ValueError('point not on curve at %d' % i)
+
+        return points
+
+    def _decompress(self, x, sign):
+        gf = self.curve.gf
+
+        if x >= gf.p:
+            raise ValueError('point not on curve')
+
+        y = gf.sqrt(x**3 + self.curve.a*x + self.curve.b)
+        if y is None:
+            raise ValueError('point not on curve')
+        if y & 1 != sign:
+            # y = 0 has no odd twin.
+            if y == 0:
+                raise ValueError('point not on curve')
+            y = gf.p - y
+
+        return (x, y)
+
+
+class ECC_NISTP256(ECCWeierstrassBase):
+    curve = registry.Lazy('nistp256')
+    scalars = registry.Lazy('nistp256.scalars')
+    base_table_name = 'nistp256.base_table'
     base_point = (48439561293906451759052585252797914202762949526041747995844080717082404635286L, 36134250956749795798585127919587881956611106672985015071877198253568414405109L)
     order = 2**256 - 2**224 + 2**192 - 89188191075325690597107910205041859247
 
 
-class ECC_NISTP384(ECCBase):
-    curve = curve.ShortWeierstrass(-3, 27580193559959705877849011840389048093056905856361568521428707301988689241309860865136260764883745107765439761230575, field.Field(2**384 - 2**128 - 2**96 + 2**32 - 1))
+class ECC_NISTP384(ECCWeierstrassBase):
+    curve = registry.Lazy('nistp384')
+    scalars = registry.Lazy('nistp384.scalars')
+    base_table_name = 'nistp384.base_table'
     base_point = (26247035095799689268623156744566981891852923491109213387815615900925518854738050089022388053975719786650872476732087, 8325710961489029985546751289520108179287853048861315594709205902480503199884419224438643760392947333078086511627871)
     order = 2**384 - 1388124618062372383947042015309946732620727252194336364173
 
 
 class ECC_Curve41417(ECCBase):
-    curve = curve.EdwardsCurve(1, 3617, field.Field(2**414 - 17))
+    curve = registry.Lazy('curve41417')
+    scalars = registry.Lazy('curve41417.scalars')
     order = 2**411 - 33364140863755142520810177694098385178984727200411208589594759
     base_point = (17319886477121189177719202498822615443556957307604340815256226171904769976866975908866528699294134494857887698432266169206165, 34)
 
-    def generate_private_key(self, seed):
+    def generate_private_keys(self, count):
         # As Curve25519 this one has a cofactor of 8.
-        return 2**413 + 8 * util.randint(0, 2**410 - 1)
+        return [self.scalars.clamp(util.random_bytes(52), 3, 413) for i in xrange(count)]
+
+    def scalarmult(self, n, P):
+        # Avoid an inversion per addition over the 414-bit field.
+        return self.curve.extended_to_affine(
+            curve.mul_extended(n, self.curve.affine_to_extended(P), self.curve))
+
+    def public_keys(self, privates):
+        return _public_keys_extended(self, privates)
+
+    # As Ed25519, 52 bytes.
+
+    def canonical_binary_form_private(self, private):
+        return util.int2le(private, 52)
+
+    def canonical_binary_form_public(self, public):
+        x, y = public
+        return util.int2le(((x & 1) << 415) | y, 52)
+
+    def binary_to_private(self, private_bin):
+        return util.le2int(private_bin)
+
+    def binary_to_public(self, public_bin):
+        if len(public_bin) != 52:
+            raise ValueError('invalid Curve41417 point encoding')
+
+        v = util.le2int(public_bin)
+        y = v & ((1 << 415) - 1)
+        x = self.curve.recover_x(y, v >> 415)
+        if x is None or y >= self.curve.gf.p:
+            raise ValueError('point not on curve')
+
+        return (x, y)
+
+    def encode_public_keys(self, publics, buf, offset=0):
+        codec.encode_edwards_points(publics, 52, buf, offset)
+
+    def encode_private_keys(self, privates, buf, offset=0):
+        codec.encode_ints(privates, 52, buf, offset)
+
+
+registry.register('nistp256.base_table', lambda: ECC_NISTP256().build_base_table())
+registry.register('nistp384.base_table', lambda: ECC_NISTP384().build_base_table())
+
+registry.register('curve25519.scalars', lambda: field.ScalarField(ECC_Curve25519.order))
+registry.register('nistp256.scalars', lambda: field.ScalarField(ECC_NISTP256.order))
+registry.register('nistp384.scalars', lambda: field.ScalarField(ECC_NISTP384.order))
+registry.register('curve41417.scalars', lambda: field.ScalarField(ECC_Curve41417.order))
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""Benchmarks for every curve in asymmetric, every coordinate system
+the curve has, and the protocols on top.
+
+    python benchmark.py                      # everything
+    python benchmark.py -k p256 -k ecdsa     # names matching a regex
+    python benchmark.py --json out.json      # save the results
+    python benchmark.py --compare base.json  # flag regressions
+
+Each benchmark is run in a number of samples, each sample a loop of
+calls long enough to time. The result is the mean ops/sec over the
+samples with a 95% confidence interval.
+
+A benchmark is a regression against the baseline when it got more
+than --threshold slower and the confidence intervals don't overlap, so
+noise alone shouldn't trigger it. The exit status is 1 if there is
+one.
+
+The old one-off timings (startup, executor scaling, the key store) are
+run with --extras.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import asymmetric
+import codec
+import curve
+import der
+import ecdh
+import ecdsa
+import eddsa
+import elligator
+import executor
+import field
+import keystore
+import numbertheory
+
+
+def timed(func, repeat):
+    """Returns the average number of seconds per call of func()."""
+
+    start = time.time()
+    for i in xrange(repeat):
+        func()
+    return (time.time() - start) / repeat
+
+
+def report(name, seconds):
+    print '%-40s %10.3f ms' % (name, seconds * 1000)
+
+
+# Statistics
+
+# Two sided 97.5% quantiles of Student's t, by degrees of freedom.
+T_975 = [None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+         2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093,
+         2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045,
+         2.042]
+
+
+def summarize(rates):
+    """Mean, standard deviation and 95% confidence interval of the
+    ops/sec samples rates."""
+
+    n = len(rates)
+    mean = sum(rates) / n
+    if n < 2:
+        return {'ops_per_sec': mean, 'stddev': 0.0, 'ci95': [mean, mean], 'samples': n}
+
+    stddev = math.sqrt(sum((r - mean)**2 for r in rates) / (n - 1))
+    t = T_975[n - 1] if n - 1 < len(T_975) else 1.96
+    half = t * stddev / math.sqrt(n)
+
+    return {'ops_per_sec': mean, 'stddev': stddev, 'ci95': [mean - half, mean + half], 'samples': n}
+
+
+def measure(func, samples=10, min_time=1.0, min_samples=3):
+    """Runs func() for about min_time seconds split over samples and
+    summarizes the ops/sec. Slow functions get fewer samples, but at
+    least min_samples."""
+
+    start = time.time()
+    func()
+    once = max(time.time() - start, 1e-7)
+
+    per_sample = min_time / samples
+    loops = max(1, int(per_sample / once))
+    if loops == 1:
+        samples = max(min_samples, min(samples, int(min_time / once)))
+
+    rates = []
+    for i in xrange(samples):
+        start = time.time()
+        for j in xrange(loops):
+            func()
+        rates.append(loops / max(time.time() - start, 1e-9))
+
+    return summarize(rates)
+
+
+# The benchmarks. Each cases_* function yields (name, function) and
+# does its setup as it goes, so a filtered out benchmark only costs the
+# setup.
+
+CURVES = [
+    ('curve25519', asymmetric.ECC_Curve25519),
+    ('ed25519', asymmetric.ECC_Ed25519),
+    ('p256', asymmetric.ECC_NISTP256),
+    ('p384', asymmetric.ECC_NISTP384),
+    ('curve41417', asymmetric.ECC_Curve41417),
+    ]
+
+# coordinate system: (to, from, add, double, mul)
+COORDINATES = [
+    ('projective', 'affine_to_projective', 'projective_to_affine',
+     'add_points_projective', 'double_point_projective', curve.mul_projective),
+    ('complete', 'affine_to_projective', 'projective_to_affine',
+     'add_points_complete', 'double_point_complete', curve.mul_complete),
+    ('extended', 'affine_to_extended', 'extended_to_affine',
+     'add_points_extended', 'double_point_extended', curve.mul_extended),
+    ('inverted', 'affine_to_inverted', 'inverted_to_affine',
+     'add_points_inverted', 'double_point_inverted', curve.mul_inverted),
+    ]
+
+
+def cases_curve(label, cls):
+    obj = cls()
+    c = obj.curve
+    P = obj.base_point
+    Q = c.double_point(P)
+    k = obj.generate_private_key(None)
+    p = c.gf.p
+
+    yield '%s add affine' % label, lambda: c.add_points(P, Q)
+    yield '%s double affine' % label, lambda: c.double_point(P)
+    yield '%s mul affine' % label, lambda: curve.mul(k, P, c)
+
+    for system, to, back, add, double, mul in COORDINATES:
+        if not hasattr(c, add):
+            continue
+        to, back, add, double = [getattr(c, f) for f in (to, back, add, double)]
+        P1, Q1 = to(P), to(Q)
+
+        # The default arguments bind this iteration's functions.
+        yield '%s add %s' % (label, system), lambda add=add, P1=P1, Q1=Q1: add(P1, Q1)
+        yield '%s double %s' % (label, system), lambda double=double, P1=P1: double(P1)
+        yield '%s mul %s' % (label, system), \
+            lambda to=to, back=back, mul=mul: back(mul(k, to(P), c))
+
+    if hasattr(c, 'double_point_xy'):
+        P1 = c.affine_to_xy(P)
+        yield '%s double xy' % label, lambda: c.double_point_xy(P1)
+        yield '%s mul xy' % label, lambda: curve.mul_xy(k, P1, c)
+
+    yield '%s scalarmult' % label, lambda: obj.scalarmult(k, P)
+    obj.scalarmult_base(k)
+    yield '%s scalarmult_base' % label, lambda: obj.scalarmult_base(k)
+    yield '%s keygen' % label, lambda: obj.generate_key_pair(None)
+    # Per call, so divide by 100 to compare with keygen.
+    yield '%s keygen x100' % label, lambda: obj.generate_key_pairs(100)
+    yield '%s ecdh' % label, lambda: ecdh.ecdh(obj, k, Q)
+
+    square = c.gf.mul(P[1], P[1])
+    yield '%s sqrt_modp' % label, lambda: numbertheory.sqrt_modp(square, p)
+    yield '%s field sqrt' % label, lambda: c.gf.sqrt(square)
+    yield '%s field inverse' % label, lambda: c.gf.mul_inv(P[0])
+
+    values = [P[0] + i for i in xrange(100)]
+    yield '%s field inv_batch (100)' % label, lambda: c.gf.inv_batch(values)
+
+
+def cases_pow():
+    """Builtin pow() against field.addition_chain() for the fixed
+    exponents."""
+
+    for label, cls in CURVES:
+        p = cls.curve.gf.p
+        x = cls.base_point[0]
+
+        for name, e in [('p-2', p - 2), ('(p-1)/2', (p - 1) // 2),
+                        ('(p+1)/4', (p + 1) // 4), ('(p+3)/8', (p + 3) // 8)]:
+            chain = field.addition_chain(e)
+            yield '%s pow %s' % (label, name), lambda e=e: pow(x, e, p)
+            yield '%s chain_pow %s' % (label, name), lambda chain=chain: field.chain_pow(x, chain, p)
+
+
+def cases_elligator():
+    ell = elligator.Elligator2(asymmetric.ECC_Curve25519.curve)
+    r = 12345
+    P = ell.map_random_to_point(r)
+
+    yield 'elligator2 map_random_to_point', lambda: ell.map_random_to_point(r)
+    yield 'elligator2 map_point_to_random', lambda: ell.map_point_to_random(P)
+
+
+def cases_x25519():
+    obj = asymmetric.ECC_Curve25519()
+    privates = obj.generate_private_keys(100)
+    publics = obj.public_keys(privates)[::-1]
+
+    scalars = str(codec.encode_ints(privates, 32))
+    peers = str(codec.encode_ints([P[0] for P in publics], 32))
+    out = bytearray(len(scalars))
+
+    # Both do 100 key agreements per call.
+    yield 'x25519 ecdh.ecdh x100', \
+        lambda: [ecdh.ecdh(obj, k, P) for k, P in zip(privates, publics)]
+    yield 'x25519 x25519_batch x100', lambda: ecdh.x25519_batch(scalars, peers, out)
+
+
+def cases_ecdsa():
+    digest = hashlib.sha256('message').digest()
+
+    for label, cls in [('p256', asymmetric.ECC_NISTP256), ('p384', asymmetric.ECC_NISTP384)]:
+        obj = cls()
+        public, private = obj.generate_key_pair(None)
+        sig = ecdsa.ecdsa_sign_digest(obj, digest, private)
+
+        yield 'ecdsa %s sign' % label, \
+            lambda obj=obj, private=private: ecdsa.ecdsa_sign_digest(obj, digest, private)
+        yield 'ecdsa %s verify' % label, \
+            lambda obj=obj, public=public, sig=sig: ecdsa.ecdsa_verify_digest(obj, public, digest, sig)
+
+
+def cases_eddsa():
+    ed = eddsa.Ed25519()
+    sk = 'benchmark seed'
+    pk = ed.publickey(sk)
+    sig = ed.signature('message', sk, pk)
+    key = eddsa.SigningKey(sk, ed)
+    vk = key.verifying_key()
+
+    yield 'ed25519 publickey', lambda: ed.publickey(sk)
+    yield 'ed25519 signature', lambda: ed.signature('message', sk, pk)
+    yield 'ed25519 SigningKey.sign', lambda: key.sign('message')
+    yield 'ed25519 checkvalid', lambda: ed.checkvalid(sig, 'message', pk)
+    yield 'ed25519 checkvalid_fast', lambda: ed.checkvalid_fast(sig, 'message', pk)
+    yield 'ed25519 VerifyingKey.verify', lambda: vk.verify(sig, 'message')
+
+    ed41417 = eddsa.Ed41417()
+    pub, priv = ed41417.generate_key_pair_from_seed(sk)
+    nonce = ed41417.generate_random_k_from_seed(sk)
+    pk41417 = ed41417.encodepoint(pub)
+    sig41417 = ed41417.sign('message', nonce, pub, priv)
+
+    yield 'ed41417 keygen', lambda: ed41417.generate_key_pair_from_seed(sk)
+    yield 'ed41417 sign', lambda: ed41417.sign('message', nonce, pub, priv)
+    yield 'ed41417 checkvalid', lambda: ed41417.checkvalid(sig41417, 'message', pk41417)
+
+
+def cases_der():
+    sig = (2**255 + 12345, 2**254 + 67890)
+    blob = der.encode_dsa_sig(sig)
+
+    yield 'der encode_dsa_sig', lambda: der.encode_dsa_sig(sig)
+    yield 'der decode_dsa_sig', lambda: der.decode_dsa_sig(blob)
+
+
+def cases():
+    for label, cls in CURVES:
+        for case in cases_curve(label, cls):
+            yield case
+    for group in (cases_pow, cases_elligator, cases_x25519, cases_ecdsa, cases_eddsa, cases_der):
+        for case in group():
+            yield case
+
+
+def run(patterns=(), samples=10, min_time=1.0, out=sys.stdout):
+    """Runs the benchmarks whose name matches any of the regexes
+    patterns (all if there are none). Returns {name: summary}."""
+
+    patterns = [re.compile(p) for p in patterns]
+    results = {}
+
+    for name, func in cases():
+        if patterns and not any(p.search(name) for p in patterns):
+            continue
+        r = results[name] = measure(func, samples, min_time)
+        if out is not None:
+            low, high = r['ci95']
+            out.write('%-40s %12.1f ops/s  +- %4.1f%%\n' % (
+                name, r['ops_per_sec'], 50.0 * (high - low) / r['ops_per_sec']))
+            out.flush()
+
+    return results
+
+
+# Saving and comparing
+
+def save(path, results):
+    data = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.time(),
+        'results': results,
+        }
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def compare(baseline, results, threshold=0.1):
+    """Yields (name, old ops/sec, new ops/sec, regressed) for the
+    benchmarks in both. regressed is True if it got more than threshold
+    slower and the confidence intervals don't overlap."""
+
+    for name in sorted(set(baseline) & set(results)):
+        old, new = baseline[name], results[name]
+        regressed = new['ops_per_sec'] < (1 - threshold) * old['ops_per_sec'] and \
+            new['ci95'][1] < old['ci95'][0]
+        yield name, old['ops_per_sec'], new['ops_per_sec'], regressed
+
+
+# One-off timings, with --extras
+
+STARTUP = """
+import time
+start = time.time()
+import %(module)s
+imported = time.time()
+%(first)s
+print imported - start, time.time() - imported
+"""
+
+
+def bench_startup(repeat=5):
+    """Import time and the latency of the first operation, each in a
+    fresh interpreter so nothing is cached."""
+
+    cases = [
+        ('x25519', 'asymmetric',
+         'asymmetric.ECC_Curve25519().ecdh(2**254 + 8, asymmetric.ECC_Curve25519.base_point)'),
+        ('p256 keygen', 'asymmetric',
+         'asymmetric.ECC_NISTP256().generate_key_pair(None)'),
+        ('ed25519 SigningKey', 'eddsa',
+         'eddsa.SigningKey("seed").sign("message")'),
+        ]
+
+    for name, module, first in cases:
+        script = STARTUP % {'module': module, 'first': first}
+        results = [map(float, subprocess.check_output([sys.executable, '-c', script]).split())
+                   for i in xrange(repeat)]
+
+        report('import %s' % module, sum(r[0] for r in results) / repeat)
+        report('first %s' % name, sum(r[1] for r in results) / repeat)
+
+
+def bench_der(repeat=1000):
+    sig = (2**255 + 12345, 2**254 + 67890)
+    blob = der.encode_dsa_sig(sig)
+    stream = blob * repeat
+
+    report('der encode_dsa_sig', timed(
+        lambda: der.encode_dsa_sig(sig), repeat))
+    report('der decode_dsa_sig', timed(
+        lambda: der.decode_dsa_sig(blob), repeat))
+    report('der iter_dsa_sigs (per sig)', timed(
+        lambda: list(der.iter_dsa_sigs(stream)), 1) / repeat)
+
+
+def bench_executor(count=200, max_processes=None):
+    """Ed25519 verification throughput on 1 to max_processes workers.
+    Efficiency is the speedup over one worker divided by the number of
+    workers."""
+
+    key = eddsa.SigningKey('benchmark seed')
+    items = [(key.pk, m, key.sign(m)) for m in ('message %d' % i for i in xrange(count))]
+
+    base = None
+    for n in xrange(1, (max_processes or multiprocessing.cpu_count()) + 1):
+        with executor.Executor(n) as ex:
+            start = time.time()
+            assert all(ex.verify_ed25519(items))
+            seconds = time.time() - start
+
+        if base is None:
+            base = seconds
+        print '%-40s %10.1f /s  efficiency %.2f' % (
+            'executor verify_ed25519 x%d' % n, count / seconds, base / seconds / n)
+
+
+def bench_keystore(count=100000):
+    directory = tempfile.mkdtemp()
+    try:
+        store = keystore.KeyStore(os.path.join(directory, 'keys'), 'curve25519')
+        keys = [os.urandom(32) for i in xrange(count)]
+
+        ids = []
+        report('keystore append (per key)', timed(
+            lambda: ids.extend(store.append(keys)), 1) / count)
+        report('keystore lookup, uncached (per key)', timed(
+            lambda: [store[kid] for kid in ids[:10000]], 1) / 10000)
+
+        store.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the curves and protocols.')
+    parser.add_argument('-k', '--filter', action='append', default=[],
+                        help='only run benchmarks matching this regex, can be repeated')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    parser.add_argument('--samples', type=int, default=10)
+    parser.add_argument('--min-time', type=float, default=1.0,
+                        help='seconds to spend on each benchmark')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown that counts as a regression, default 0.1')
+    parser.add_argument('--extras', action='store_true',
+                        help='also run the startup, executor and key store timings')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, func in cases():
+            print name
+        return 0
+
+    results = run(args.filter, args.samples, args.min_time)
+
+    if args.json:
+        save(args.json, results)
+
+    status = 0
+    if args.compare:
+        print
+        for name, old, new, regressed in compare(load(args.compare), results, args.threshold):
+            print '%-40s %12.1f -> %12.1f ops/s %+7.1f%%%s' % (
+                name, old, new, 100.0 * (new - old) / old, '  REGRESSION' if regressed else '')
+            if regressed:
+                status = 1
+
+    if args.extras:
+        print
+        bench_startup()
+        bench_executor()
+        bench_keystore()
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
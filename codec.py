@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""Encoding and decoding of arrays of fixed width integers and points.
+
+Everything is converted a block at a time through a single hex string
+instead of byte by byte, and written straight into a caller provided
+bytearray (or anything else supporting slice assignment, such as a
+writable mmap).
+
+    buf = bytearray(32 * len(keys))
+    codec.encode_ints([P[0] for P in keys], 32, buf)
+    xs = codec.decode_ints(buf, 32)
+"""
+
+import binascii
+
+
+# Number of items converted per hex string.
+BLOCK = 4096
+
+
+def encode_ints(values, width, buf=None, offset=0, byteorder='little'):
+    """Writes values as width bytes each into buf starting at offset.
+
+    Returns buf, which is allocated if not given.
+    """
+
+    if buf is None:
+        buf = bytearray(offset + width * len(values))
+
+    if offset + width * len(values) > len(buf):
+        raise ValueError('buffer too small')
+
+    fmt = '%%0%dx' % (2 * width)
+
+    for start in xrange(0, len(values), BLOCK):
+        block = values[start:start + BLOCK]
+
+        if min(block) < 0 or max(block) >> (8 * width):
+            raise ValueError('value does not fit in %d bytes' % width)
+
+        if byteorder == 'little':
+            # The little endian encoding of a sequence is the reversed big
+            # endian encoding of the reversed sequence.
+            data = binascii.unhexlify(fmt * len(block) % tuple(reversed(block)))[::-1]
+        elif byteorder == 'big':
+            data = binascii.unhexlify(fmt * len(block) % tuple(block))
+        else:
+            raise ValueError('unknown byteorder %r' % byteorder)
+
+        pos = offset + width * start
+        buf[pos:pos + len(data)] = data
+
+    return buf
+
+
+def decode_ints(buf, width, count=None, offset=0, byteorder='little'):
+    """Reads count integers of width bytes each from buf starting at
+    offset. By default as many as fit in the rest of buf."""
+
+    if count is None:
+        count = (len(buf) - offset) // width
+
+    if offset + width * count > len(buf):
+        raise ValueError('buffer too small')
+
+    hexwidth = 2 * width
+    result = []
+
+    for start in xrange(0, count, BLOCK):
+        n = min(BLOCK, count - start)
+        data = _view(buf, offset + width * start, width * n)
+
+        if byteorder == 'little':
+            h = binascii.hexlify(data[::-1])
+        elif byteorder == 'big':
+            h = binascii.hexlify(data)
+        else:
+            raise ValueError('unknown byteorder %r' % byteorder)
+
+        block = [int(h[i:i + hexwidth], 16) for i in xrange(0, hexwidth * n, hexwidth)]
+
+        if byteorder == 'little':
+            block.reverse()
+
+        result.extend(block)
+
+    return result
+
+
+def _view(buf, start, length):
+    # buffer() does not take memoryviews in Python 2.
+    if isinstance(buf, memoryview):
+        return buf[start:start + length].tobytes()
+    return buffer(buf, start, length)
+
+
+def encode_edwards_points(points, width, buf=None, offset=0):
+    """Edwards points (x, y) in the Ed25519 format: little endian y with
+    the low bit of x in the top bit."""
+
+    top = 8 * width - 1
+
+    return encode_ints([((x & 1) << top) | y for x, y in points], width, buf, offset)
+
+
+def decode_edwards_points(buf, width, curve, count=None, offset=0):
+    """Inverse of encode_edwards_points(), for a curve with recover_x().
+
+    Raises ValueError if some point is not on the curve.
+    """
+
+    top = 8 * width - 1
+    mask = (1 << top) - 1
+
+    result = []
+    for v in decode_ints(buf, width, count, offset):
+        y = v & mask
+        x = curve.recover_x(y, v >> top)
+        if x is None or y >= curve.gf.p:
+            raise ValueError('point not on curve')
+        result.append((x, y))
+
+    return result
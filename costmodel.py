@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""Counts the field operations of the hot paths, so a change that adds
+an inversion or a multiplication shows up deterministically instead of
+as noise in a benchmark.
+
+The counts are
+
+    M: multiplications
+    S: squarings
+    C: multiplications by a small constant (less than 2^32)
+    I: inversions
+    E: modular exponentiations (square roots, Legendre symbols)
+
+They come from running the ordinary code on an instrumented copy of a
+curve. Its field, parameters and every integer passed to its methods
+are Counted, an int that counts its own multiplications, and the
+results of arithmetic on Counted are Counted again.
+
+    ops = costmodel.measure(lambda: curve.mul(k, P, costmodel.instrument(c)))
+
+test/cost_budgets.json has the budgets the tests check against. Run
+python costmodel.py for the current counts when a change is supposed
+to alter them.
+
+XXX: Only values that have passed through the curve or the field are
+counted. Arithmetic on integers the caller made up itself, like scalars
+or hashes, is free.
+"""
+
+import collections
+import copy
+import json
+import sys
+import types
+
+import asymmetric
+import curve
+import ecdsa
+import eddsa
+import elligator
+import field
+import numbertheory
+
+
+SMALL = 2**32
+
+_counts = collections.defaultdict(int)
+
+# Number of Counted made, for allocprofile.
+_allocated = [0]
+
+
+def reset():
+    _counts.clear()
+
+
+def allocated():
+    return _allocated[0]
+
+
+def counts():
+    return dict(_counts)
+
+
+def measure(func):
+    """The operation counts of func()."""
+
+    reset()
+    func()
+    return counts()
+
+
+def _wrap(name):
+    def op(self, *args):
+        result = getattr(long, name)(self, *args)
+        if type(result) is long:
+            return Counted(result)
+        return result
+    op.__name__ = name
+    return op
+
+
+class Counted(long):
+    """An integer that counts multiplications."""
+
+    def __new__(cls, value=0):
+        _allocated[0] += 1
+        return long.__new__(cls, value)
+
+    def __mul__(self, other):
+        result = long.__mul__(self, other)
+        if result is NotImplemented:
+            return result
+
+        if abs(self) < SMALL or abs(other) < SMALL:
+            _counts['C'] += 1
+        elif self == other:
+            _counts['S'] += 1
+        else:
+            _counts['M'] += 1
+        return Counted(result)
+
+    __rmul__ = __mul__
+
+    def __pow__(self, e, m=None):
+        if m is not None:
+            _counts['E'] += 1
+            return Counted(pow(long(self), long(e), long(m)))
+
+        result = long.__pow__(self, e)
+        if result is NotImplemented or e < 2:
+            return result
+
+        # Square and multiply.
+        _counts['S'] += e.bit_length() - 1
+        _counts['M'] += bin(e).count('1') - 1
+        return Counted(result)
+
+    for name in ['__add__', '__radd__', '__sub__', '__rsub__', '__mod__', '__rmod__',
+                 '__div__', '__rdiv__', '__floordiv__', '__rfloordiv__', '__neg__',
+                 '__lshift__', '__rshift__', '__and__', '__rand__', '__or__', '__ror__']:
+        locals()[name] = _wrap(name)
+    del name
+
+
+def _coerce(value):
+    if type(value) in (int, long):
+        return Counted(value)
+    if type(value) is tuple:
+        return tuple(_coerce(v) for v in value)
+    if type(value) is list:
+        return [_coerce(v) for v in value]
+    return value
+
+
+def _coercing(cls, name):
+    # Looked up on every call, so this sees wrappers put on cls later
+    # (by allocprofile).
+    def method(self, *args, **kwargs):
+        return getattr(cls, name)(self, *[_coerce(a) for a in args], **kwargs)
+    method.__name__ = name
+    return method
+
+
+def _counting_class(cls, extra={}):
+    """A subclass of cls where every method makes Counted of its
+    integer arguments."""
+
+    methods = dict(extra)
+    for name in dir(cls):
+        value = getattr(cls, name)
+        if name not in methods and not name.startswith('__') and \
+                isinstance(value, types.MethodType):
+            methods[name] = _coercing(cls, name)
+
+    return type('Counting' + cls.__name__, (cls,), methods)
+
+
+def _mul_inv(self, n):
+    _counts['I'] += 1
+    return Counted(numbertheory.inverse_of(long(n) % self.p, self.p))
+
+
+CountingField = _counting_class(field.Field, {'mul_inv': _mul_inv})
+
+_classes = {}
+
+
+def instrument(curve_obj):
+    """A copy of the curve curve_obj that counts."""
+
+    cls = type(curve_obj)
+    if cls not in _classes:
+        _classes[cls] = _counting_class(cls)
+
+    c = copy.copy(curve_obj)
+    c.__class__ = _classes[cls]
+    for name, value in vars(c).items():
+        c.__dict__[name] = _coerce(value)
+    c.gf = CountingField(curve_obj.gf.p)
+
+    return c
+
+
+def instrument_ecc(obj):
+    """An instance of obj (an asymmetric.ECCBase, eddsa.Ed25519 etc)
+    working on an instrumented curve."""
+
+    obj = copy.copy(obj)
+    obj.curve = instrument(obj.curve)
+    for name in ('base_point', 'bp'):
+        if hasattr(obj, name):
+            setattr(obj, name, _coerce(getattr(obj, name)))
+
+    return obj
+
+
+# The hot paths and their fixed inputs.
+
+SCALAR = 2**255 - 2**200 + 12345
+
+
+def _x25519():
+    obj = instrument_ecc(asymmetric.ECC_Curve25519())
+    k = 2**254 + (SCALAR & (2**254 - 8))
+    return lambda: obj.ecdh(k, obj.base_point)
+
+
+def _curve_mul(cls, mul, to, back):
+    def run():
+        c = instrument(cls.curve)
+        P = _coerce(cls.base_point)
+        if to is None:
+            return mul(SCALAR, P, c)
+        return getattr(c, back)(mul(SCALAR, getattr(c, to)(P), c))
+    return lambda: run
+
+
+def _ecdsa_verify(cls):
+    plain = cls()
+    digest = '\x42' * 32
+    private = SCALAR % plain.order
+    public = plain.derive_public_key(private)
+    sig = ecdsa.ecdsa_sign_digest(plain, digest, private, k=SCALAR // 3 % plain.order)
+
+    obj = instrument_ecc(plain)
+    return lambda: ecdsa.ecdsa_verify_digest(obj, public, digest, sig)
+
+
+def _checkvalid(method):
+    plain = eddsa.Ed25519()
+    sk = 'cost model'
+    pk = plain.publickey(sk)
+    sig = plain.signature('message', sk, pk)
+
+    ed = instrument_ecc(plain)
+    return lambda: getattr(ed, method)(sig, 'message', pk)
+
+
+def _elligator(direction):
+    ell = elligator.Elligator2(instrument(asymmetric.ECC_Curve25519.curve))
+    r = 12345
+    if direction == 'map_random_to_point':
+        return lambda: ell.map_random_to_point(r)
+
+    P = elligator.Elligator2(asymmetric.ECC_Curve25519.curve).map_random_to_point(r)
+    return lambda: ell.map_point_to_random(P)
+
+
+# name: function returning the function to count
+CASES = {
+    'curve.mul p256': _curve_mul(asymmetric.ECC_NISTP256, curve.mul, None, None),
+    'curve.mul_projective p256': _curve_mul(
+        asymmetric.ECC_NISTP256, curve.mul_projective, 'affine_to_projective', 'projective_to_affine'),
+    'curve.mul_complete p256': _curve_mul(
+        asymmetric.ECC_NISTP256, curve.mul_complete, 'affine_to_projective', 'projective_to_affine'),
+    'curve.mul_extended ed25519': _curve_mul(
+        asymmetric.ECC_Ed25519, curve.mul_extended, 'affine_to_extended', 'extended_to_affine'),
+    'ecdsa_verify p256': lambda: _ecdsa_verify(asymmetric.ECC_NISTP256),
+    'ecdsa_verify p384': lambda: _ecdsa_verify(asymmetric.ECC_NISTP384),
+    'Ed25519.checkvalid': lambda: _checkvalid('checkvalid'),
+    'Ed25519.checkvalid_fast': lambda: _checkvalid('checkvalid_fast'),
+    'x25519': _x25519,
+    'elligator2 map_random_to_point': lambda: _elligator('map_random_to_point'),
+    'elligator2 map_point_to_random': lambda: _elligator('map_point_to_random'),
+    }
+
+
+def measure_all(names=None):
+    return dict((name, measure(CASES[name]())) for name in (names or CASES))
+
+
+if __name__ == '__main__':
+    json.dump(measure_all(sys.argv[1:]), sys.stdout, indent=2, sort_keys=True, separators=(',', ': '))
+    print
@@ -5,10 +5,34 @@ from field import Field
 from numbertheory import sqrt_modp
 
 
+class PointMap(object):
+    """The method obj.name as a function. Unlike a bound method or a
+    closure this can be pickled, so it can be sent to another process."""
+
+    def __init__(self, obj, name):
+        self.obj = obj
+        self.name = name
+
+    def __call__(self, *args):
+        return getattr(self.obj, self.name)(*args)
+
+    def __repr__(self):
+        return 'PointMap(%r, %r)' % (self.obj, self.name)
+
+
 class Curve(object):
     pass
 
 
+def _select_root(roots, sign):
+    """Picks the square root x with x & 1 == sign from sqrt_modp()."""
+
+    for x in roots:
+        if x & 1 == sign:
+            return x
+    return None
+
+
 class ShortWeierstrass(Curve):
     """An elliptic curve on the form
 
@@ -50,7 +74,8 @@ class ShortWeierstrass(Curve):
     def projective_to_affine(self, P1):
         X, Y, Z = P1
 
-        if P1 == self.neutral_point_projective():
+        # Any (0:Y:0) is the neutral point, not only (0:1:0).
+        if Z % self.gf.p == 0:
             return None
 
         x = self.gf.div(X, Z)
@@ -58,6 +83,22 @@ class ShortWeierstrass(Curve):
 
         return (x, y)
 
+    def projective_to_affine_batch(self, points):
+        """projective_to_affine() of every point, with one inversion."""
+
+        p = self.gf.p
+        finite = [P for P in points if P[2] % p]
+        Zinvs = iter(self.gf.inv_batch([Z for X, Y, Z in finite]))
+
+        result = []
+        for X, Y, Z in points:
+            if Z % p == 0:
+                result.append(None)
+            else:
+                Zinv = next(Zinvs)
+                result.append((self.gf.mul(X, Zinv), self.gf.mul(Y, Zinv)))
+        return result
+
     def add_points_projective(self, P1, P2):
         X1, Y1, Z1 = P1
         X2, Y2, Z2 = P2
@@ -115,6 +156,198 @@ class ShortWeierstrass(Curve):
 
         return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p)
 
+    # Complete formulas from Renes, Costello and Batina, "Complete
+    # addition formulas for prime order elliptic curves" (2015). They
+    # work on the usual (X:Y:Z) projective coordinates and have no
+    # exceptional cases, including the neutral point (0:1:0), P + P
+    # and P + -P.
+
+    def add_points_complete(self, P1, P2):
+        if self.gf.normalize(self.a) == self.gf.p - 3:
+            return self._add_points_complete_a3(P1, P2)
+
+        X1, Y1, Z1 = P1
+        X2, Y2, Z2 = P2
+
+        # Algorithm 1
+        b3 = 3*self.b
+        t0 = X1*X2
+        t1 = Y1*Y2
+        t2 = Z1*Z2
+        t3 = X1+Y1
+        t4 = X2+Y2
+        t3 = t3*t4
+        t4 = t0+t1
+        t3 = t3-t4
+        t4 = X1+Z1
+        t5 = X2+Z2
+        t4 = t4*t5
+        t5 = t0+t2
+        t4 = t4-t5
+        t5 = Y1+Z1
+        X3 = Y2+Z2
+        t5 = t5*X3
+        X3 = t1+t2
+        t5 = t5-X3
+        Z3 = self.a*t4
+        X3 = b3*t2
+        Z3 = X3+Z3
+        X3 = t1-Z3
+        Z3 = t1+Z3
+        Y3 = X3*Z3
+        t1 = t0+t0
+        t1 = t1+t0
+        t2 = self.a*t2
+        t4 = b3*t4
+        t1 = t1+t2
+        t2 = t0-t2
+        t2 = self.a*t2
+        t4 = t4+t2
+        t0 = t1*t4
+        Y3 = Y3+t0
+        t0 = t5*t4
+        X3 = t3*X3
+        X3 = X3-t0
+        t0 = t3*t1
+        Z3 = t5*Z3
+        Z3 = Z3+t0
+
+        return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p)
+
+    def _add_points_complete_a3(self, P1, P2):
+        X1, Y1, Z1 = P1
+        X2, Y2, Z2 = P2
+
+        # Algorithm 4
+        t0 = X1*X2
+        t1 = Y1*Y2
+        t2 = Z1*Z2
+        t3 = X1+Y1
+        t4 = X2+Y2
+        t3 = t3*t4
+        t4 = t0+t1
+        t3 = t3-t4
+        t4 = Y1+Z1
+        X3 = Y2+Z2
+        t4 = t4*X3
+        X3 = t1+t2
+        t4 = t4-X3
+        X3 = X1+Z1
+        Y3 = X2+Z2
+        X3 = X3*Y3
+        Y3 = t0+t2
+        Y3 = X3-Y3
+        Z3 = self.b*t2
+        X3 = Y3-Z3
+        Z3 = X3+X3
+        X3 = X3+Z3
+        Z3 = t1-X3
+        X3 = t1+X3
+        Y3 = self.b*Y3
+        t1 = t2+t2
+        t2 = t1+t2
+        Y3 = Y3-t2
+        Y3 = Y3-t0
+        t1 = Y3+Y3
+        Y3 = t1+Y3
+        t1 = t0+t0
+        t0 = t1+t0
+        t0 = t0-t2
+        t1 = t4*Y3
+        t2 = t0*Y3
+        Y3 = X3*Z3
+        Y3 = Y3+t2
+        X3 = t3*X3
+        X3 = X3-t1
+        Z3 = t4*Z3
+        t1 = t3*t0
+        Z3 = Z3+t1
+
+        return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p)
+
+    def double_point_complete(self, P1):
+        if self.gf.normalize(self.a) == self.gf.p - 3:
+            return self._double_point_complete_a3(P1)
+
+        X, Y, Z = P1
+
+        # Algorithm 3
+        b3 = 3*self.b
+        t0 = X*X
+        t1 = Y*Y
+        t2 = Z*Z
+        t3 = X*Y
+        t3 = t3+t3
+        Z3 = X*Z
+        Z3 = Z3+Z3
+        X3 = self.a*Z3
+        Y3 = b3*t2
+        Y3 = X3+Y3
+        X3 = t1-Y3
+        Y3 = t1+Y3
+        Y3 = X3*Y3
+        X3 = t3*X3
+        Z3 = b3*Z3
+        t2 = self.a*t2
+        t3 = t0-t2
+        t3 = self.a*t3
+        t3 = t3+Z3
+        Z3 = t0+t0
+        t0 = Z3+t0
+        t0 = t0+t2
+        t0 = t0*t3
+        Y3 = Y3+t0
+        t2 = Y*Z
+        t2 = t2+t2
+        t0 = t2*t3
+        X3 = X3-t0
+        Z3 = t2*t1
+        Z3 = Z3+Z3
+        Z3 = Z3+Z3
+
+        return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p)
+
+    def _double_point_complete_a3(self, P1):
+        X, Y, Z = P1
+
+        # Algorithm 6
+        t0 = X*X
+        t1 = Y*Y
+        t2 = Z*Z
+        t3 = X*Y
+        t3 = t3+t3
+        Z3 = X*Z
+        Z3 = Z3+Z3
+        Y3 = self.b*t2
+        Y3 = Y3-Z3
+        X3 = Y3+Y3
+        Y3 = X3+Y3
+        X3 = t1-Y3
+        Y3 = t1+Y3
+        Y3 = X3*Y3
+        X3 = X3*t3
+        t3 = t2+t2
+        t2 = t2+t3
+        Z3 = self.b*Z3
+        Z3 = Z3-t2
+        Z3 = Z3-t0
+        t3 = Z3+Z3
+        Z3 = Z3+t3
+        t3 = t0+t0
+        t0 = t3+t0
+        t0 = t0-t2
+        t0 = t0*Z3
+        Y3 = Y3+t0
+        t0 = Y*Z
+        t0 = t0+t0
+        Z3 = t0*Z3
+        X3 = X3-Z3
+        Z3 = t0*t1
+        Z3 = Z3+Z3
+        Z3 = Z3+Z3
+
+        return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p)
+
     def get_y(self, x):
         """Returns a list of the y-coordinates on the curve at given x."""
 
@@ -243,8 +476,9 @@ class MontgomeryCurve(Curve):
 
         return (X3 % self.gf.p, Z3 % self.gf.p)
 
-    # XXX
-    def diffadd_points_xy(self, P1, P2):
+    def diffadd_points_xy(self, P1, P2, P3):
+        """P2 + P3, given their difference P1 = P3 - P2."""
+
         X1, Z1 = P1
         X2, Z2 = P2
         X3, Z3 = P3
@@ -261,6 +495,25 @@ class MontgomeryCurve(Curve):
 
         return (X5 % self.gf.p, Z5 % self.gf.p)
 
+    def recover_y_xy(self, P, Q, R):
+        """Q with its y-coordinate, as projective (X, Y, Z), given the
+        affine point P and Q, R = Q + P in x and z only. This is the
+        Okeya-Sakurai formula, so the ladder in mul_xy() can leave y
+        out."""
+
+        x, y = P
+        X1, Z1 = Q
+        X2, Z2 = R
+        p = self.gf.p
+
+        v1 = x*Z1
+        v3 = (X1 - v1)**2 * X2
+        v2 = X1 + v1 + 2*self.a*Z1
+        v2 = (v2 * (x*X1 + Z1) - 2*self.a*Z1**2) * Z2
+        v1 = 2*self.b*y*Z1*Z2 % p
+
+        return (v1*X1 % p, (v2 - v3) % p, v1*Z1 % p)
+
     def add_points(self, P1, P2):
 
         if P1 is None and P2 is None:
@@ -313,27 +566,29 @@ class MontgomeryCurve(Curve):
         a = self.gf.div(3 - self.a**2, 3*self.b**2)
         b = self.gf.div(2*self.a**3 - 9*self.a, 27*self.b**3)
 
-        def montgomery_point_to_weierstrass_point(P):
-            x, y = P
+        return ShortWeierstrass(a, b, self.gf), \
+            PointMap(self, 'point_to_short_weierstrass'), \
+            PointMap(self, 'point_from_short_weierstrass')
 
-            a3 = self.gf.div(self.a, 3)
-            x_ = self.gf.div(x + a3, self.b)
-            y_ = self.gf.div(y, self.b)
+    def point_to_short_weierstrass(self, P):
+        x, y = P
 
-            return (x_, y_)
+        a3 = self.gf.div(self.a, 3)
+        x_ = self.gf.div(x + a3, self.b)
+        y_ = self.gf.div(y, self.b)
 
-        def weierstrass_point_to_montgomery_point(P):
-            x_, y_ = P
+        return (x_, y_)
 
-            # TODO: any exception cases? I don't think so (no division by 0 at least)
-            a3 = self.gf.div(self.a, 3)
-            x_plus_a3 = self.gf.mul(x_, self.b)
-            x = self.gf.sub(x_plus_a3, a3)
-            y = self.gf.mul(y_, self.b)
+    def point_from_short_weierstrass(self, P):
+        x_, y_ = P
 
-            return (x, y)
+        # TODO: any exception cases? I don't think so (no division by 0 at least)
+        a3 = self.gf.div(self.a, 3)
+        x_plus_a3 = self.gf.mul(x_, self.b)
+        x = self.gf.sub(x_plus_a3, a3)
+        y = self.gf.mul(y_, self.b)
 
-        return ShortWeierstrass(a, b, self.gf), montgomery_point_to_weierstrass_point, weierstrass_point_to_montgomery_point
+        return (x, y)
 
     def __str__(self):
         return 'Montgomery Curve %sy^2 = x^3 + %sx^2 + x over GF(%s)' % (
@@ -393,6 +648,14 @@ class EdwardsCurve(Curve):
 
         return list(set(result))
 
+    def recover_x(self, y, sign):
+        """The x-coordinate at y with x & 1 == sign, or None."""
+
+        # x^2 = (y^2 - c^2) / (c^2 d y^2 - 1)
+        xx = self.gf.div(y**2 - self.c**2, self.c**2 * self.d * y**2 - 1)
+
+        return _select_root(sqrt_modp(xx, self.gf.p), sign)
+
     def point_on_curve(self, P):
         x, y = P
 
@@ -479,6 +742,118 @@ class EdwardsCurve(Curve):
 
         return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p)
 
+    # Extended coordinates (X:Y:Z:T) with x = X/Z, y = Y/Z and T = XY/Z,
+    # that is a twisted Edwards curve with a = 1. The formulas are
+    # complete as long as d is not a square.
+
+    def neutral_point_extended(self):
+        return (0, 1, 1, 0)
+
+    def affine_to_extended(self, P1):
+        x, y = P1
+        return (x, y, 1, self.gf.mul(x, y))
+
+    def extended_to_affine(self, P1):
+        X, Y, Z, T = P1
+
+        Zinv = self.gf.mul_inv(Z)
+
+        return (self.gf.mul(X, Zinv), self.gf.mul(Y, Zinv))
+
+    def extended_to_affine_batch(self, points):
+        Zinvs = self.gf.inv_batch([Z for X, Y, Z, T in points])
+
+        return [(self.gf.mul(X, Zinv), self.gf.mul(Y, Zinv))
+                for (X, Y, Z, T), Zinv in zip(points, Zinvs)]
+
+    def add_points_extended(self, P1, P2):
+        X1, Y1, Z1, T1 = P1
+        X2, Y2, Z2, T2 = P2
+
+        # add-2008-hwcd with a = 1
+        A = X1*X2
+        B = Y1*Y2
+        C = T1*self.d*T2
+        D = Z1*Z2
+        E = (X1+Y1)*(X2+Y2)-A-B
+        F = D-C
+        G = D+C
+        H = B-A
+        X3 = E*F
+        Y3 = G*H
+        T3 = E*H
+        Z3 = F*G
+
+        return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p, T3 % self.gf.p)
+
+    def double_point_extended(self, P1):
+        X1, Y1, Z1, T1 = P1
+
+        # dbl-2008-hwcd with a = 1
+        A = X1**2
+        B = Y1**2
+        C = 2*Z1**2
+        E = (X1+Y1)**2-A-B
+        G = A+B
+        F = G-C
+        H = A-B
+        X3 = E*F
+        Y3 = G*H
+        T3 = E*H
+        Z3 = F*G
+
+        return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p, T3 % self.gf.p)
+
+    # Inverted coordinates (X:Y:Z) with x = Z/X and y = Z/Y. Cheaper
+    # than the projective formulas but the neutral point and the other
+    # points with x*y == 0 cannot be represented.
+
+    def affine_to_inverted(self, P1):
+        x, y = P1
+
+        if self.gf.mul(x, y) == 0:
+            raise ValueError('point has no inverted representation')
+
+        return (self.gf.mul_inv(x), self.gf.mul_inv(y), 1)
+
+    def inverted_to_affine(self, P1):
+        X, Y, Z = P1
+
+        return (self.gf.div(Z, X), self.gf.div(Z, Y))
+
+    def add_points_inverted(self, P1, P2):
+        X1, Y1, Z1 = P1
+        X2, Y2, Z2 = P2
+
+        # add-2007-bl (inverted) with c = 1
+        A = Z1*Z2
+        B = self.d*A**2
+        C = X1*X2
+        D = Y1*Y2
+        E = C*D
+        H = C-D
+        I = (X1+Y1)*(X2+Y2)-C-D
+        X3 = (E+B)*H
+        Y3 = (E-B)*I
+        Z3 = A*H*I
+
+        return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p)
+
+    def double_point_inverted(self, P1):
+        X1, Y1, Z1 = P1
+
+        # dbl-2007-bl (inverted) with c = 1
+        A = X1**2
+        B = Y1**2
+        C = A+B
+        D = A-B
+        E = (X1+Y1)**2-C
+        X3 = C*D
+        Y3 = E*(C-2*self.d*Z1**2)
+        Z3 = D*E
+
+        return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p)
+
     def add_points(self, P1, P2):
         x1, y1 = P1
         x2, y2 = P2
@@ -511,26 +886,28 @@ class EdwardsCurve(Curve):
         a = self.gf.div(2*(1+self.d), 1-self.d)
         b = self.gf.div(4, 1-self.d)
 
-        def edwards_point_to_montgomery_point(P):
-            x, y = P
+        return MontgomeryCurve(a, b, self.gf), \
+            PointMap(self, 'point_to_montgomery'), \
+            PointMap(self, 'point_from_montgomery')
 
-            x_ = self.gf.div(1 + y, 1 - y)
-            y_ = self.gf.div(x_, x)
+    def point_to_montgomery(self, P):
+        x, y = P
 
-            return (x_, y_)
+        x_ = self.gf.div(1 + y, 1 - y)
+        y_ = self.gf.div(x_, x)
 
-        def montgomery_point_to_edwards_point(P):
-            x_, y_ = P
+        return (x_, y_)
 
-            if y_ == 0 or self.gf.add(x_, 1) == 0:
-                raise ZeroDivisionError('invalid conversion')
+    def point_from_montgomery(self, P):
+        x_, y_ = P
 
-            x = self.gf.div(x_, y_)
-            y = self.gf.div(x_ - 1, x_ + 1)
+        if y_ == 0 or self.gf.add(x_, 1) == 0:
+            raise ZeroDivisionError('invalid conversion')
 
-            return (x, y)
+        x = self.gf.div(x_, y_)
+        y = self.gf.div(x_ - 1, x_ + 1)
 
-        return MontgomeryCurve(a, b, self.gf), edwards_point_to_montgomery_point, montgomery_point_to_edwards_point
+        return (x, y)
 
     def __str__(self):
         return 'Edwards Curve x^2 + y^2 = 1 + %sx^2y^2 over GF(%s)' % (
@@ -573,6 +950,14 @@ class TwistedEdwardsCurve(Curve):
 
         return list(set(result))
 
+    def recover_x(self, y, sign):
+        """The x-coordinate at y with x & 1 == sign, or None."""
+
+        # x^2 = (y^2 - 1) / (dy^2 - a)
+        xx = self.gf.div(y**2 - 1, self.d * y**2 - self.a)
+
+        return _select_root(sqrt_modp(xx, self.gf.p), sign)
+
     def point_on_curve(self, P):
         x, y = P
 
@@ -639,6 +1024,67 @@ class TwistedEdwardsCurve(Curve):
 
         return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p)
 
+    # Extended coordinates (X:Y:Z:T) with x = X/Z, y = Y/Z and T = XY/Z.
+
+    def neutral_point_extended(self):
+        return (0, 1, 1, 0)
+
+    def affine_to_extended(self, P1):
+        x, y = P1
+        return (x, y, 1, self.gf.mul(x, y))
+
+    def extended_to_affine(self, P1):
+        X, Y, Z, T = P1
+
+        Zinv = self.gf.mul_inv(Z)
+
+        return (self.gf.mul(X, Zinv), self.gf.mul(Y, Zinv))
+
+    def extended_to_affine_batch(self, points):
+        Zinvs = self.gf.inv_batch([Z for X, Y, Z, T in points])
+
+        return [(self.gf.mul(X, Zinv), self.gf.mul(Y, Zinv))
+                for (X, Y, Z, T), Zinv in zip(points, Zinvs)]
+
+    def add_points_extended(self, P1, P2):
+        X1, Y1, Z1, T1 = P1
+        X2, Y2, Z2, T2 = P2
+
+        # add-2008-hwcd
+        A = X1*X2
+        B = Y1*Y2
+        C = T1*self.d*T2
+        D = Z1*Z2
+        E = (X1+Y1)*(X2+Y2)-A-B
+        F = D-C
+        G = D+C
+        H = B-self.a*A
+        X3 = E*F
+        Y3 = G*H
+        T3 = E*H
+        Z3 = F*G
+
+        return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p, T3 % self.gf.p)
+
+    def double_point_extended(self, P1):
+        X1, Y1, Z1, T1 = P1
+
+        # dbl-2008-hwcd
+        A = X1**2
+        B = Y1**2
+        C = 2*Z1**2
+        D = self.a*A
+        E = (X1+Y1)**2-A-B
+        G = D+B
+        F = G-C
+        H = D-B
+        X3 = E*F
+        Y3 = G*H
+        T3 = E*H
+        Z3 = F*G
+
+        return (X3 % self.gf.p, Y3 % self.gf.p, Z3 % self.gf.p, T3 % self.gf.p)
+
     def affine_to_projective(self, P1):
         x, y = P1
         return (x, y, 1)
@@ -675,66 +1121,166 @@ class TwistedEdwardsCurve(Curve):
         A = self.gf.div(2*(self.a + self.d), self.a - self.d)
         B = self.gf.div(4, self.a - self.d)
 
-        def map_affine_to(P):
-            x, y = P
-            if 1 - y == 0 or (1 - y)*x == 0:
-                # XXX: is this correct?
-                return None
-            return (
-                self.gf.div(1 + y, 1 - y),
-                self.gf.div(1 + y, (1 - y)*x))
-
-        def map_affine_from(P):
-            if P is None:
-                return None
-            u, v = P
-            # XXX: Handle exceptional cases
-            if v == 0 or (u + 1) == 0:
-                raise ZeroDivisionError('TODO')
-            return (
-                self.gf.div(u, v),
-                self.gf.div(u - 1, u + 1))
-
-        return MontgomeryCurve(A, B, self.gf), map_affine_to, map_affine_from
+        return MontgomeryCurve(A, B, self.gf), \
+            PointMap(self, 'point_to_montgomery'), \
+            PointMap(self, 'point_from_montgomery')
+
+    def point_to_montgomery(self, P):
+        x, y = P
+        if 1 - y == 0 or (1 - y)*x == 0:
+            # XXX: is this correct?
+            return None
+        return (
+            self.gf.div(1 + y, 1 - y),
+            self.gf.div(1 + y, (1 - y)*x))
 
+    def point_from_montgomery(self, P):
+        if P is None:
+            return None
+        u, v = P
+        # XXX: Handle exceptional cases
+        if v == 0 or (u + 1) == 0:
+            raise ZeroDivisionError('TODO')
+        return (
+            self.gf.div(u, v),
+            self.gf.div(u - 1, u + 1))
 
-def mul(n, P, curve):
-    R0 = curve.neutral_point()
-    R1 = P
+
+def _bits(n):
+    """The bits of n, most significant first."""
 
     # XXX
     bits = []
     while n:
         bits.insert(0, n & 1)
         n >>= 1
+    return bits
+
 
+def _ladder(bits, R0, R1, add, double):
     for b in bits:
         if b & 1:
-            R0 = curve.add_points(R0, R1)
-            R1 = curve.double_point(R1)
+            R0 = add(R0, R1)
+            R1 = double(R1)
         else:
-            R1 = curve.add_points(R0, R1)
-            R0 = curve.double_point(R0)
+            R1 = add(R0, R1)
+            R0 = double(R0)
 
     return R0
 
 
+def mul(n, P, curve):
+    return _ladder(_bits(n), curve.neutral_point(), P,
+                   curve.add_points, curve.double_point)
+
+
 def mul_projective(n, P, curve):
-    R0 = curve.neutral_point_projective()
-    R1 = P
+    return _ladder(_bits(n), curve.neutral_point_projective(), P,
+                   curve.add_points_projective, curve.double_point_projective)
 
-    # XXX
-    bits = []
-    while n:
-        bits.insert(0, n & 1)
-        n >>= 1
 
-    for b in bits:
+def mul_extended(n, P, curve):
+    return _ladder(_bits(n), curve.neutral_point_extended(), P,
+                   curve.add_points_extended, curve.double_point_extended)
+
+
+def mul_xy(n, P, curve):
+    """n*P on a Montgomery curve in x and z only, P from affine_to_xy().
+    Returns (nP, (n+1)P), the second for recover_y_xy()."""
+
+    R0, R1 = (1, 0), P
+
+    for b in _bits(n):
         if b & 1:
-            R0 = curve.add_points_projective(R0, R1)
-            R1 = curve.double_point_projective(R1)
+            R0 = curve.diffadd_points_xy(P, R0, R1)
+            R1 = curve.double_point_xy(R1)
         else:
-            R1 = curve.add_points_projective(R0, R1)
-            R0 = curve.double_point_projective(R0)
+            R1 = curve.diffadd_points_xy(P, R0, R1)
+            R0 = curve.double_point_xy(R0)
 
-    return R0
+    return R0, R1
+
+
+def mul_inverted(n, P, curve):
+    """Multiplication in inverted coordinates.
+
+    The neutral point has no inverted representation so the ladder
+    starts from (P, 2P) after the leading bit. n must not be a
+    multiple of the order of P.
+    """
+
+    bits = _bits(n)
+    if not bits:
+        raise ValueError('neutral point has no inverted representation')
+
+    return _ladder(bits[1:], P, curve.double_point_inverted(P),
+                   curve.add_points_inverted, curve.double_point_inverted)
+
+
+def mul_complete(n, P, curve):
+    return _ladder(_bits(n), curve.neutral_point_projective(), P,
+                   curve.add_points_complete, curve.double_point_complete)
+
+
+def _mul2(n1, P1, n2, P2, R, add, double):
+    """n1*P1 + n2*P2 using Shamir's trick.
+
+    Every bit costs one doubling and one addition (possibly of the
+    neutral point R), so this needs complete formulas.
+    """
+
+    table = (R, P1, P2, add(P1, P2))
+
+    for i in reversed(xrange(max(n1, n2).bit_length())):
+        R = add(double(R), table[((n1 >> i) & 1) | ((n2 >> i) & 1) << 1])
+
+    return R
+
+
+def mul2_complete(n1, P1, n2, P2, curve):
+    return _mul2(n1, P1, n2, P2, curve.neutral_point_projective(),
+                 curve.add_points_complete, curve.double_point_complete)
+
+
+def mul2_extended(n1, P1, n2, P2, curve):
+    return _mul2(n1, P1, n2, P2, curve.neutral_point_extended(),
+                 curve.add_points_extended, curve.double_point_extended)
+
+
+def precompute(P, nbits, double):
+    """The table [P, 2P, 4P, ..., 2^(nbits-1)P] for mul_precomputed."""
+
+    table = [P]
+    for i in xrange(nbits - 1):
+        table.append(double(table[-1]))
+    return table
+
+
+def mul_precomputed(n, table, R, add):
+    """n*P given the precompute() table of P, using only additions
+    onto R (the neutral point)."""
+
+    if n >> len(table):
+        raise ValueError('scalar too large for table')
+
+    i = 0
+    while n:
+        if n & 1:
+            R = add(R, table[i])
+        n >>= 1
+        i += 1
+
+    return R
+
+
+def precompute_extended(P, nbits, curve):
+    """Table for mul_precomputed_extended of the affine point P,
+    normalised to Z = 1 with one shared inversion."""
+
+    table = precompute(curve.affine_to_extended(P), nbits, curve.double_point_extended)
+
+    return [curve.affine_to_extended(Q) for Q in curve.extended_to_affine_batch(table)]
+
+
+def mul_precomputed_extended(n, table, curve):
+    return mul_precomputed(n, table, curve.neutral_point_extended(), curve.add_points_extended)
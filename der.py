@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""Just enough DER for ECDSA signatures and X9.63 private keys.
+
+    SEQUENCE { r INTEGER, s INTEGER }
+    SEQUENCE { flags BIT STRING, size INTEGER, x INTEGER, y INTEGER, k INTEGER }
+
+The output is byte for byte what pyasn1 gives for the same schema. The
+decoder only accepts the canonical (DER) encoding and raises ValueError
+for anything else: indefinite or non-minimal lengths, integers with
+redundant leading bytes, garbage after the last element etc.
+
+Decoding works on str, bytearray, buffer or mmap without copying the
+input, so a file of concatenated signatures can be mapped and walked
+with iter_dsa_sigs().
+"""
+
+import binascii
+
+import util
+
+
+INTEGER = 0x02
+BIT_STRING = 0x03
+SEQUENCE = 0x30
+
+
+# Encoding
+
+def encode_length(n):
+    if n < 0x80:
+        return chr(n)
+    s = '%x' % n
+    s = binascii.unhexlify('0' * (len(s) & 1) + s)
+    return chr(0x80 | len(s)) + s
+
+
+def encode_tlv(tag, content):
+    return chr(tag) + encode_length(len(content)) + content
+
+
+def encode_integer(n):
+    """Minimal two's complement, like pyasn1."""
+
+    if n >= 0:
+        s = '%x' % n
+        s = '0' * (len(s) & 1) + s
+        if s[0] in '89abcdef':
+            s = '00' + s
+    else:
+        size = (util.count_bits(-n - 1) + 8) // 8
+        s = '%0*x' % (2 * size, n + (1 << (8 * size)))
+
+    return encode_tlv(INTEGER, binascii.unhexlify(s))
+
+
+def encode_bit_string(bits):
+    """bits is a sequence of 0 and 1, first bit is the most significant
+    one of the first byte."""
+
+    unused = -len(bits) % 8
+    bits = tuple(bits) + (0,) * unused
+
+    data = ''.join(chr(int(''.join(map(str, bits[i:i + 8])), 2))
+                   for i in xrange(0, len(bits), 8))
+
+    return encode_tlv(BIT_STRING, chr(unused) + data)
+
+
+def encode_sequence(*elements):
+    return encode_tlv(SEQUENCE, ''.join(elements))
+
+
+def encode_dsa_sig(sig):
+    return encode_sequence(encode_integer(sig[0]), encode_integer(sig[1]))
+
+
+def encode_private_key(pub, priv, byte_size):
+    return encode_sequence(encode_bit_string((1,)), # private key
+                           encode_integer(byte_size),
+                           encode_integer(pub[0]),
+                           encode_integer(pub[1]),
+                           encode_integer(priv))
+
+
+# Decoding
+
+def read_tlv(buf, pos, end):
+    """Reads the header of the element at buf[pos:end]. buf is a str,
+    buffer or mmap.
+
+    Returns (tag, start, stop) where buf[start:stop] is the content.
+    """
+
+    if end - pos < 2:
+        raise ValueError('truncated DER')
+
+    tag = ord(buf[pos])
+    if tag & 0x1f == 0x1f:
+        raise ValueError('high tag numbers not supported')
+
+    n = ord(buf[pos + 1])
+    pos += 2
+
+    if n == 0x80:
+        raise ValueError('indefinite length')
+    if n > 0x80:
+        size = n & 0x7f
+        if size > end - pos:
+            raise ValueError('truncated DER')
+        if ord(buf[pos]) == 0:
+            raise ValueError('non-minimal length')
+        n = util.be2int(buffer(buf, pos, size))
+        if n < 0x80:
+            raise ValueError('non-minimal length')
+        pos += size
+
+    if n > end - pos:
+        raise ValueError('truncated DER')
+
+    return tag, pos, pos + n
+
+
+def read_expected(buf, pos, end, tag):
+    t, start, stop = read_tlv(buf, pos, end)
+    if t != tag:
+        raise ValueError('expected tag 0x%02x, got 0x%02x' % (tag, t))
+    return start, stop
+
+
+def decode_integer(buf, pos, end):
+    """Returns (value, position after the integer)."""
+
+    start, stop = read_expected(buf, pos, end, INTEGER)
+
+    if start == stop:
+        raise ValueError('empty integer')
+    if stop - start > 1:
+        first, second = ord(buf[start]), ord(buf[start + 1])
+        if (first == 0 and second < 0x80) or (first == 0xff and second >= 0x80):
+            raise ValueError('non-minimal integer')
+
+    n = util.be2int(buffer(buf, start, stop - start))
+    if ord(buf[start]) & 0x80:
+        n -= 1 << (8 * (stop - start))
+
+    return n, stop
+
+
+def decode_bit_string(buf, pos, end):
+    """Returns (tuple of bits, position after the bit string)."""
+
+    start, stop = read_expected(buf, pos, end, BIT_STRING)
+
+    if start == stop:
+        raise ValueError('empty bit string')
+
+    unused = ord(buf[start])
+    if unused > 7 or (unused and stop - start == 1):
+        raise ValueError('bad bit string padding')
+    if unused and ord(buf[stop - 1]) & ((1 << unused) - 1):
+        raise ValueError('non-zero bit string padding')
+
+    bits = []
+    for i in xrange(start + 1, stop):
+        c = ord(buf[i])
+        bits.extend((c >> j) & 1 for j in xrange(7, -1, -1))
+
+    return tuple(bits[:len(bits) - unused]), stop
+
+
+def _as_buffer(buf):
+    # Indexing a bytearray gives ints, everything else gives characters.
+    if isinstance(buf, bytearray):
+        return buffer(buf)
+    return buf
+
+
+def _dsa_sig_at(buf, pos, end):
+    start, stop = read_expected(buf, pos, end, SEQUENCE)
+
+    r, p = decode_integer(buf, start, stop)
+    s, p = decode_integer(buf, p, stop)
+    if p != stop:
+        raise ValueError('trailing data in signature')
+
+    return (r, s), stop
+
+
+def decode_dsa_sig(buf):
+    buf = _as_buffer(buf)
+    sig, stop = _dsa_sig_at(buf, 0, len(buf))
+    if stop != len(buf):
+        raise ValueError('trailing data after signature')
+    return sig
+
+
+def iter_dsa_sigs(buf, offset=0, end=None):
+    """Yields every signature in a buffer of back to back DER
+    signatures."""
+
+    buf = _as_buffer(buf)
+    if end is None:
+        end = len(buf)
+
+    while offset < end:
+        sig, offset = _dsa_sig_at(buf, offset, end)
+        yield sig
+
+
+def decode_private_key(buf):
+    """Returns (public point, private key)."""
+
+    buf = _as_buffer(buf)
+    start, stop = read_expected(buf, 0, len(buf), SEQUENCE)
+    if stop != len(buf):
+        raise ValueError('trailing data after private key')
+
+    flags, p = decode_bit_string(buf, start, stop)
+    size, p = decode_integer(buf, p, stop)
+    x, p = decode_integer(buf, p, stop)
+    y, p = decode_integer(buf, p, stop)
+    k, p = decode_integer(buf, p, stop)
+    if p != stop:
+        raise ValueError('trailing data in private key')
+
+    return (x, y), k
@@ -1,11 +1,79 @@
 # -*- coding: utf-8 -*-
 # Copyright (C) 2015 Björn Edström <be@bjrn.se>
 
-import curve
+import codec
+import registry
 
 
 def ecdh(curve_obj, my_private, other_public):
     """Derive the shared secret in ECDH."""
 
     # here curve_obj is from asymmetric.ECCBase
-    return curve.mul(my_private, other_public, curve_obj.curve)
+    return curve_obj.scalarmult(my_private, other_public)
+
+
+# (A - 2) / 4 for Curve25519.
+A24 = 121665
+
+
+def _x25519_ladder(k, u, p):
+    """The RFC 7748 ladder: k*u as (X, Z)."""
+
+    x2, z2, x3, z3 = 1, 0, u, 1
+    swap = 0
+
+    for t in xrange(254, -1, -1):
+        bit = (k >> t) & 1
+        if swap ^ bit:
+            x2, x3, z2, z3 = x3, x2, z3, z2
+        swap = bit
+
+        A = x2 + z2
+        AA = A * A % p
+        B = x2 - z2
+        BB = B * B % p
+        E = AA - BB
+        DA = (x3 - z3) * A % p
+        CB = (x3 + z3) * B % p
+        x3 = (DA + CB)**2 % p
+        z3 = u * (DA - CB)**2 % p
+        x2 = AA * BB % p
+        z2 = E * (AA + A24 * E) % p
+
+    if swap:
+        x2, z2 = x3, z3
+
+    return x2, z2
+
+
+def x25519_batch(scalars, peers, out=None):
+    """X25519 (RFC 7748) of each 32 byte scalar with the 32 byte
+    u-coordinate at the same position. Both are packed back to back in
+    strings or buffers. Returns the 32 byte shared secrets back to back
+    in out, a bytearray allocated if not given.
+
+    The scalars are clamped and the top bit of the u-coordinates
+    ignored, as in the RFC. All the ladders share one inversion at the
+    end.
+
+    An all zero secret means the peer sent a point of small order. The
+    caller should check for it (RFC 7748 section 6.1).
+    """
+
+    if len(scalars) % 32 or len(scalars) != len(peers):
+        raise ValueError('need one 32 byte scalar per 32 byte u-coordinate')
+
+    gf = registry.get('curve25519').gf
+    p = gf.p
+
+    results = []
+    for k, u in zip(codec.decode_ints(scalars, 32), codec.decode_ints(peers, 32)):
+        k = (k & (2**254 - 8)) | 2**254
+        u = (u & (2**255 - 1)) % p
+        results.append(_x25519_ladder(k, u, p))
+
+    # Z = 0 for the small order points, their result is 0.
+    Zinvs = gf.inv_batch([z or 1 for x, z in results])
+
+    return codec.encode_ints([x * zinv % p if z else 0 for (x, z), zinv in zip(results, Zinvs)],
+                             32, out)
@@ -2,7 +2,6 @@
 # Copyright (C) 2015 Björn Edström <be@bjrn.se>
 
 import asymmetric
-import curve
 import util
 import numbertheory
 
@@ -42,7 +41,7 @@ def break_ecdsa(curve_obj, hash_int, hash_num_bits, sig1, sig2, msg1, msg2):
     return (k, priv)
 
 
-def ecdsa_sign(curve_obj, hash_int, hash_num_bits, private_key, message, k=None):
+def ecdsa_sign(curve_obj, hash_int, hash_num_bits, private_key, message, k=None, pool=None):
     """Sign message using the private key.
 
     Returns the signature (r, s).
@@ -51,26 +50,85 @@ def ecdsa_sign(curve_obj, hash_int, hash_num_bits, private_key, message, k=None)
       lambda m: util.be2int(hashlib.sha256(m).digest())
     @param hash_num_bits: the number of bits in the digest above, for
     example 256.
+    @param pool: a noncepool.NoncePool for curve_obj to take the nonce
+    from, instead of computing it here.
+    """
+
+    return _sign_hash(curve_obj, hash_int(message), hash_num_bits, private_key, k, pool)
+
+
+def ecdsa_sign_digest(curve_obj, digest, private_key, k=None, pool=None):
+    """Sign a message given its digest (a string), for example
+    hashlib.sha256(message).digest().
+    """
+
+    return _sign_hash(curve_obj, util.be2int(digest), 8 * len(digest), private_key, k, pool)
+
+
+def ecdsa_sign_stream(curve_obj, hash_func, private_key, source, k=None, pool=None):
+    """Sign a message read incrementally from source, a file object,
+    mmap or iterable of chunks (see util.hash_stream).
+
+    @param hash_func: a hashlib constructor, for example hashlib.sha256.
+    """
+
+    digest = util.hash_stream(hash_func(), source).digest()
+
+    return ecdsa_sign_digest(curve_obj, digest, private_key, k, pool)
+
+
+def ecdsa_presign(curve_obj, count=1):
+    """The part of count signatures that does not depend on the message
+    or the key: a list of (k, k^-1 mod n, r). The nonces are inverted
+    together, with one inversion.
+
+    Never use a triple for more than one signature. Two signatures with
+    the same k give away the private key, see break_ecdsa().
     """
 
     n = curve_obj.order
 
-    if k is None:
+    result = []
+    while len(result) < count:
+        nonces = []
+        rs = []
+        for k in util.scalars(count - len(result), n):
+            (x1, y1) = curve_obj.scalarmult_base(k)
+            r = x1 % n
+            if r != 0:
+                nonces.append(k)
+                rs.append(r)
+        result += zip(nonces, curve_obj.scalars.inv_batch(nonces), rs)
+
+    return result
+
+
+def _sign_hash(curve_obj, e, hash_num_bits, private_key, k, pool=None):
+    n = curve_obj.order
+
+    if pool is not None:
+        if k is not None:
+            raise ValueError('k and pool are mutually exclusive')
+        if pool.curve_obj.order != n:
+            raise ValueError('nonce pool is for another curve')
+    elif k is None:
         k = util.randint(1, n - 1)
 
-    e = hash_int(message)
     L_n = util.count_bits(n)
     z = e >> max(hash_num_bits - L_n, 0)
 
     while True:
-        (x1, y1) = curve.mul(k, curve_obj.base_point, curve_obj.curve)
-        r = x1 % curve_obj.order
-        if r == 0:
-            continue
+        if pool is not None:
+            (k, k_neg, r) = pool.take()
+        else:
+            (x1, y1) = curve_obj.scalarmult_base(k)
+            r = x1 % curve_obj.order
+            if r == 0:
+                continue
 
-        k_neg = numbertheory.inverse_of(k, n)
+            k_neg = curve_obj.scalars.mul_inv(k)
 
-        s = (k_neg * (z + r * private_key)) % n
+        s = curve_obj.scalars.mul(k_neg, z + r * private_key)
         if s == 0:
             continue
 
@@ -87,6 +145,24 @@ def ecdsa_verify(curve_obj, hash_int, hash_num_bits, public_key, message, signat
     Otherwise similar to ecdsa_sign() in usage.
     """
 
+    return _verify_hash(curve_obj, hash_int(message), hash_num_bits, public_key, signature)
+
+
+def ecdsa_verify_digest(curve_obj, public_key, digest, signature):
+    """Like ecdsa_verify() given the digest of the message."""
+
+    return _verify_hash(curve_obj, util.be2int(digest), 8 * len(digest), public_key, signature)
+
+
+def ecdsa_verify_stream(curve_obj, hash_func, public_key, source, signature):
+    """Like ecdsa_verify() for a message read incrementally from source."""
+
+    digest = util.hash_stream(hash_func(), source).digest()
+
+    return ecdsa_verify_digest(curve_obj, public_key, digest, signature)
+
+
+def _verify_hash(curve_obj, e, hash_num_bits, public_key, signature):
     n = curve_obj.order
 
     # Verify
@@ -97,7 +173,7 @@ def ecdsa_verify(curve_obj, hash_int, hash_num_bits, public_key, message, signat
     if not curve_obj.curve.point_on_curve(public_key):
         return False
 
-    if not curve.mul(curve_obj.order, public_key, curve_obj.curve) == curve_obj.curve.neutral_point():
+    if not curve_obj.scalarmult(curve_obj.order, public_key) == curve_obj.curve.neutral_point():
         return False
 
     (r, s) = signature
@@ -108,18 +184,18 @@ def ecdsa_verify(curve_obj, hash_int, hash_num_bits, public_key, message, signat
     if not 1 <= s <= n - 1:
         return False
 
-    e = hash_int(message)
     L_n = util.count_bits(n)
     z = e >> max(hash_num_bits - L_n, 0)
 
     # Verify
-    w = numbertheory.inverse_of(s, curve_obj.order) % n
-    u_1 = (z * w) % n
-    u_2 = (r * w) % n
-
-    (x1, y1) = curve_obj.curve.add_points(
-        curve.mul(u_1, curve_obj.base_point, curve_obj.curve),
-        curve.mul(u_2, public_key, curve_obj.curve)
-        )
+    w = curve_obj.scalars.mul_inv(s)
+    u_1 = curve_obj.scalars.mul(z, w)
+    u_2 = curve_obj.scalars.mul(r, w)
+
+    R = curve_obj.scalarmult2(u_1, curve_obj.base_point, u_2, public_key)
+    if R == curve_obj.curve.neutral_point():
+        return False
+
+    (x1, y1) = R
 
     return (r % n) == (x1 % n)
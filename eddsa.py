@@ -4,103 +4,116 @@
 import hashlib
 import random
 
-from field import Field
-from curve import TwistedEdwardsCurve, EdwardsCurve
-
-
-def le2int(buf):
-    """little endian buffer to integer."""
-    integer = 0
-    shift = 0
-    for byte in buf:
-        integer |= ord(byte) << shift
-        shift += 8
-    return integer
-
-def int2le(integer, pad):
-    """integer to little endian buffer."""
-    buf = []
-    while integer:
-        buf.append(chr(integer & 0xff))
-        integer >>= 8
-        pad -= 1
-    while pad > 0:
-        buf.append('\x00')
-        pad -= 1
-    if not buf:
-        return '\x00'
-    return ''.join(buf)
+import field
+import registry
+import tablecache
+import util
+from util import le2int, int2le
+from curve import mul_extended, mul2_extended, precompute_extended, \
+    mul_precomputed_extended, PointMap
+
 
 class Ed25519(object):
 
+    name = 'ed25519'
     L = 2**252 + 27742317777372353535851937790883648493
     b = 256
 
-    def __init__(self):
-        field = Field(2**255 - 19)
-        ed25519 = TwistedEdwardsCurve(-1, field.div(-121665, 121666), field)
+    # The curve has cofactor * L points, so [n]P only depends on n mod
+    # cofactor * L for any P on it.
+    cofactor = 8
 
-        base_point = (15112221349535400772501151409588531511454012693041857206046113283949847762202L,
-                      46316835694926478169428394003475163141307993866256225615783033603165251855960L)
+    curve = registry.Lazy('ed25519')
+    bp = (15112221349535400772501151409588531511454012693041857206046113283949847762202L,
+          46316835694926478169428394003475163141307993866256225615783033603165251855960L)
 
-        self.curve = ed25519
-        self.bp = base_point
+    scalars = registry.Lazy('ed25519.scalars')
 
-    def encodeint(self, y):
-        return int2le(y, self.b/8)
+    # Shared by every instance, see the end of the module.
+    base_table_name = 'ed25519.base_table'
 
-    def encodepoint(self, P):
-        x, y = P
+    def scalarmult(self, n, P):
+        # The affine formulas need an inversion for every addition,
+        # extended coordinates need one in total.
+        return self.curve.extended_to_affine(
+            mul_extended(n, self.curve.affine_to_extended(P), self.curve))
 
-        print 'encodepoint', P
+    def table_bits(self):
+        return util.count_bits(self.cofactor * self.L)
 
-        new = self.encodeint(((x & 1) << (self.b - 1)) + y)
+    def precompute(self, P):
+        """Table of multiples of P for scalarmult_precomputed()."""
 
-        #return self.encodeint(y + (x & 1))
+        return precompute_extended(P, self.table_bits(), self.curve)
 
-        bits = [(y >> i) & 1 for i in range(self.b - 1)] + [x & 1]
-        ref = ''.join([chr(sum([bits[i * 8 + j] << j for j in range(8)])) for i in range(self.b/8)])
+    def scalarmult_precomputed(self, n, table):
+        # n is reduced mod cofactor * L, so this agrees with
+        # scalarmult() for any P on the curve, not only the prime order
+        # subgroup.
+        return self.curve.extended_to_affine(
+            mul_precomputed_extended(n % (self.cofactor * self.L), table, self.curve))
 
-        assert new == ref
-        return new
+    def base_table(self):
+        return registry.get(self.base_table_name)
 
-    def bit(self, h, i):
-        return (ord(h[i/8]) >> (i%8)) & 1
+    def build_base_table(self):
+        """The precompute() table of the base point, loaded from the
+        table cache if possible."""
 
-    def H(self, m):
-        return hashlib.sha512(m).digest()
+        return tablecache.cached_table(
+            self.base_table_name, self.curve, self.bp, self.table_bits(),
+            lambda: [Q[:2] for Q in self.precompute(self.bp)],
+            PointMap(self.curve, 'affine_to_extended'))
 
-    def publickey(self, sk):
-        h = hashlib.sha512(sk).digest()
-        a = 2**(self.b-2) + sum(2**i * self.bit(h,i) for i in range(3,self.b-2))
+    def scalarmult_base(self, n):
+        # B has order L.
+        return self.scalarmult_precomputed(self.scalars.reduce(n), self.base_table())
 
-        #a_new = 2**(self.b-2) + self.Hint(sk) & (2**(self.b-2) - 1)
-        #a_new -= (a_new & 0b111)
+    def expand(self, sk):
+        """Returns the clamped secret scalar a and the nonce prefix
+        derived from the secret key sk."""
 
-        a_new = h[:32]
-        a_new = map(ord, a_new)
-        a_new[0] &= 248
-        a_new[31] &= 127
-        a_new[31] |= 64
-        a_new = le2int(''.join(map(chr,a_new)))
+        h = self.H(sk)
+        a = self.scalars.clamp(h[:self.b/8], 3, self.b - 2)
 
-        assert a == a_new
+        return a, h[self.b/8:self.b/4]
 
-        a = a_new
+    def dom2(self, phflag, context):
+        """The domain separation prefix of RFC 8032, used by Ed25519ph
+        and Ed25519ctx."""
+
+        if len(context) > 255: raise ValueError("context too long")
+
+        return 'SigEd25519 no Ed25519 collisions' + chr(phflag) + chr(len(context)) + context
+
+    def prehash(self, source):
+        """PH(M) for Ed25519ph, hashing source incrementally (see
+        util.hash_stream)."""
+
+        return util.hash_stream(hashlib.sha512(), source).digest()
+
+    def encodeint(self, y):
+        return int2le(y, self.b/8)
+
+    def encodepoint(self, P):
+        x, y = P
 
-        A = mul(a, self.bp, self.curve)
+        return self.encodeint(((x & 1) << (self.b - 1)) + y)
+
+    def bit(self, h, i):
+        return (ord(h[i/8]) >> (i%8)) & 1
+
+    def H(self, m):
+        return hashlib.sha512(m).digest()
+
+    def publickey(self, sk):
+        a, prefix = self.expand(sk)
+        A = self.scalarmult(a, self.bp)
         return self.encodepoint(A)
 
     def generate_key_pair_from_seed(self, sk):
-        h = hashlib.sha512(sk).digest()
-        priv = h[0:32]
-        priv = map(ord, priv)
-        priv[0] &= 248
-        priv[31] &= 127
-        priv[31] |= 64
-        priv = le2int(''.join(map(chr,priv)))
-
-        pub = mul(priv, self.bp, self.curve)
+        priv, prefix = self.expand(sk)
+        pub = self.scalarmult(priv, self.bp)
         return (pub, priv)
 
     def generate_random_k_from_seed(self, sk):
@@ -113,14 +126,13 @@ class Ed25519(object):
 
     def signature(self,m,sk,pk):
         # a = private key
-        h = self.H(sk)
-        a = 2**(self.b-2) + sum(2**i * self.bit(h,i) for i in range(3,self.b-2))
+        a, prefix = self.expand(sk)
 
         # r = "k" || m
-        r = self.Hint(''.join([h[i] for i in range(self.b/8,self.b/4)]) + m)
+        r = self.scalars.from_le(self.H(prefix + m))
         #R = scalarmult(B,r)
-        R = mul(r, self.bp, self.curve)
-        S = (r + self.Hint(self.encodepoint(R) + pk + m) * a) % self.L
+        R = self.scalarmult(r, self.bp)
+        S = self.scalars.reduce(r + self.Hint(self.encodepoint(R) + pk + m) * a)
         return self.encodepoint(R) + self.encodeint(S)
 
     def sign(self, M, k, A, a):
@@ -132,11 +144,9 @@ class Ed25519(object):
         sig = R || S
         """
 
-        print ['sign', M, k, A, a]
-
         r = self.Hint(k + M)
-        R = mul(r, self.bp, self.curve)
-        S = (r + self.Hint(self.encodepoint(R) + self.encodepoint(A) + M) * a) % self.L
+        R = self.scalarmult(r, self.bp)
+        S = self.scalars.reduce(r + self.Hint(self.encodepoint(R) + self.encodepoint(A) + M) * a)
 
         return self.encodepoint(R) + self.encodeint(S)
 
@@ -144,28 +154,17 @@ class Ed25519(object):
         return le2int(s)
 
     def decodepoint(self,s):
-        y = sum(2**i * self.bit(s,i) for i in range(0,self.b-1))
-        #x = xrecover(y)
-        #if x & 1 != bit(s,b-1): x = q-x
-        #P = [x,y]
+        v = le2int(s)
+        y = v & ((1 << (self.b - 1)) - 1)
+        x = self.curve.recover_x(y, v >> (self.b - 1))
 
-        #print '!!! y', [y]
-
-        xs = self.curve.get_x(y) #[0][0]
-
-        #print 'xs', xs
-        
-        x = xs[0][0]
-        if x & 1 != self.bit(s,self.b-1):
-            x = self.curve.gf.p - x
+        if x is None: raise Exception("decoding point that is not on curve")
         P = (x,y)
 
         if not self.curve.point_on_curve(P): raise Exception("decoding point that is not on curve")
         return P
 
     def checkvalid(self,s,m,pk):
-        print 'checkvalid',[s,m,pk]
-        print 'length s', len(s), 'pk', len(pk)
         if len(s) != self.b/4: raise Exception("signature length is wrong")
         if len(pk) != self.b/8: raise Exception("public-key length is wrong")
         R = self.decodepoint(s[0:self.b/8])
@@ -173,32 +172,151 @@ class Ed25519(object):
         S = self.decodeint(s[self.b/8:self.b/4])
         h = self.Hint(self.encodepoint(R) + pk + m)
         #if scalarmult(B,S) != edwards(R,scalarmult(A,h)):
-        if mul(S, self.bp, self.curve) != self.curve.add_points(R, mul(h, A, self.curve)):
+        if self.scalarmult(S, self.bp) != self.curve.add_points(R, self.scalarmult(h, A)):
             raise Exception("signature does not pass verification")
 
+    def checkvalid_fast(self, s, m, pk):
+        """Same as checkvalid() but R is never decompressed. Instead
+        [S]B - [h]A is computed with a double-scalar multiplication and
+        compared with R in encoded form.
+
+        As in ref10, S must be less than L. h is only reduced mod
+        cofactor * L, so a public key with a torsion component gives the
+        same answer as checkvalid().
+        """
+
+        if len(s) != self.b/4: raise Exception("signature length is wrong")
+        if len(pk) != self.b/8: raise Exception("public-key length is wrong")
+        A = self.decodepoint(pk)
+        S = self.decodeint(s[self.b/8:self.b/4])
+        if S >= self.L: raise Exception("signature S out of range")
+        h = self.Hint(s[0:self.b/8] + pk + m) % (self.cofactor * self.L)
+
+        R = mul2_extended(S, self.curve.affine_to_extended(self.bp),
+                          h, self.curve.affine_to_extended(self.curve.invert_point(A)),
+                          self.curve)
+
+        if self.encodepoint(self.curve.extended_to_affine(R)) != s[0:self.b/8]:
+            raise Exception("signature does not pass verification")
+
+
 class Ed41417(Ed25519):
 
+    name = 'ed41417'
     L = 2**411 - 33364140863755142520810177694098385178984727200411208589594759
     b = 416
 
-    def __init__(self):
-        field = Field(2**414 - 17)
-        ed41417 = EdwardsCurve(1, 3617, field)
-
-        self.curve = ed41417
-        self.bp = (17319886477121189177719202498822615443556957307604340815256226171904769976866975908866528699294134494857887698432266169206165, 34)
+    curve = registry.Lazy('curve41417')
+    scalars = registry.Lazy('ed41417.scalars')
+    bp = (17319886477121189177719202498822615443556957307604340815256226171904769976866975908866528699294134494857887698432266169206165, 34)
 
-    def generate_key_pair_from_seed(self, sk):
-        h = hashlib.sha512(sk).digest()
-        priv = h[0:52]
-        priv = map(ord, priv)
-        priv[0] &= 248
-        priv[51] &= 127
-        priv[51] |= 64
-        priv = le2int(''.join(map(chr,priv)))
-
-        pub = mul(priv, self.bp, self.curve)
-        return (pub, priv)
+    base_table_name = 'ed41417.base_table'
 
     def generate_random_k_from_seed(self, sk):
         return hashlib.sha512('seed' + sk).digest()[:52]
+
+
+class SigningKey(object):
+    """An Ed25519 secret key, with the secret scalar, the nonce prefix
+    and the encoded public key derived once.
+
+    sig = SigningKey(seed).sign(m)
+    """
+
+    def __init__(self, sk, ed=None):
+        self.ed = ed or Ed25519()
+        self.a, self.prefix = self.ed.expand(sk)
+        self.A = self.ed.scalarmult_base(self.a)
+        self.pk = self.ed.encodepoint(self.A)
+
+    def sign(self, m):
+        return self._sign('', m)
+
+    def sign_prehashed(self, digest, context=''):
+        """Ed25519ph signature given the SHA-512 digest of the message."""
+
+        return self._sign(self.ed.dom2(1, context), digest)
+
+    def sign_stream(self, source, context=''):
+        """Ed25519ph signature of a message read incrementally from
+        source, a file object, mmap or iterable of chunks."""
+
+        return self.sign_prehashed(self.ed.prehash(source), context)
+
+    def _sign(self, dom, m):
+        ed = self.ed
+
+        r = ed.scalars.from_le(ed.H(dom + self.prefix + m))
+        R = ed.encodepoint(ed.scalarmult_base(r))
+        S = ed.scalars.reduce(r + ed.Hint(dom + R + self.pk + m) * self.a)
+
+        return R + ed.encodeint(S)
+
+    def verifying_key(self):
+        return VerifyingKey(self.pk, self.ed)
+
+
+class VerifyingKey(object):
+    """An Ed25519 public key, decompressed once and with a table of
+    multiples of -A for verification.
+
+    VerifyingKey(pk).verify(sig, m)
+
+    With cached the table goes through the table cache, so a hot key
+    has its table built once and not after every restart.
+    """
+
+    def __init__(self, pk, ed=None, cached=False):
+        self.ed = ed or Ed25519()
+
+        if len(pk) != self.ed.b/8: raise Exception("public-key length is wrong")
+
+        self.pk = pk
+        self.A = self.ed.decodepoint(pk)
+
+        negA = self.ed.curve.invert_point(self.A)
+        if cached:
+            self.table = tablecache.cached_table(
+                '%s.key.%s' % (self.ed.name, hashlib.sha256(pk).hexdigest()[:32]),
+                self.ed.curve, negA, self.ed.table_bits(),
+                lambda: [Q[:2] for Q in self.ed.precompute(negA)],
+                PointMap(self.ed.curve, 'affine_to_extended'))
+        else:
+            self.table = self.ed.precompute(negA)
+
+    def verify(self, s, m):
+        """Raises an exception unless s is a valid signature of m,
+        like Ed25519.checkvalid()."""
+
+        self._verify(s, '', m)
+
+    def verify_prehashed(self, s, digest, context=''):
+        self._verify(s, self.ed.dom2(1, context), digest)
+
+    def verify_stream(self, s, source, context=''):
+        self.verify_prehashed(s, self.ed.prehash(source), context)
+
+    def _verify(self, s, dom, m):
+        ed = self.ed
+
+        if len(s) != ed.b/4: raise Exception("signature length is wrong")
+
+        S = ed.decodeint(s[ed.b/8:ed.b/4])
+        if S >= ed.L: raise Exception("signature S out of range")
+        h = ed.Hint(dom + s[0:ed.b/8] + self.pk + m)
+
+        # [S]B - [h]A == R, compared encoded so R is never decompressed.
+        # A may have a torsion component, so h is only reduced mod the
+        # order of the curve, as in checkvalid_fast().
+        R = ed.curve.add_points_extended(
+            mul_precomputed_extended(S, ed.base_table(), ed.curve),
+            mul_precomputed_extended(h % (ed.cofactor * ed.L), self.table, ed.curve))
+
+        if ed.encodepoint(ed.curve.extended_to_affine(R)) != s[0:ed.b/8]:
+            raise Exception("signature does not pass verification")
+
+
+registry.register('ed25519.base_table', lambda: Ed25519().build_base_table())
+registry.register('ed41417.base_table', lambda: Ed41417().build_base_table())
+registry.register('ed25519.scalars', lambda: field.ScalarField(Ed25519.L))
+registry.register('ed41417.scalars', lambda: field.ScalarField(Ed41417.L))
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""Bulk signing, verification, key generation and ECDH on a process
+pool.
+
+    with executor.Executor(4) as ex:
+        sigs = list(ex.sign_ed25519(sk, messages))
+        ok = list(ex.verify_ed25519(zip(pks, messages, sigs)))
+
+Inputs can be any iterable, including generators. They are cut into
+chunks, the chunks are spread over the pool and the results come back
+in input order. At most max_in_flight chunks are queued at a time, so a
+long input is consumed about as fast as the pool gets through it
+instead of all at once.
+
+The chunk size adapts to the job: it is picked so a chunk takes about
+target_seconds, based on how long the previous chunks took.
+
+With processes=0 (or InlineExecutor) there is no pool, and the chunks
+of max_chunk items are run in this process.
+"""
+
+import collections
+import hashlib
+import itertools
+import multiprocessing
+import time
+
+import ecdh
+import ecdsa
+import eddsa
+import util
+import workers
+
+
+DEFAULT_TABLES = ('ed25519.base_table', 'nistp256.base_table')
+
+
+# The jobs. These run in the workers, on one chunk at a time.
+
+def _sign_ecdsa(curve_obj, private_key, hash_name, messages):
+    nonces = util.scalars(len(messages), curve_obj.order)
+    return [ecdsa.ecdsa_sign_digest(curve_obj, hashlib.new(hash_name, m).digest(), private_key, k)
+            for m, k in zip(messages, nonces)]
+
+
+def _verify_ecdsa(curve_obj, hash_name, items):
+    result = []
+    for public_key, m, sig in items:
+        try:
+            result.append(ecdsa.ecdsa_verify_digest(curve_obj, public_key,
+                                                    hashlib.new(hash_name, m).digest(), sig))
+        except Exception:
+            result.append(False)
+    return result
+
+
+def _sign_ed25519(sk, messages):
+    key = eddsa.SigningKey(sk)
+    return [key.sign(m) for m in messages]
+
+
+def _verify_ed25519(items):
+    result = []
+    for pk, m, sig in items:
+        try:
+            eddsa.VerifyingKey(pk).verify(sig, m)
+            result.append(True)
+        except Exception:
+            result.append(False)
+    return result
+
+
+def _generate_key_pairs(curve_obj, seeds):
+    privates = curve_obj.generate_private_keys(len(seeds))
+    return zip(curve_obj.public_keys(privates), privates)
+
+
+def _ecdh(curve_obj, my_private, peers):
+    return [ecdh.ecdh(curve_obj, my_private, other_public) for other_public in peers]
+
+
+# By name, for callers that pick the job at runtime (see service.py).
+JOBS = {
+    'sign_ecdsa': _sign_ecdsa,
+    'verify_ecdsa': _verify_ecdsa,
+    'sign_ed25519': _sign_ed25519,
+    'verify_ed25519': _verify_ed25519,
+    'generate_key_pairs': _generate_key_pairs,
+    'ecdh': _ecdh,
+    }
+
+
+def _isolated(func, args, chunk):
+    """func on the chunk as (result, None) or (None, exception) per
+    item. If func raises on the chunk it is run again one item at a
+    time, so a bad item only fails itself."""
+
+    try:
+        return [(r, None) for r in func(*(args + (chunk,)))]
+    except Exception:
+        pass
+
+    result = []
+    for item in chunk:
+        try:
+            r, = func(*(args + ([item],)))
+            result.append((r, None))
+        except Exception, e:
+            result.append((None, e))
+    return result
+
+
+def _run(func, args, chunk):
+    start = time.time()
+    result = func(*(args + (chunk,)))
+    return result, time.time() - start
+
+
+class Executor(object):
+    def __init__(self, processes=None, tables=DEFAULT_TABLES, max_in_flight=None,
+                 min_chunk=1, max_chunk=1024, target_seconds=0.05):
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self.processes = processes
+        # util.RandomPool notices the fork, so the workers don't need
+        # reseeding.
+        self.pool = workers.pool(processes, tables) if processes else None
+
+        self.max_in_flight = max_in_flight or 2 * max(processes, 1)
+        self.min_chunk = min_chunk
+        self.max_chunk = max_chunk
+        self.target_seconds = target_seconds
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+
+    def _next_chunk_size(self, seconds_per_item):
+        if seconds_per_item is None:
+            return self.min_chunk
+        if seconds_per_item <= 0:
+            return self.max_chunk
+        return max(self.min_chunk, min(self.max_chunk, int(self.target_seconds / seconds_per_item)))
+
+    def imap(self, func, args, items):
+        """Yields func(*(args + (chunk,))) for chunks of items, flattened
+        and in order. func must be a module level function."""
+
+        items = iter(items)
+
+        if self.pool is None:
+            while True:
+                chunk = list(itertools.islice(items, self.max_chunk))
+                if not chunk:
+                    return
+                for r in func(*(args + (chunk,))):
+                    yield r
+
+        pending = collections.deque()
+        seconds_per_item = None
+
+        while True:
+            while len(pending) < self.max_in_flight:
+                chunk = list(itertools.islice(items, self._next_chunk_size(seconds_per_item)))
+                if not chunk:
+                    break
+                pending.append((len(chunk), self.pool.apply_async(_run, (func, args, chunk))))
+
+            if not pending:
+                return
+
+            size, async_result = pending.popleft()
+            result, seconds = async_result.get()
+
+            # Moving average, so one slow chunk doesn't throw it off.
+            if seconds_per_item is None:
+                seconds_per_item = seconds / size
+            else:
+                seconds_per_item = 0.5 * seconds_per_item + 0.5 * seconds / size
+
+            for r in result:
+                yield r
+
+    def isolated(self, func, args, items):
+        """Like imap, but yields (result, None) or (None, exception) for
+        each item instead of raising."""
+
+        return self.imap(_isolated, (func, args), items)
+
+    def sign_ecdsa(self, curve_obj, private_key, messages, hash_name='sha256'):
+        return self.imap(_sign_ecdsa, (curve_obj, private_key, hash_name), messages)
+
+    def verify_ecdsa(self, curve_obj, items, hash_name='sha256'):
+        """items are (public key, message, signature)."""
+
+        return self.imap(_verify_ecdsa, (curve_obj, hash_name), items)
+
+    def sign_ed25519(self, sk, messages):
+        return self.imap(_sign_ed25519, (sk,), messages)
+
+    def verify_ed25519(self, items):
+        """items are (encoded public key, message, signature)."""
+
+        return self.imap(_verify_ed25519, (), items)
+
+    def generate_key_pairs(self, curve_obj, n):
+        return self.imap(_generate_key_pairs, (curve_obj,), itertools.repeat(None, n))
+
+    def ecdh(self, curve_obj, my_private, peers):
+        return self.imap(_ecdh, (curve_obj, my_private), peers)
+
+
+class InlineExecutor(Executor):
+    """The same interface, but everything runs in this process. For
+    tests and single core machines."""
+
+    def __init__(self, max_chunk=1024):
+        Executor.__init__(self, 0, max_chunk=max_chunk)
@@ -2,11 +2,156 @@
 # Copyright (C) 2015 Björn Edström <be@bjrn.se>
 
 import numbertheory
+import util
+
+
+# Addition chains for exponentiation by a fixed exponent. A chain is a
+# list of steps (i, j): register 0 is the base, and step k computes
+# register k + 1 as the product of registers i and j (a squaring if
+# i == j). The result is the last register.
+#
+# XXX: CPython's pow() runs its own sliding window in C, and a shorter
+# chain run in Python is no faster (python benchmark.py -k pow). So the
+# library uses pow(), and the chains are for counting multiplications
+# and for a port where pow() is not C.
+
+def _window_chain(e, w):
+    """Left to right sliding window with w bit windows."""
+
+    chain = []
+
+    def mul(i, j):
+        chain.append((i, j))
+        return len(chain)
+
+    # The odd powers x^1, x^3, ..., x^(2^w - 1).
+    odd = {1: 0}
+    if w > 1:
+        x2 = mul(0, 0)
+        for v in xrange(3, 1 << w, 2):
+            odd[v] = mul(odd[v - 2], x2)
+
+    acc = None
+    i = e.bit_length() - 1
+    while i >= 0:
+        if not (e >> i) & 1:
+            acc = mul(acc, acc)
+            i -= 1
+            continue
+
+        low = max(i - w + 1, 0)
+        while not (e >> low) & 1:
+            low += 1
+        v = (e >> low) & ((1 << (i - low + 1)) - 1)
+
+        if acc is None:
+            acc = odd[v]
+        else:
+            for k in xrange(i - low + 1):
+                acc = mul(acc, acc)
+            acc = mul(acc, odd[v])
+        i = low - 1
+
+    # Drop the odd powers that were never used.
+    return _prune(chain, acc)
+
+
+def _runs_chain(e):
+    """Exponents with long runs of ones, like p - 2 for 2^255 - 19.
+    x^(2^n - 1) is built from x^(2^(n/2) - 1) (or x^(2^(n-1) - 1) for
+    odd n), much like the inversion in ref10."""
+
+    chain = []
+    ones = {1: 0}
+
+    def mul(i, j):
+        chain.append((i, j))
+        return len(chain)
+
+    def square(r, n):
+        for k in xrange(n):
+            r = mul(r, r)
+        return r
+
+    def all_ones(n):
+        # Halving, so both halves are the same register.
+        if n not in ones:
+            if n % 2:
+                ones[n] = mul(square(all_ones(n - 1), 1), 0)
+            else:
+                half = all_ones(n // 2)
+                ones[n] = mul(square(half, n // 2), half)
+        return ones[n]
+
+    # The runs, most significant first.
+    bits = bin(e)[2:]
+    runs = []
+    for b in bits:
+        if runs and runs[-1][0] == b:
+            runs[-1][1] += 1
+        else:
+            runs.append([b, 1])
+
+    acc = None
+    for b, n in runs:
+        if b == '0':
+            acc = square(acc, n)
+        elif acc is None:
+            acc = all_ones(n)
+        else:
+            acc = mul(square(acc, n), all_ones(n))
+
+    return _prune(chain, acc)
+
+
+def _prune(chain, result):
+    """chain without the steps result doesn't depend on, renumbered."""
+
+    needed = set([result])
+    for k in xrange(result - 1, -1, -1):
+        if k + 1 in needed:
+            needed.update(chain[k])
+
+    number = {0: 0}
+    pruned = []
+    for k, (i, j) in enumerate(chain[:result]):
+        if k + 1 in needed:
+            pruned.append((number[i], number[j]))
+            number[k + 1] = len(pruned)
+
+    return pruned
+
+
+def addition_chain(e):
+    """A short addition chain for e >= 1: the shortest of sliding
+    windows of 1 to 6 bits and the runs of ones chain."""
+
+    if e < 1:
+        raise ValueError('exponent must be positive')
+
+    candidates = [_window_chain(e, w) for w in xrange(1, 7)] + [_runs_chain(e)]
+    return min(candidates, key=len)
+
+
+def chain_pow(x, chain, p):
+    """x^e mod p given the addition_chain() of e."""
+
+    r = [x % p]
+    for i, j in chain:
+        r.append((r[i] * r[j]) % p)
+    return r[-1]
+
 
 class Field(object):
     def __init__(self, p):
         self.p = p
 
+        # Exponent for square roots when p = 3 mod 4.
+        if p % 4 == 3:
+            self.sqrt_exp = (p + 1) // 4
+        else:
+            self.sqrt_exp = None
+
     def add(self, a, b):
         return (a + b) % self.p
 
@@ -22,5 +167,71 @@ class Field(object):
     def div(self, a, b):
         return self.mul(a, self.mul_inv(b))
 
+    def inv_batch(self, values):
+        """Inverts all values using a single inversion (Montgomery's
+        trick) and 3(n-1) multiplications."""
+
+        if not values:
+            return []
+
+        prefix = [values[0] % self.p]
+        for v in values[1:]:
+            prefix.append((prefix[-1] * v) % self.p)
+
+        inv = self.mul_inv(prefix[-1])
+
+        result = [0] * len(values)
+        for i in xrange(len(values) - 1, 0, -1):
+            result[i] = (inv * prefix[i - 1]) % self.p
+            inv = (inv * values[i]) % self.p
+        result[0] = inv
+
+        return result
+
     def normalize(self, n):
         return n % self.p
+
+    def sqrt(self, n):
+        """A square root of n, or None if n is not a square."""
+
+        if self.sqrt_exp is None:
+            roots = numbertheory.sqrt_modp(n, self.p)
+            return roots[0] if roots else None
+
+        n %= self.p
+        x = pow(n, self.sqrt_exp, self.p)
+        if (x * x) % self.p != n:
+            return None
+        return x
+
+
+class ScalarField(Field):
+    """Integers mod the prime order n of a group, for scalars.
+
+    reduce() is the builtin %, which is C code in CPython. (Barrett
+    reduction in Python was measured at about twice as slow.)
+    """
+
+    def __init__(self, n):
+        Field.__init__(self, n)
+
+        self.byte_size = (util.count_bits(n) + 7) // 8
+
+    def reduce(self, x):
+        return x % self.p
+
+    def from_le(self, buf):
+        """A little endian string (like a hash) reduced mod n."""
+
+        return self.reduce(util.le2int(buf))
+
+    def from_be(self, buf):
+        return self.reduce(util.be2int(buf))
+
+    def clamp(self, buf, low_bits, top_bit):
+        """The little endian string buf with the low_bits lowest bits
+        cleared, top_bit set and everything above it cleared. This is
+        the clamping of X25519 and Ed25519 (low_bits 3, top_bit 254).
+        The result is not reduced."""
+
+        return util.le2int(buf) & ((1 << top_bit) - (1 << low_bits)) | (1 << top_bit)
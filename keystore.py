@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""A file of public keys with an index, for many more keys than fit in
+memory as Python ints.
+
+The store is two files. path holds a header and then fixed width
+slots, each a 16 byte key id followed by the encoded public key:
+
+    curve25519: 32 bytes, the x-coordinate (RFC 7748)
+    ed25519: 32 bytes, the Ed25519 point encoding
+    nistp256: 33 bytes, compressed SEC1
+
+path + '.idx' is an open addressing hash table from key id to slot.
+If it is missing, broken or out of date it is rebuilt from the slots.
+A partial slot at the end of path, from an append that did not
+finish, is ignored and overwritten by the next append.
+
+Both files are mapped, nothing is read up front. A key is decoded and
+checked the first time it is looked up, and the most recently used
+ones are cached:
+
+    store = keystore.KeyStore('keys', 'ed25519')
+    ids = store.append(encoded_keys)
+    store[ids[0]].verify(sig, m)
+
+What a lookup returns depends on the scheme. For Ed25519 it is an
+eddsa.VerifyingKey, with its verification table already built. For
+P-256 it is the affine point for ecdsa, and for Curve25519 the
+x-coordinate.
+"""
+
+import collections
+import hashlib
+import mmap
+import os
+import struct
+
+import asymmetric
+import eddsa
+import util
+
+
+ID_SIZE = 16
+
+# magic, version, scheme, slot width
+HEADER = struct.Struct('<4sHHI')
+MAGIC = 'ECKS'
+
+# magic, version, capacity, number of keys indexed
+INDEX_HEADER = struct.Struct('<4sHxxII')
+INDEX_MAGIC = 'ECKI'
+
+VERSION = 1
+
+SLOT = struct.Struct('<I')
+
+
+def _decode_curve25519(encoded):
+    # RFC 7748 ignores the top bit.
+    return util.le2int(encoded) & ((1 << 255) - 1)
+
+
+def _decode_ed25519(encoded):
+    return eddsa.VerifyingKey(encoded)
+
+
+def _decode_nistp256(encoded):
+    return asymmetric.ECC_NISTP256().binary_to_public(encoded)
+
+
+# name: (code in the header, key size, decoder)
+SCHEMES = {
+    'curve25519': (1, 32, _decode_curve25519),
+    'ed25519': (2, 32, _decode_ed25519),
+    'nistp256': (3, 33, _decode_nistp256),
+    }
+
+
+def key_id(encoded):
+    """The default id of a key, a hash of its encoding."""
+
+    return hashlib.sha256(encoded).digest()[:ID_SIZE]
+
+
+def _position(kid, capacity):
+    return struct.unpack_from('<Q', hashlib.sha1(kid).digest())[0] & (capacity - 1)
+
+
+class KeyStore(object):
+    def __init__(self, path, scheme=None, cache_size=256):
+        self.path = path
+        self.cache_size = cache_size
+        self._cache = collections.OrderedDict()
+
+        if not os.path.exists(path):
+            if scheme is None:
+                raise ValueError('scheme needed to create a key store')
+            with open(path, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, SCHEMES[scheme][0], ID_SIZE + SCHEMES[scheme][1]))
+
+        self._file = open(path, 'r+b')
+        magic, version, code, self.width = HEADER.unpack(self._file.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a key store')
+
+        for name, (c, size, decode) in SCHEMES.iteritems():
+            if c == code:
+                self.scheme = name
+                self._decode = decode
+        if scheme is not None and scheme != self.scheme:
+            raise ValueError('key store is for %s, not %s' % (self.scheme, scheme))
+        if self.width != ID_SIZE + SCHEMES[self.scheme][1]:
+            raise ValueError('bad slot width')
+
+        self._map_data()
+        self._open_index()
+
+    def _map_data(self):
+        self._file.seek(0, os.SEEK_END)
+        size = self._file.tell()
+        self.count = (size - HEADER.size) // self.width
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    # The index
+
+    def _open_index(self):
+        path = self.path + '.idx'
+        # Too short for a header (or empty, which mmap refuses) means a
+        # broken index, rebuild it.
+        if os.path.exists(path) and os.path.getsize(path) >= INDEX_HEADER.size:
+            self._index_file = open(path, 'r+b')
+            self._index = mmap.mmap(self._index_file.fileno(), 0)
+            magic, version, self.capacity, count = INDEX_HEADER.unpack_from(self._index, 0)
+            if magic == INDEX_MAGIC and version == VERSION and count == self.count and \
+                    len(self._index) == INDEX_HEADER.size + SLOT.size * self.capacity:
+                return
+            self._index.close()
+            self._index_file.close()
+
+        self._build_index(max(16, 4 * self.count))
+
+    def _build_index(self, capacity):
+        # Power of two, at most half full.
+        capacity = 1 << util.count_bits(capacity - 1)
+        path = self.path + '.idx'
+
+        with open(path, 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, VERSION, capacity, 0))
+            f.write('\0' * SLOT.size * capacity)
+
+        self._index_file = open(path, 'r+b')
+        self._index = mmap.mmap(self._index_file.fileno(), 0)
+        self.capacity = capacity
+
+        for slot in xrange(self.count):
+            self._insert(self.key_id(slot), slot)
+        self._set_index_count(self.count)
+
+    def _set_index_count(self, count):
+        INDEX_HEADER.pack_into(self._index, 0, INDEX_MAGIC, VERSION, self.capacity, count)
+
+    def _probe(self, kid):
+        """(position in the index, slot or None) for kid."""
+
+        pos = _position(kid, self.capacity)
+        while True:
+            entry, = SLOT.unpack_from(self._index, INDEX_HEADER.size + SLOT.size * pos)
+            if entry == 0:
+                return pos, None
+            if self.key_id(entry - 1) == kid:
+                return pos, entry - 1
+            pos = (pos + 1) & (self.capacity - 1)
+
+    def _insert(self, kid, slot):
+        pos, existing = self._probe(kid)
+        if existing is not None:
+            raise ValueError('duplicate key id')
+        SLOT.pack_into(self._index, INDEX_HEADER.size + SLOT.size * pos, slot + 1)
+
+    # Slots
+
+    def __len__(self):
+        return self.count
+
+    def _offset(self, slot):
+        if not 0 <= slot < self.count:
+            raise IndexError('slot out of range')
+        return HEADER.size + self.width * slot
+
+    def key_id(self, slot):
+        offset = self._offset(slot)
+        return self._data[offset:offset + ID_SIZE]
+
+    def encoded(self, slot):
+        offset = self._offset(slot) + ID_SIZE
+        return self._data[offset:offset + self.width - ID_SIZE]
+
+    def slot(self, kid):
+        pos, slot = self._probe(kid)
+        if slot is None:
+            raise KeyError(kid)
+        return slot
+
+    def __contains__(self, kid):
+        return self._probe(kid)[1] is not None
+
+    def ids(self):
+        for slot in xrange(self.count):
+            yield self.key_id(slot)
+
+    # Lookups
+
+    def get_slot(self, slot):
+        """The decoded key in slot. Raises ValueError (or the decoder's
+        exception) for an invalid key."""
+
+        try:
+            key = self._cache.pop(slot)
+        except KeyError:
+            key = self._decode(self.encoded(slot))
+            if len(self._cache) >= self.cache_size:
+                self._cache.popitem(last=False)
+
+        self._cache[slot] = key
+        return key
+
+    def __getitem__(self, kid):
+        return self.get_slot(self.slot(kid))
+
+    def get(self, kid, default=None):
+        pos, slot = self._probe(kid)
+        if slot is None:
+            return default
+        return self.get_slot(slot)
+
+    # Appending
+
+    def append(self, keys, ids=None):
+        """Appends the encoded keys, with ids (default key_id() of each
+        key). Returns the ids. Nothing is written if a key has the wrong
+        size or an id is already taken."""
+
+        keys = list(keys)
+        ids = [key_id(k) for k in keys] if ids is None else list(ids)
+
+        if len(ids) != len(keys):
+            raise ValueError('need one id per key')
+        for kid, k in zip(ids, keys):
+            if len(kid) != ID_SIZE or len(k) != self.width - ID_SIZE:
+                raise ValueError('wrong key or id size')
+        if len(set(ids)) != len(ids) or any(kid in self for kid in ids):
+            raise ValueError('duplicate key id')
+
+        # After the last whole slot. Anything past it is a partial slot
+        # from an append that did not finish, and is dropped.
+        first = self.count
+        end = HEADER.size + self.width * first
+        self._data.close()
+        self._file.truncate(end)
+        self._file.seek(end)
+        self._file.write(''.join(kid + k for kid, k in zip(ids, keys)))
+        self._file.flush()
+        self._map_data()
+
+        if 2 * self.count > self.capacity:
+            self._index.close()
+            self._index_file.close()
+            self._build_index(4 * self.count)
+        else:
+            for i, kid in enumerate(ids):
+                self._insert(kid, first + i)
+            self._set_index_count(self.count)
+
+        return ids
+
+    def flush(self):
+        self._index.flush()
+
+    def close(self):
+        self.flush()
+        self._data.close()
+        self._index.close()
+        self._file.close()
+        self._index_file.close()
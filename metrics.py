@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""Latency histograms and counters for the protocol level functions,
+by curve, exported in the Prometheus text format.
+
+    metrics.enable()
+    ...
+    metrics.dump('/var/lib/node_exporter/ecc.prom')
+    server = metrics.serve('/tmp/ecc-metrics.sock')
+
+enable() wraps ECDSA signing and verification, ECDH, key generation
+and EdDSA signing and verification (ecdsa_sign, ecdsa_verify, ecdh,
+keygen, eddsa_sign, eddsa_verify) with timing wrappers. It also counts
+hits and misses of the key store cache, the table cache and ECDSA nonce
+pools (a miss is a take() that found the pool empty). disable()
+puts the original functions back, so when metrics are off the hot path
+is exactly what it was.
+
+An error is an exception, or a verification that returned False.
+
+The histograms are HDR style: 16 buckets per power of two nanoseconds,
+so any recorded value is within about 6% and a histogram is a small
+dict however many values go into it.
+"""
+
+import os
+import SocketServer
+import tempfile
+import threading
+import time
+
+import asymmetric
+import ecdh
+import ecdsa
+import eddsa
+import keystore
+import noncepool
+import tablecache
+
+
+SUB_BITS = 4
+SUB_COUNT = 1 << SUB_BITS
+
+
+def bucket_index(value):
+    """The bucket of the non-negative integer value."""
+
+    if value < 2 * SUB_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BITS - 1
+    return 2 * SUB_COUNT + (shift - 1) * SUB_COUNT + (value >> shift) - SUB_COUNT
+
+
+def bucket_bounds(index):
+    """The values [low, high) in bucket index."""
+
+    if index < 2 * SUB_COUNT:
+        return index, index + 1
+    shift = (index - 2 * SUB_COUNT) // SUB_COUNT + 1
+    top = SUB_COUNT + (index - 2 * SUB_COUNT) % SUB_COUNT
+    return top << shift, (top + 1) << shift
+
+
+class Histogram(object):
+    """Latencies in seconds, kept as nanoseconds."""
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.sum = 0.0
+
+    def record(self, seconds):
+        i = bucket_index(max(0, int(seconds * 1e9)))
+        self.counts[i] = self.counts.get(i, 0) + 1
+        self.count += 1
+        self.sum += seconds
+
+    def percentile(self, q):
+        """The latency in seconds that a fraction q of the values are
+        at or below, to the precision of the buckets."""
+
+        if not self.count:
+            return 0.0
+
+        seen = 0
+        for i in sorted(self.counts):
+            seen += self.counts[i]
+            if seen >= q * self.count:
+                break
+        return (bucket_bounds(i)[1] - 1) / 1e9
+
+    def cumulative(self, bounds):
+        """The number of values below each of bounds, in nanoseconds.
+        Exact if the bounds are powers of two."""
+
+        result = []
+        for bound in bounds:
+            result.append(sum(n for i, n in self.counts.iteritems()
+                              if bucket_bounds(i)[1] <= bound))
+        return result
+
+
+class _Stats(object):
+    def __init__(self):
+        self.histogram = Histogram()
+        self.errors = 0
+
+
+_lock = threading.Lock()
+_operations = {}
+_caches = {}
+
+
+def reset():
+    with _lock:
+        _operations.clear()
+        _caches.clear()
+
+
+def _observe(op, curve_name, seconds, error):
+    with _lock:
+        key = (op, curve_name)
+        stats = _operations.get(key)
+        if stats is None:
+            stats = _operations[key] = _Stats()
+        stats.histogram.record(seconds)
+        if error:
+            stats.errors += 1
+
+
+def _cache(name, hit):
+    with _lock:
+        hits, misses = _caches.get(name, (0, 0))
+        _caches[name] = (hits + 1, misses) if hit else (hits, misses + 1)
+
+
+def histogram(op, curve_name):
+    """The Histogram of op on curve_name, or None."""
+
+    with _lock:
+        stats = _operations.get((op, curve_name))
+        return stats and stats.histogram
+
+
+def snapshot():
+    """{(op, curve): {'calls', 'errors', 'p50', 'p99'}} and
+    {cache: (hits, misses)}."""
+
+    with _lock:
+        ops = dict((key, {'calls': s.histogram.count, 'errors': s.errors,
+                          'p50': s.histogram.percentile(0.5),
+                          'p99': s.histogram.percentile(0.99)})
+                   for key, s in _operations.iteritems())
+        return ops, dict(_caches)
+
+
+# The wrappers
+
+def _curve_name(obj):
+    name = type(obj).__name__
+    if name.startswith('ECC_'):
+        name = name[4:]
+    return name.lower()
+
+
+def _timed(func, op, label):
+    def wrapper(*args, **kwargs):
+        start = time.time()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            _observe(op, label(args), time.time() - start, True)
+            raise
+        _observe(op, label(args), time.time() - start, result is False)
+        return result
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+def _keystore_get_slot(func):
+    def get_slot(self, slot):
+        _cache('keystore', slot in self._cache)
+        return func(self, slot)
+    return get_slot
+
+
+def _noncepool_take(func):
+    def take(self):
+        _cache('noncepool', not self._queue.empty())
+        return func(self)
+    return take
+
+
+def _tablecache_cached_table(func):
+    def cached_table(name, curve, P, count, build, convert):
+        built = []
+
+        def counting_build():
+            built.append(1)
+            return build()
+
+        table = func(name, curve, P, count, counting_build, convert)
+        _cache('tablecache', not built)
+        return table
+    return cached_table
+
+
+by_first = lambda args: _curve_name(args[0])
+by_ed = lambda args: _curve_name(args[0].ed)
+
+# (owner, attribute, wrap)
+WRAPPED = [
+    (ecdsa, '_sign_hash', lambda f: _timed(f, 'ecdsa_sign', by_first)),
+    (ecdsa, '_verify_hash', lambda f: _timed(f, 'ecdsa_verify', by_first)),
+    (ecdh, 'ecdh', lambda f: _timed(f, 'ecdh', by_first)),
+    (asymmetric.ECCBase, 'generate_key_pair', lambda f: _timed(f, 'keygen', by_first)),
+    (eddsa.Ed25519, 'publickey', lambda f: _timed(f, 'keygen', by_first)),
+    (eddsa.Ed25519, 'generate_key_pair_from_seed', lambda f: _timed(f, 'keygen', by_first)),
+    (eddsa.Ed25519, 'sign', lambda f: _timed(f, 'eddsa_sign', by_first)),
+    (eddsa.Ed25519, 'signature', lambda f: _timed(f, 'eddsa_sign', by_first)),
+    (eddsa.SigningKey, '_sign', lambda f: _timed(f, 'eddsa_sign', by_ed)),
+    (eddsa.Ed25519, 'checkvalid', lambda f: _timed(f, 'eddsa_verify', by_first)),
+    (eddsa.Ed25519, 'checkvalid_fast', lambda f: _timed(f, 'eddsa_verify', by_first)),
+    (eddsa.VerifyingKey, '_verify', lambda f: _timed(f, 'eddsa_verify', by_ed)),
+    (keystore.KeyStore, 'get_slot', _keystore_get_slot),
+    (noncepool.NoncePool, 'take', _noncepool_take),
+    (tablecache, 'cached_table', _tablecache_cached_table),
+    ]
+
+_originals = []
+
+
+def enabled():
+    return bool(_originals)
+
+
+def enable():
+    with _lock:
+        if _originals:
+            return
+        for owner, name, wrap in WRAPPED:
+            # The function itself, not an unbound method.
+            original = vars(owner)[name]
+            _originals.append((owner, name, original))
+            setattr(owner, name, wrap(original))
+
+
+def disable():
+    with _lock:
+        while _originals:
+            owner, name, original = _originals.pop()
+            setattr(owner, name, original)
+
+
+# Export
+
+# Histogram buckets: powers of two from about 1 us to 17 s.
+BUCKETS = [1 << i for i in xrange(10, 35)]
+
+
+def _labels(**labels):
+    return '{%s}' % ','.join('%s="%s"' % item for item in sorted(labels.items()))
+
+
+def prometheus():
+    """Everything in the Prometheus text format."""
+
+    with _lock:
+        operations = sorted(_operations.items())
+        caches = sorted(_caches.items())
+
+        lines = [
+            '# HELP ecc_operation_seconds Latency of curve operations.',
+            '# TYPE ecc_operation_seconds histogram',
+            ]
+        for (op, curve_name), stats in operations:
+            h = stats.histogram
+            for bound, n in zip(BUCKETS, h.cumulative(BUCKETS)):
+                lines.append('ecc_operation_seconds_bucket%s %d' % (
+                    _labels(op=op, curve=curve_name, le='%.9g' % (bound / 1e9)), n))
+            lines.append('ecc_operation_seconds_bucket%s %d' % (
+                _labels(op=op, curve=curve_name, le='+Inf'), h.count))
+            lines.append('ecc_operation_seconds_sum%s %.9g' % (_labels(op=op, curve=curve_name), h.sum))
+            lines.append('ecc_operation_seconds_count%s %d' % (_labels(op=op, curve=curve_name), h.count))
+
+        lines += [
+            '# HELP ecc_operation_errors_total Failed curve operations.',
+            '# TYPE ecc_operation_errors_total counter',
+            ]
+        for (op, curve_name), stats in operations:
+            lines.append('ecc_operation_errors_total%s %d' % (
+                _labels(op=op, curve=curve_name), stats.errors))
+
+        lines += [
+            '# HELP ecc_cache_hits_total Cache hits.',
+            '# TYPE ecc_cache_hits_total counter',
+            ]
+        lines += ['ecc_cache_hits_total%s %d' % (_labels(cache=name), hits)
+                  for name, (hits, misses) in caches]
+        lines += [
+            '# HELP ecc_cache_misses_total Cache misses.',
+            '# TYPE ecc_cache_misses_total counter',
+            ]
+        lines += ['ecc_cache_misses_total%s %d' % (_labels(cache=name), misses)
+                  for name, (hits, misses) in caches]
+
+    return '\n'.join(lines) + '\n'
+
+
+def dump(path):
+    """Writes prometheus() to path, atomically so a collector never
+    sees half a file."""
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(prometheus())
+        os.chmod(tmp, 0644)
+        os.rename(tmp, path)
+    except Exception:
+        os.unlink(tmp)
+        raise
+
+
+class _Handler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        self.wfile.write(prometheus())
+
+
+class MetricsServer(SocketServer.UnixStreamServer):
+    """Writes prometheus() to every connection on the Unix socket
+    path, then closes it."""
+
+    def __init__(self, path):
+        if os.path.exists(path):
+            os.unlink(path)
+        SocketServer.UnixStreamServer.__init__(self, path, _Handler)
+        self.path = path
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def serve(path):
+    """A MetricsServer on path, running in a background thread. Stop it
+    with shutdown() and server_close()."""
+
+    server = MetricsServer(path)
+    thread = threading.Thread(target=server.serve_forever, name='metrics')
+    thread.daemon = True
+    thread.start()
+    return server
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""Precomputed ECDSA nonces, so that signing a message is a couple of
+multiplications mod n instead of a point multiplication and an
+inversion.
+
+    pool = noncepool.NoncePool(curve_obj)
+    sig = ecdsa.ecdsa_sign_digest(curve_obj, digest, private_key, pool=pool)
+    ...
+    pool.close()
+
+A background thread keeps a bounded queue of (k, k^-1 mod n, r)
+triples full, batch at a time (see ecdsa.ecdsa_presign). take() removes
+a triple from the queue, so every nonce is handed out exactly once. If
+the queue is empty, take() computes a triple itself rather than wait,
+and counts the pool as depleted.
+
+The pool drops its triples if the process id changes, so a forked
+child never signs with a nonce its parent also has.
+
+XXX: Because of the GIL the thread does not make a busy signer any
+faster. It uses the time a signer spends waiting for requests, so the
+signing itself is quick. For more throughput use more processes.
+
+XXX: The triples are as secret as the private key. They are only ever
+in memory.
+"""
+
+import os
+import Queue
+import threading
+import time
+
+import ecdsa
+
+
+# Held while a pool restarts after a fork. Not per pool, the pool's own
+# lock is replaced by the restart.
+_fork_lock = threading.Lock()
+
+
+class NoncePool(object):
+    def __init__(self, curve_obj, size=256, batch=16):
+        self.curve_obj = curve_obj
+        self.size = size
+        self.batch = batch
+
+        self._closed = threading.Event()
+        self._start()
+
+    def _start(self):
+        self._queue = Queue.Queue(self.size)
+        self._lock = threading.Lock()
+        self._stats = {
+            'produced': 0,
+            'taken': 0,
+            'depleted': 0,
+            'busy': 0.0,
+            }
+        # Last, so a thread that sees the new pid sees the new queue.
+        self._pid = os.getpid()
+
+        self._thread = threading.Thread(target=self._fill, name='noncepool')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _fill(self):
+        while not self._closed.is_set():
+            start = time.time()
+            triples = ecdsa.ecdsa_presign(self.curve_obj, self.batch)
+            with self._lock:
+                self._stats['busy'] += time.time() - start
+
+            for triple in triples:
+                while True:
+                    if self._closed.is_set() or self._pid != os.getpid():
+                        return
+                    try:
+                        self._queue.put(triple, timeout=0.1)
+                        break
+                    except Queue.Full:
+                        pass
+                with self._lock:
+                    self._stats['produced'] += 1
+
+    def take(self):
+        """A (k, k^-1 mod n, r) that nobody else gets."""
+
+        if self._pid != os.getpid():
+            # The thread did not survive the fork, and the triples in
+            # the queue are the parent's. Only one thread restarts it.
+            with _fork_lock:
+                if self._pid != os.getpid():
+                    self._start()
+
+        try:
+            triple = self._queue.get_nowait()
+            depleted = 0
+        except Queue.Empty:
+            triple, = ecdsa.ecdsa_presign(self.curve_obj)
+            depleted = 1
+
+        with self._lock:
+            self._stats['taken'] += 1
+            self._stats['depleted'] += depleted
+
+        return triple
+
+    def available(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        """produced, taken, depleted (takes that found the queue empty),
+        available, refill_rate (triples per second of filling) and
+        depletion_rate (fraction of takes that found it empty)."""
+
+        with self._lock:
+            s = dict(self._stats)
+
+        s['available'] = self.available()
+        s['refill_rate'] = s['produced'] / s['busy'] if s['busy'] else 0.0
+        s['depletion_rate'] = float(s['depleted']) / s['taken'] if s['taken'] else 0.0
+        del s['busy']
+
+        return s
+
+    def close(self):
+        """Stops the thread and throws away the triples not taken."""
+
+        self._closed.set()
+        self._thread.join()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except Queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
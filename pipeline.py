@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""Streaming verification of (public key, message, signature) records.
+
+Two record formats are supported:
+
+  lines: one record per line, the three fields hex encoded and
+         separated by whitespace.
+  binary: the three fields back to back, each prefixed by its length
+          as a 4 byte big endian integer.
+
+The fields are the raw 32 byte public key and 64 byte signature for
+Ed25519. For ECDSA they are a SEC1 public key and a DER signature.
+
+Everything is a generator, reading bufsize bytes at a time, so only
+about one chunk (plus what the executor has in flight) is in memory:
+
+    records = pipeline.binary_records(pipeline.read_chunks(f))
+    for i, ok in pipeline.verify(records, 'ed25519'):
+        ...
+
+Passing an executor.Executor to verify() decodes and verifies the
+records on a process pool.
+
+Run as python pipeline.py [--format lines|binary] [--scheme ...] < file
+"""
+
+import argparse
+import hashlib
+import mmap
+import struct
+import sys
+
+import asymmetric
+import blobs
+import ecdsa
+import eddsa
+import executor
+
+
+LENGTH = struct.Struct('>I')
+
+# Largest field accepted in binary records.
+MAX_FIELD = 1 << 20
+
+# Longest line accepted in line records: three hex encoded fields.
+MAX_LINE = 3 * (2 * MAX_FIELD + 1)
+
+
+def read_chunks(source, bufsize=2**16):
+    """Yields source bufsize bytes at a time. source is a string,
+    bytearray, buffer, mmap, file object or an iterable of strings."""
+
+    if isinstance(source, (str, buffer, mmap.mmap)):
+        for offset in xrange(0, len(source), bufsize):
+            yield source[offset:offset + bufsize]
+    elif isinstance(source, bytearray):
+        for offset in xrange(0, len(source), bufsize):
+            yield str(source[offset:offset + bufsize])
+    elif hasattr(source, 'read'):
+        while True:
+            data = source.read(bufsize)
+            if not data:
+                return
+            yield data
+    else:
+        for data in source:
+            yield data
+
+
+def lines(chunks, max_line=MAX_LINE):
+    """Yields the lines in chunks, without line endings. Raises
+    ValueError for a line longer than max_line bytes."""
+
+    # The pieces of the current line, joined when its newline arrives.
+    pending = []
+    size = 0
+
+    for chunk in chunks:
+        parts = chunk.split('\n')
+        rest = parts.pop()
+
+        if parts:
+            pending.append(parts[0])
+            parts[0] = ''.join(pending)
+            pending, size = [], 0
+
+        for line in parts:
+            if len(line) > max_line:
+                raise ValueError('line too long')
+            yield line.rstrip('\r')
+
+        pending.append(rest)
+        size += len(rest)
+        if size > max_line:
+            raise ValueError('line too long')
+
+    rest = ''.join(pending)
+    if rest:
+        yield rest.rstrip('\r')
+
+
+def line_records(chunks):
+    """Records in the lines format. Blank lines are skipped."""
+
+    for line in lines(chunks):
+        fields = line.split()
+        if not fields:
+            continue
+        try:
+            yield tuple(f.decode('hex') for f in fields)
+        except TypeError:
+            # Let it fail verification rather than stop the stream.
+            yield tuple(fields)
+
+
+def binary_records(chunks, max_field=MAX_FIELD):
+    """Records in the binary format. Raises ValueError for a truncated
+    stream or a field larger than max_field."""
+
+    buf = ''
+    pos = 0
+    fields = []
+
+    for chunk in chunks:
+        buf = buf[pos:] + chunk
+        pos = 0
+
+        while True:
+            if len(buf) - pos < LENGTH.size:
+                break
+            n, = LENGTH.unpack_from(buf, pos)
+            if n > max_field:
+                raise ValueError('field too large')
+            if len(buf) - pos - LENGTH.size < n:
+                break
+
+            fields.append(buf[pos + LENGTH.size:pos + LENGTH.size + n])
+            pos += LENGTH.size + n
+
+            if len(fields) == 3:
+                yield tuple(fields)
+                fields = []
+
+    if fields or pos != len(buf):
+        raise ValueError('truncated record')
+
+
+def encode_binary_record(pk, message, sig):
+    return ''.join(LENGTH.pack(len(f)) + f for f in (pk, message, sig))
+
+
+def encode_line_record(pk, message, sig):
+    return '%s %s %s\n' % (pk.encode('hex'), message.encode('hex'), sig.encode('hex'))
+
+
+# The verification jobs, run by the executor on a chunk of records.
+
+def _verify_ed25519_records(records):
+    result = []
+    for record in records:
+        try:
+            pk, message, sig = record
+            eddsa.VerifyingKey(pk).verify(sig, message)
+            result.append(True)
+        except Exception:
+            result.append(False)
+    return result
+
+
+def _verify_ecdsa_records(curve_obj, hash_name, records):
+    result = []
+    for record in records:
+        try:
+            pk, message, sig = record
+            public_key = curve_obj.binary_to_public(pk)
+            signature = blobs.x963.decode_der_dsa_sig(sig)
+        except ValueError:
+            result.append(False)
+            continue
+        result.append(ecdsa.ecdsa_verify_digest(
+            curve_obj, public_key, hashlib.new(hash_name, message).digest(), signature))
+    return result
+
+
+def verify(records, scheme='ed25519', executor_obj=None, curve_obj=None, hash_name='sha256'):
+    """Yields (record number, True/False) for every record, in order.
+
+    scheme is 'ed25519' or 'ecdsa', the latter with curve_obj (for
+    example asymmetric.ECC_NISTP256()) and the hashlib name hash_name.
+    """
+
+    ex = executor_obj or executor.InlineExecutor()
+
+    if scheme == 'ed25519':
+        results = ex.imap(_verify_ed25519_records, (), records)
+    elif scheme == 'ecdsa':
+        results = ex.imap(_verify_ecdsa_records, (curve_obj, hash_name), records)
+    else:
+        raise ValueError('unknown scheme %r' % scheme)
+
+    return enumerate(results)
+
+
+CURVES = {
+    'nistp256': asymmetric.ECC_NISTP256,
+    'nistp384': asymmetric.ECC_NISTP384,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Verify a stream of signature records.')
+    parser.add_argument('file', nargs='?', help='input file, default stdin')
+    parser.add_argument('--format', choices=['lines', 'binary'], default='lines')
+    parser.add_argument('--scheme', choices=['ed25519'] + sorted('ecdsa-' + c for c in CURVES),
+                        default='ed25519')
+    parser.add_argument('--hash', default='sha256')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='verify on a process pool of this size')
+    args = parser.parse_args(argv)
+
+    source = open(args.file, 'rb') if args.file else sys.stdin
+    split = line_records if args.format == 'lines' else binary_records
+    records = split(read_chunks(source))
+
+    ex = executor.Executor(args.processes) if args.processes else None
+    if args.scheme == 'ed25519':
+        results = verify(records, 'ed25519', ex)
+    else:
+        results = verify(records, 'ecdsa', ex, CURVES[args.scheme[6:]](), args.hash)
+
+    total = bad = 0
+    for i, ok in results:
+        total += 1
+        if not ok:
+            bad += 1
+            print 'record %d: BAD' % i
+
+    if ex is not None:
+        ex.close()
+
+    print '%d records, %d bad' % (total, bad)
+    return 1 if bad else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""Named curves, constants and tables, built on first use.
+
+Building a curve is not free (the Edwards constructors run sqrt_modp,
+Ed25519 needs a division for d) and the base point tables are a lot
+worse, so nothing is built when a module is imported. Instead
+
+    registry.register('name', builder)
+
+records how to build something and registry.get('name') builds it once
+and caches it. As a class attribute
+
+    class ECC_Foo(ECCBase):
+        curve = registry.Lazy('foo')
+
+does the same thing on attribute access.
+"""
+
+import threading
+
+import curve
+import field
+
+
+_builders = {}
+_cache = {}
+
+# Reentrant since builders look up other names.
+_lock = threading.RLock()
+
+
+def register(name, builder):
+    """builder() is called with no arguments the first time name is
+    looked up."""
+
+    _builders[name] = builder
+    _cache.pop(name, None)
+
+
+def get(name):
+    try:
+        return _cache[name]
+    except KeyError:
+        pass
+
+    builder = _builders[name]
+
+    with _lock:
+        if name not in _cache:
+            _cache[name] = builder()
+        return _cache[name]
+
+
+def put(name, value):
+    """Sets an already built value, for example one loaded from disk."""
+
+    _cache[name] = value
+
+
+def built():
+    """Names of everything built so far."""
+
+    return sorted(_cache)
+
+
+class Lazy(object):
+    """Class attribute that looks up name in the registry."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, cls):
+        return get(self.name)
+
+
+register('curve25519', lambda: curve.MontgomeryCurve(
+    486662, 1, field.Field(2**255 - 19)))
+
+register('ed25519', lambda: curve.TwistedEdwardsCurve(
+    -1, field.Field(2**255 - 19).div(-121665, 121666), field.Field(2**255 - 19)))
+
+register('nistp256', lambda: curve.ShortWeierstrass(
+    -3, 41058363725152142129326129780047268409114441015993725554835256314039467401291L,
+    field.Field(2**256 - 2**224 + 2**192 + 2**96 - 1)))
+
+register('nistp384', lambda: curve.ShortWeierstrass(
+    -3, 27580193559959705877849011840389048093056905856361568521428707301988689241309860865136260764883745107765439761230575L,
+    field.Field(2**384 - 2**128 - 2**96 + 2**32 - 1)))
+
+register('curve41417', lambda: curve.EdwardsCurve(1, 3617, field.Field(2**414 - 17)))
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""Micro-batching front end for signing and verification.
+
+Callers submit single requests and get a Future back right away. A
+background thread collects requests and hands them to an executor in
+batches, flushing when max_batch requests are waiting or when the
+oldest one has waited max_delay seconds, whichever comes first. So
+max_delay bounds the added latency and max_batch the batch size.
+
+    batcher = service.Batcher(executor.Executor(4))
+    future = batcher.verify_ed25519(pk, message, sig)
+    ok = future.result()
+
+UnixServer puts the same thing behind a Unix socket, one JSON request
+per line:
+
+    {"op": "verify_ed25519", "pk": <hex>, "msg": <hex>, "sig": <hex>}
+    {"op": "verify_ecdsa", "curve": "nistp256", "public": <SEC1 hex>,
+     "msg": <hex>, "sig": <DER hex>}
+    {"op": "sign_ed25519", "sk": <hex>, "msg": <hex>}
+    {"op": "metrics"}
+
+Each request gets its own result: a malformed request fails (or, for
+verification, comes back False) without failing the requests batched
+with it.
+
+XXX: There is no asyncio in Python 2, so this is threads and blocking
+futures.
+"""
+
+import json
+import os
+import Queue
+import socket
+import SocketServer
+import threading
+import time
+
+import asymmetric
+import blobs
+import executor
+
+
+class Future(object):
+    """The result of a request, available once it has been processed.
+    Mostly like concurrent.futures.Future."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def done(self):
+        return self._event.is_set()
+
+    def result(self, timeout=None):
+        if not self._event.wait(timeout):
+            raise RuntimeError('timed out')
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout=None):
+        if not self._event.wait(timeout):
+            raise RuntimeError('timed out')
+        return self._exception
+
+    def add_done_callback(self, fn):
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn(self)
+
+    def _resolve(self, result, exception):
+        with self._lock:
+            self._result = result
+            self._exception = exception
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            fn(self)
+
+    def set_result(self, result):
+        self._resolve(result, None)
+
+    def set_exception(self, exception):
+        self._resolve(None, exception)
+
+
+class _Request(object):
+    __slots__ = ['key', 'args', 'item', 'future', 'submitted']
+
+    def __init__(self, key, args, item):
+        self.key = key
+        self.args = args
+        self.item = item
+        self.future = Future()
+        self.submitted = time.time()
+
+
+class Batcher(object):
+    def __init__(self, executor_obj=None, max_batch=64, max_delay=0.005, max_queue=10000):
+        self.executor = executor_obj or executor.InlineExecutor()
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+
+        self.queue = Queue.Queue(max_queue)
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'batches': 0,
+            'flush_size': 0,
+            'flush_deadline': 0,
+            'max_queue_depth': 0,
+            'latency_total': 0.0,
+            }
+
+        self._thread = threading.Thread(target=self._loop, name='batcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    # Requests. Each returns a Future.
+
+    def verify_ed25519(self, pk, message, sig):
+        return self._submit(('verify_ed25519',), (), (pk, message, sig))
+
+    def verify_ecdsa(self, curve_obj, public_key, message, sig, hash_name='sha256'):
+        return self._submit(('verify_ecdsa', type(curve_obj), hash_name),
+                            (curve_obj, hash_name), (public_key, message, sig))
+
+    def sign_ed25519(self, sk, message):
+        return self._submit(('sign_ed25519', sk), (sk,), message)
+
+    def _submit(self, key, args, item):
+        request = _Request(key, args, item)
+        self.queue.put(request)
+
+        depth = self.queue.qsize()
+        with self._metrics_lock:
+            self._metrics['submitted'] += 1
+            self._metrics['max_queue_depth'] = max(self._metrics['max_queue_depth'], depth)
+
+        return request.future
+
+    def close(self):
+        """Processes what is queued and stops the batcher thread."""
+
+        self.queue.put(None)
+        self._thread.join()
+
+    def metrics(self):
+        with self._metrics_lock:
+            m = dict(self._metrics)
+
+        m['queue_depth'] = self.queue.qsize()
+        m['mean_batch_size'] = float(m['completed'] + m['failed']) / m['batches'] if m['batches'] else 0.0
+        m['mean_latency'] = m['latency_total'] / m['completed'] if m['completed'] else 0.0
+        del m['latency_total']
+
+        return m
+
+    def _loop(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                return
+
+            batch = [first]
+            deadline = first.submitted + self.max_delay
+            reason = 'flush_size'
+            stop = False
+
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.time()
+                try:
+                    if remaining <= 0:
+                        request = self.queue.get_nowait()
+                    else:
+                        request = self.queue.get(timeout=remaining)
+                except Queue.Empty:
+                    reason = 'flush_deadline'
+                    break
+                if request is None:
+                    stop = True
+                    break
+                batch.append(request)
+
+            with self._metrics_lock:
+                self._metrics['batches'] += 1
+                self._metrics[reason] += 1
+
+            self._process(batch)
+
+            if stop:
+                return
+
+    def _process(self, batch):
+        groups = {}
+        for request in batch:
+            groups.setdefault(request.key, []).append(request)
+
+        for key, requests in groups.iteritems():
+            items = [r.item for r in requests]
+
+            # Per item, so one bad request doesn't fail the others in
+            # its batch.
+            try:
+                results = list(self.executor.isolated(executor.JOBS[key[0]], requests[0].args, items))
+            except Exception, e:
+                results = [(None, e)] * len(requests)
+
+            # Metrics first, so they are up to date when the callers
+            # wake up.
+            now = time.time()
+            with self._metrics_lock:
+                for r, (result, exception) in zip(requests, results):
+                    if exception is None:
+                        self._metrics['completed'] += 1
+                        self._metrics['latency_total'] += now - r.submitted
+                    else:
+                        self._metrics['failed'] += 1
+
+            for r, (result, exception) in zip(requests, results):
+                if exception is None:
+                    r.future.set_result(result)
+                else:
+                    r.future.set_exception(exception)
+
+
+# The Unix socket server.
+
+CURVES = {
+    'nistp256': asymmetric.ECC_NISTP256,
+    'nistp384': asymmetric.ECC_NISTP384,
+    }
+
+
+class _Handler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        # Not "for line in self.rfile", that reads ahead and blocks.
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            try:
+                response = self.server.handle_request_line(line)
+            except Exception, e:
+                response = {'error': str(e)}
+            self.wfile.write(json.dumps(response) + '\n')
+            self.wfile.flush()
+
+
+class UnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    """Serves a Batcher on the Unix socket path. Requests from all
+    connections end up in the same batches."""
+
+    daemon_threads = True
+
+    def __init__(self, path, batcher):
+        if os.path.exists(path):
+            os.unlink(path)
+        SocketServer.UnixStreamServer.__init__(self, path, _Handler)
+        self.path = path
+        self.batcher = batcher
+
+    def handle_request_line(self, line):
+        request = json.loads(line)
+        op = request['op']
+        b = self.batcher
+
+        if op == 'metrics':
+            return b.metrics()
+
+        if op == 'verify_ed25519':
+            future = b.verify_ed25519(request['pk'].decode('hex'), request['msg'].decode('hex'),
+                                      request['sig'].decode('hex'))
+            return {'ok': future.result()}
+
+        if op == 'verify_ecdsa':
+            curve_obj = CURVES[request['curve']]()
+            try:
+                public_key = curve_obj.binary_to_public(request['public'].decode('hex'))
+                sig = blobs.x963.decode_der_dsa_sig(request['sig'].decode('hex'))
+            except ValueError:
+                return {'ok': False}
+            future = b.verify_ecdsa(curve_obj, public_key, request['msg'].decode('hex'), sig)
+            return {'ok': future.result()}
+
+        if op == 'sign_ed25519':
+            future = b.sign_ed25519(request['sk'].decode('hex'), request['msg'].decode('hex'))
+            return {'sig': future.result().encode('hex')}
+
+        raise ValueError('unknown op %r' % op)
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class Client(object):
+    """Blocking client for UnixServer."""
+
+    def __init__(self, path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.rfile = self.sock.makefile('rb')
+
+    def call(self, **request):
+        self.sock.sendall(json.dumps(request) + '\n')
+        response = json.loads(self.rfile.readline())
+        if 'error' in response:
+            raise ValueError(response['error'])
+        return response
+
+    def close(self):
+        self.rfile.close()
+        self.sock.close()
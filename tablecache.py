@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""On-disk cache of precomputed point tables.
+
+A table file is
+
+    magic 'ECTB' | version (2) | width (2) | count (4) | fingerprint (32)
+    count affine points, x and y little endian, width bytes each
+    sha256 of everything above (32)
+
+The fingerprint is a hash of the curve parameters, the base point and
+the table length, so a file built for different parameters is never
+used. Files are mapped read-only, so processes using the same cache
+directory share the pages. Anything that doesn't check out (wrong
+magic, version or fingerprint, bad size or checksum) is rebuilt.
+
+Besides the base point tables, eddsa.VerifyingKey(pk, cached=True)
+keeps the table of a (hot) public key here, as <scheme>.key.<hash>.tbl.
+Nothing removes those files, so only use it for a bounded set of keys.
+
+The cache directory is taken from the ECC_TABLE_CACHE environment
+variable. If it isn't set tables are only kept in memory, in the same
+format.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+
+import codec
+import util
+
+
+MAGIC = 'ECTB'
+VERSION = 1
+
+HEADER = struct.Struct('<4sHHI32s')
+TRAILER_SIZE = 32
+
+
+def cache_dir():
+    return os.environ.get('ECC_TABLE_CACHE') or None
+
+
+def fingerprint(curve, P, count):
+    """Hash of every integer parameter of curve, the field, P and count."""
+
+    params = [type(curve).__name__, curve.gf.p, P, count]
+    for k, v in sorted(vars(curve).items()):
+        if isinstance(v, (int, long)):
+            params.append((k, v))
+
+    return hashlib.sha256(repr(params)).digest()
+
+
+class TableView(object):
+    """Read-only sequence of the points in a mapped table file, each
+    decoded and passed through convert on first access."""
+
+    def __init__(self, buf, width, count, convert):
+        self.buf = buf
+        self.width = width
+        self.count = count
+        self.convert = convert
+        self._entries = [None] * count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError('table index out of range')
+
+        entry = self._entries[i]
+        if entry is None:
+            x, y = codec.decode_ints(self.buf, self.width, 2, HEADER.size + 2 * self.width * i)
+            entry = self._entries[i] = self.convert((x, y))
+        return entry
+
+    def __iter__(self):
+        for i in xrange(self.count):
+            yield self[i]
+
+
+def dump(fp, points, width):
+    """The table file for points as a bytearray."""
+
+    buf = bytearray(HEADER.size + 2 * width * len(points) + TRAILER_SIZE)
+    HEADER.pack_into(buf, 0, MAGIC, VERSION, width, len(points), fp)
+
+    coords = []
+    for P in points:
+        coords.extend(P)
+    codec.encode_ints(coords, width, buf, HEADER.size)
+
+    buf[-TRAILER_SIZE:] = hashlib.sha256(buffer(buf, 0, len(buf) - TRAILER_SIZE)).digest()
+
+    return buf
+
+
+def from_buffer(buf, convert, fp=None):
+    """A TableView of the table file in buf (anything buffer() takes),
+    or None if it is not valid. If fp is given it must match too."""
+
+    if len(buf) < HEADER.size + TRAILER_SIZE:
+        return None
+
+    magic, version, width, count, file_fp = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION or (fp is not None and file_fp != fp):
+        return None
+    if len(buf) != HEADER.size + 2 * width * count + TRAILER_SIZE:
+        return None
+
+    digest = hashlib.sha256(buffer(buf, 0, len(buf) - TRAILER_SIZE)).digest()
+    if digest != buffer(buf, len(buf) - TRAILER_SIZE)[:]:
+        return None
+
+    return TableView(buf, width, count, convert)
+
+
+def save(path, data):
+    """Writes the table file data atomically to path."""
+
+    directory = os.path.dirname(path) or '.'
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    fd, tmp = tempfile.mkstemp(dir=directory)
+    try:
+        # Readable by other users of the same cache directory.
+        os.fchmod(fd, 0644)
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+    os.rename(tmp, path)
+
+
+def load(path, fp, convert):
+    """A TableView of the file at path, or None if it is missing or not
+    a valid table for fp."""
+
+    try:
+        f = open(path, 'rb')
+    except IOError:
+        return None
+
+    try:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (mmap.error, ValueError): # empty file
+            return None
+    finally:
+        f.close()
+
+    table = None
+    try:
+        table = from_buffer(buf, convert, fp)
+    finally:
+        # Not kept by a TableView, so nothing else closes it.
+        if table is None:
+            buf.close()
+    return table
+
+
+def cached_table(name, curve, P, count, build, convert):
+    """The table called name for the base point P on curve, as a
+    TableView.
+
+    build() returns the count affine points of the table. It is only
+    called if there is no valid cached copy. Each point is passed
+    through convert before use.
+    """
+
+    fp = fingerprint(curve, P, count)
+    width = (util.count_bits(curve.gf.p) + 7) // 8
+
+    directory = cache_dir()
+    if directory is None:
+        return from_buffer(dump(fp, build(), width), convert)
+
+    path = os.path.join(directory, name + '.tbl')
+
+    table = load(path, fp, convert)
+    if table is not None:
+        return table
+
+    data = dump(fp, build(), width)
+    try:
+        save(path, data)
+    except (IOError, OSError):
+        # Not writable, carry on without the cache.
+        return from_buffer(data, convert)
+
+    # The file can have been replaced since, so fall back to what was
+    # just built rather than return None.
+    return load(path, fp, convert) or from_buffer(data, convert)
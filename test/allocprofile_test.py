@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import StringIO
+import unittest
+
+import allocprofile
+import asymmetric
+import costmodel
+import curve
+import eddsa
+import numbertheory
+
+
+# Integers and points created per scalar multiplication, with some
+# room. If a change to the formulas goes over, either make it allocate
+# less or raise these deliberately.
+MAX_MUL_COMPLETE_P256 = 23000
+MAX_MUL_EXTENDED_ED25519 = 12000
+MAX_CHECKVALID_FAST = 12000
+
+
+class ProfileTest(unittest.TestCase):
+    def test_restores(self):
+        functions = [curve.mul_complete, eddsa.mul_extended, numbertheory.sqrt_modp,
+                     curve.ShortWeierstrass.__dict__['add_points_complete']]
+
+        with allocprofile.Profile('count'):
+            self.assertNotEquals(curve.mul_complete, functions[0])
+            self.assertNotEquals(eddsa.mul_extended, functions[1])
+
+        self.assertEquals(functions,
+                          [curve.mul_complete, eddsa.mul_extended, numbertheory.sqrt_modp,
+                           curve.ShortWeierstrass.__dict__['add_points_complete']])
+
+    def test_attribution(self):
+        c = costmodel.instrument(asymmetric.ECC_NISTP256.curve)
+        P = c.affine_to_projective(asymmetric.ECC_NISTP256.base_point)
+
+        prof = allocprofile.profile(lambda: curve.mul_complete(5, P, c), 'count')
+        calls, inclusive, exclusive = prof.stats['curve.mul_complete']
+        self.assertEquals(1, calls)
+
+        # 5 = 101b, three doublings and three additions.
+        self.assertEquals(3, prof.stats['ShortWeierstrass.double_point_complete'][0])
+        self.assertEquals(3, prof.stats['ShortWeierstrass.add_points_complete'][0])
+        self.assertEquals(inclusive, exclusive +
+                          prof.stats['ShortWeierstrass.double_point_complete'][1] +
+                          prof.stats['ShortWeierstrass.add_points_complete'][1])
+
+    def test_peaks(self):
+        c = costmodel.instrument(asymmetric.ECC_NISTP256.curve)
+        P = c.affine_to_projective(asymmetric.ECC_NISTP256.base_point)
+
+        def run():
+            curve.mul_complete(5, P, c)
+            curve.mul_complete(1, P, c)
+
+        prof = allocprofile.profile(run, 'count')
+        self.assertEquals(sorted(prof.stats), sorted(prof.peaks))
+        self.assertEquals(None, prof.peak)
+
+        # In count mode the most one call created, here the first.
+        calls, inclusive, exclusive = prof.stats['curve.mul_complete']
+        self.assertEquals(2, calls)
+        self.assertTrue(inclusive / 2 < prof.peaks['curve.mul_complete'] < inclusive)
+
+        out = StringIO.StringIO()
+        prof.report(out)
+        self.assertTrue('max/call' in out.getvalue())
+
+    def test_unavailable(self):
+        if allocprofile.tracemalloc is None:
+            self.assertRaises(ValueError, allocprofile.Profile, 'tracemalloc')
+        self.assertRaises(ValueError, allocprofile.Profile, 'guess')
+
+
+class AllocationBudgetTest(unittest.TestCase):
+    def test_mul_complete_p256(self):
+        c = costmodel.instrument(asymmetric.ECC_NISTP256.curve)
+        P = c.affine_to_projective(asymmetric.ECC_NISTP256.base_point)
+
+        prof = allocprofile.profile(lambda: curve.mul_complete(costmodel.SCALAR, P, c), 'count')
+        self.assertTrue(prof.per_call('curve.mul_complete') <= MAX_MUL_COMPLETE_P256,
+                        prof.per_call('curve.mul_complete'))
+
+    def test_mul_extended_ed25519(self):
+        c = costmodel.instrument(asymmetric.ECC_Ed25519.curve)
+        P = c.affine_to_extended(asymmetric.ECC_Ed25519.base_point)
+
+        prof = allocprofile.profile(lambda: curve.mul_extended(costmodel.SCALAR, P, c), 'count')
+        self.assertTrue(prof.per_call('curve.mul_extended') <= MAX_MUL_EXTENDED_ED25519,
+                        prof.per_call('curve.mul_extended'))
+
+    def test_checkvalid_fast(self):
+        prof = allocprofile.profile(costmodel.CASES['Ed25519.checkvalid_fast'](), 'count')
+        self.assertTrue(prof.per_call('eddsa_verify') <= MAX_CHECKVALID_FAST,
+                        prof.per_call('eddsa_verify'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import unittest
+
+import asymmetric
+import codec
+import curve
+import field
+import util
+
+
+class BaseTableTest(unittest.TestCase):
+    def test_scalarmult_base(self):
+        for obj in [asymmetric.ECC_NISTP256(), asymmetric.ECC_NISTP384()]:
+            for k in [1, 2, 12345, obj.order - 1, obj.order + 5]:
+                self.assertEquals(obj.scalarmult(k, obj.base_point), obj.scalarmult_base(k))
+
+            self.assertEquals(None, obj.scalarmult_base(obj.order))
+
+
+class SEC1Test(unittest.TestCase):
+    # http://www.ietf.org/rfc/rfc4754.txt
+    PUBLIC = ('04'
+              '2442A5CC0ECD015FA3CA31DC8E2BBC70BF42D60CBCA20085E0822CB04235E970'
+              '6FC98BD7E50211A4A27102FA3549DF79EBCB4BF246B80945CDDFE7D509BBFD7D').decode('hex')
+
+    def setUp(self):
+        self.objs = [asymmetric.ECC_NISTP256(), asymmetric.ECC_NISTP384()]
+
+    def test_rfc4754_key(self):
+        obj = asymmetric.ECC_NISTP256()
+        P = obj.binary_to_public(self.PUBLIC)
+
+        self.assertEquals(self.PUBLIC, obj.canonical_binary_form_public(P))
+        self.assertEquals('\x03' + self.PUBLIC[1:33],
+                          obj.canonical_binary_form_public(P, compressed=True))
+        self.assertEquals(P, obj.binary_to_public('\x03' + self.PUBLIC[1:33]))
+
+    def test_roundtrip(self):
+        for obj in self.objs:
+            for i in range(10):
+                pub, priv = obj.generate_key_pair(None)
+
+                for compressed in [False, True]:
+                    b = obj.canonical_binary_form_public(pub, compressed)
+                    self.assertEquals(pub, obj.binary_to_public(b))
+
+                b = obj.canonical_binary_form_private(priv)
+                self.assertEquals(obj.byte_size(), len(b))
+                self.assertEquals(priv, obj.binary_to_private(b))
+
+    def test_invalid(self):
+        obj = asymmetric.ECC_NISTP256()
+        P = obj.binary_to_public(self.PUBLIC)
+        p = obj.curve.gf.p
+
+        bad = [
+            '',
+            self.PUBLIC[:-1],
+            '\x05' + self.PUBLIC[1:],
+            self.PUBLIC[:-1] + chr(ord(self.PUBLIC[-1]) ^ 1),
+            '\x02' + self.PUBLIC[1:],
+            '\x02' + ('%064x' % p).decode('hex'),
+            '\x02' + self.PUBLIC[1:33] + 'x',
+            ]
+
+        # x = 1 is not the x coordinate of any point on P-256.
+        self.assertEquals(None, obj.curve.gf.sqrt(1 - 3 + obj.curve.b))
+        bad.append('\x02' + ('%064x' % 1).decode('hex'))
+
+        for b in bad:
+            self.assertRaises(ValueError, obj.binary_to_public, b)
+
+        # Infinity is neither encoded nor decoded.
+        self.assertRaises(ValueError, obj.canonical_binary_form_public, None)
+        self.assertRaises(ValueError, obj.canonical_binary_form_public, None, True)
+        self.assertRaises(ValueError, obj.binary_to_public, '\x00')
+
+    def test_invalid_private(self):
+        for obj in self.objs:
+            size = len(obj.canonical_binary_form_private(1))
+            self.assertEquals(obj.order - 1, obj.binary_to_private(
+                obj.canonical_binary_form_private(obj.order - 1)))
+            for d in [0, obj.order, obj.order + 1, 256**size - 1]:
+                self.assertRaises(ValueError, obj.binary_to_private, util.int2be(d, size))
+
+    def test_decompress_y_zero(self):
+        # y^2 = x^3 - x over F_7 has (0, 0), whose y has no odd twin.
+        obj = asymmetric.ECC_NISTP256()
+        obj.curve = curve.ShortWeierstrass(6, 0, field.Field(7))
+
+        self.assertEquals((0, 0), obj._decompress(0, 0))
+        self.assertRaises(ValueError, obj._decompress, 0, 1)
+
+    def test_batch(self):
+        for obj in self.objs:
+            points = [obj.generate_key_pair(None)[0] for i in range(20)]
+            buf = bytearray(''.join(obj.canonical_binary_form_public(P, True) for P in points))
+
+            self.assertEquals(points, obj.binary_to_public_batch(buf))
+            self.assertEquals(points[5:8], obj.binary_to_public_batch(
+                buf, 3, 5 * (1 + obj.byte_size())))
+
+            buf[0] = 4
+            self.assertRaises(ValueError, obj.binary_to_public_batch, buf)
+
+
+class KeyPairsTest(unittest.TestCase):
+    CLASSES = [asymmetric.ECC_Curve25519, asymmetric.ECC_Ed25519, asymmetric.ECC_NISTP256,
+               asymmetric.ECC_NISTP384, asymmetric.ECC_Curve41417]
+
+    def check(self, obj, count, public_buf, private_buf):
+        psize, ksize = obj.public_key_size(), obj.private_key_size()
+        privates = [obj.binary_to_private(str(private_buf[i * ksize:(i + 1) * ksize]))
+                    for i in xrange(count)]
+
+        self.assertEquals(count, len(set(privates)))
+        for i, private in enumerate(privates):
+            self.assertEquals(obj.canonical_binary_form_public(obj.derive_public_key(private)),
+                              str(public_buf[i * psize:(i + 1) * psize]))
+
+    def test_generate_key_pairs(self):
+        for cls in self.CLASSES:
+            obj = cls()
+            public_buf, private_buf = obj.generate_key_pairs(4)
+            self.assertEquals(4 * obj.public_key_size(), len(public_buf))
+            self.assertEquals(4 * obj.private_key_size(), len(private_buf))
+            self.check(obj, 4, public_buf, private_buf)
+
+            privates = obj.generate_private_keys(3)
+            self.assertEquals([obj.derive_public_key(k) for k in privates], obj.public_keys(privates))
+
+    def test_buffers(self):
+        obj = asymmetric.ECC_NISTP256()
+        public_buf = bytearray(3 * 65 + 1)
+        private_buf = bytearray(3 * 32)
+        self.assertTrue(public_buf is obj.generate_key_pairs(3, None, public_buf, private_buf)[0])
+        self.check(obj, 3, public_buf, private_buf)
+
+        self.assertRaises(ValueError, obj.generate_key_pairs, 4, None, public_buf, private_buf)
+
+    def test_processes(self):
+        for cls in [asymmetric.ECC_Curve25519, asymmetric.ECC_NISTP256]:
+            obj = cls()
+            public_buf, private_buf = obj.generate_key_pairs(5, processes=2)
+            self.check(obj, 5, public_buf, private_buf)
+
+    def test_curve41417_encoding(self):
+        obj = asymmetric.ECC_Curve41417()
+        public, private = obj.generate_key_pair(None)
+        self.assertEquals(public, obj.binary_to_public(obj.canonical_binary_form_public(public)))
+        self.assertEquals(private, obj.binary_to_private(obj.canonical_binary_form_private(private)))
+        self.assertRaises(ValueError, obj.binary_to_public, '\0' * 51)
+
+
+if __name__ == '__main__':
+    unittest.main()
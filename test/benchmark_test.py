@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import unittest
+
+import benchmark
+
+
+class SummarizeTest(unittest.TestCase):
+    def test_summarize(self):
+        r = benchmark.summarize([90.0, 100.0, 110.0])
+        self.assertEquals(100.0, r['ops_per_sec'])
+        self.assertEquals(10.0, r['stddev'])
+        self.assertEquals(3, r['samples'])
+        # t = 4.303 for 2 degrees of freedom
+        low, high = r['ci95']
+        self.assertAlmostEquals(100.0 - 4.303 * 10.0 / 3**0.5, low)
+        self.assertAlmostEquals(100.0 + 4.303 * 10.0 / 3**0.5, high)
+
+    def test_one_sample(self):
+        r = benchmark.summarize([5.0])
+        self.assertEquals([5.0, 5.0], r['ci95'])
+
+    def test_measure(self):
+        r = benchmark.measure(lambda: None, samples=4, min_time=0.01)
+        self.assertEquals(4, r['samples'])
+        self.assertTrue(r['ops_per_sec'] > 0)
+
+
+class CompareTest(unittest.TestCase):
+    def result(self, rate, low, high):
+        return {'ops_per_sec': rate, 'ci95': [low, high]}
+
+    def test_compare(self):
+        baseline = {
+            'slower': self.result(100.0, 95.0, 105.0),
+            'noisy': self.result(100.0, 50.0, 150.0),
+            'small': self.result(100.0, 99.0, 101.0),
+            'faster': self.result(100.0, 95.0, 105.0),
+            'gone': self.result(100.0, 95.0, 105.0),
+            }
+        results = {
+            'slower': self.result(50.0, 45.0, 55.0),
+            'noisy': self.result(60.0, 20.0, 100.0),
+            'small': self.result(95.0, 94.0, 96.0),
+            'faster': self.result(200.0, 190.0, 210.0),
+            'new': self.result(100.0, 95.0, 105.0),
+            }
+
+        regressed = dict((name, r) for name, old, new, r in
+                         benchmark.compare(baseline, results, 0.1))
+        self.assertEquals({'slower': True, 'noisy': False, 'small': False, 'faster': False},
+                          regressed)
+
+    def test_cases(self):
+        names = [name for name, func in benchmark.cases()]
+        self.assertEquals(len(names), len(set(names)))
+        for label, cls in benchmark.CURVES:
+            self.assertTrue('%s scalarmult' % label in names)
+        self.assertTrue('ecdsa p256 verify' in names)
+        self.assertTrue('ed25519 VerifyingKey.verify' in names)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import unittest
+
+import codec
+import eddsa
+import util
+
+
+class CodecTest(unittest.TestCase):
+    VALUES = [0, 1, 0xaabbcc, 2**255 - 19, 2**256 - 1, 12345678901234567890]
+
+    def test_encode_ints(self):
+        for byteorder, conv in [('little', util.int2le), ('big', util.int2be)]:
+            buf = codec.encode_ints(self.VALUES, 32, byteorder=byteorder)
+
+            self.assertEquals(''.join(conv(v, 32) for v in self.VALUES), str(buf))
+
+    def test_roundtrip(self):
+        for byteorder in ['little', 'big']:
+            buf = codec.encode_ints(self.VALUES, 32, byteorder=byteorder)
+
+            self.assertEquals(self.VALUES, codec.decode_ints(buf, 32, byteorder=byteorder))
+            self.assertEquals(self.VALUES, codec.decode_ints(str(buf), 32, byteorder=byteorder))
+            self.assertEquals(self.VALUES, codec.decode_ints(memoryview(buf), 32, byteorder=byteorder))
+            self.assertEquals(self.VALUES[2:4], codec.decode_ints(buf, 32, 2, 64, byteorder=byteorder))
+
+    def test_many_blocks(self):
+        values = range(3 * codec.BLOCK + 5)
+        buf = codec.encode_ints(values, 4)
+
+        self.assertEquals(values, codec.decode_ints(buf, 4))
+
+    def test_write_into_buffer(self):
+        buf = bytearray('x' * 40)
+        codec.encode_ints([1, 2], 16, buf, offset=4)
+
+        self.assertEquals('xxxx' + util.int2le(1, 16) + util.int2le(2, 16) + 'xxxx', str(buf))
+        self.assertRaises(ValueError, codec.encode_ints, [1, 2, 3], 16, buf)
+
+    def test_too_large(self):
+        self.assertRaises(ValueError, codec.encode_ints, [1, 2**256], 32)
+        self.assertRaises(ValueError, codec.encode_ints, [-1], 32)
+        self.assertRaises(ValueError, codec.decode_ints, bytearray(10), 4, 3)
+
+    def test_edwards_points(self):
+        ed = eddsa.Ed25519()
+        points = [ed.scalarmult_base(k) for k in [1, 2, 3, 2**200 + 1]]
+
+        buf = codec.encode_edwards_points(points, 32)
+
+        self.assertEquals(''.join(map(ed.encodepoint, points)), str(buf))
+        self.assertEquals(points, codec.decode_edwards_points(buf, 32, ed.curve))
+
+        # There is no x for y = 2.
+        codec.encode_ints([2], 32, buf, 32)
+        self.assertRaises(ValueError, codec.decode_edwards_points, buf, 32, ed.curve)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import json
+import os
+import unittest
+
+import asymmetric
+import costmodel
+import curve
+
+
+BUDGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cost_budgets.json')
+
+
+class CountedTest(unittest.TestCase):
+    def test_counts(self):
+        a = costmodel.Counted(2**100 + 1)
+        b = costmodel.Counted(2**100 + 3)
+
+        ops = costmodel.measure(lambda: (a * b, a * a, 3 * a, a**2, pow(a, 5, b)))
+        self.assertEquals({'M': 1, 'S': 2, 'C': 1, 'E': 1}, ops)
+
+    def test_stays_counted(self):
+        a = costmodel.Counted(12345)
+        for value in (a + 1, 1 - a, a % 7, -a, a >> 1, a / 2, a & 1):
+            self.assertTrue(isinstance(value, costmodel.Counted))
+
+    def test_field(self):
+        gf = costmodel.CountingField(2**255 - 19)
+        ops = costmodel.measure(lambda: (gf.div(2**200, 3**100), gf.inv_batch([2, 3, 5])))
+        self.assertEquals(2, ops['I'])
+
+    def test_same_result(self):
+        c = asymmetric.ECC_NISTP256.curve
+        P = asymmetric.ECC_NISTP256.base_point
+        c2 = costmodel.instrument(c)
+
+        self.assertTrue(isinstance(c2, curve.ShortWeierstrass))
+        self.assertEquals(curve.mul(12345, P, c),
+                          c2.projective_to_affine(
+                              curve.mul_complete(12345, c2.affine_to_projective(P), c2)))
+
+
+class BudgetTest(unittest.TestCase):
+    """The hot paths may not use more field operations than in
+    cost_budgets.json. Update it with python costmodel.py when a change
+    is meant to."""
+
+    def setUp(self):
+        with open(BUDGETS) as f:
+            self.budgets = json.load(f)
+
+    def test_every_case_has_a_budget(self):
+        self.assertEquals(sorted(costmodel.CASES), sorted(self.budgets))
+
+    def test_budgets(self):
+        for name, budget in sorted(self.budgets.iteritems()):
+            ops = costmodel.measure(costmodel.CASES[name]())
+            for op in sorted(set(ops) | set(budget)):
+                self.assertTrue(ops.get(op, 0) <= budget.get(op, 0),
+                                '%s: %d %s, budget %d' % (name, ops.get(op, 0), op, budget.get(op, 0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,8 @@
 import unittest
 
 import asymmetric
+import codec
+import ecdh
 import reference_ed25519 as ref_ed
 #import re
 import curve as curvemod
@@ -101,5 +103,48 @@ class Curve25519KeyTest(unittest.TestCase):
         #self.assertEquals(Pub, self.curve25519.non_canonical_binary_to_public(arr2str(PUB)))
 
 
+class X25519BatchTest(unittest.TestCase):
+    # RFC 7748 section 6.1
+    ALICE = '77076d0a7318a57d3c16c17251b26645df4c2f87ebc0992ab177fba51db92c2a'.decode('hex')
+    ALICE_PUBLIC = '8520f0098930a754748b7ddcb43ef75a0dbf3a0d26381af4eba4a98eaa9b4e6a'.decode('hex')
+    BOB = '5dab087e624a8a4b79e17f8b83800ee66f3bb1292618b6fd1c2f8b27ff88e0eb'.decode('hex')
+    BOB_PUBLIC = 'de9edb7d7b7dc1b4d35b61c2ece435373f8343c85b78674dadfc7e146f882b4f'.decode('hex')
+    SHARED = '4a5d9d5ba4ce2de1728e3bf480350f25e07e21c947d19e3376f09b3c1e161742'.decode('hex')
+
+    def test_rfc7748(self):
+        base = util.int2le(9, 32)
+        self.assertEquals(self.ALICE_PUBLIC + self.BOB_PUBLIC,
+                          str(ecdh.x25519_batch(self.ALICE + self.BOB, base + base)))
+        self.assertEquals(self.SHARED * 2, str(ecdh.x25519_batch(
+            self.ALICE + self.BOB, self.BOB_PUBLIC + self.ALICE_PUBLIC)))
+
+        # The top bit of u is ignored.
+        top = self.BOB_PUBLIC[:31] + chr(ord(self.BOB_PUBLIC[31]) | 0x80)
+        self.assertEquals(self.SHARED, str(ecdh.x25519_batch(self.ALICE, top)))
+
+    def test_same_as_ecdh(self):
+        obj = asymmetric.ECC_Curve25519()
+        pairs = [obj.generate_key_pair(None) for i in range(4)]
+        privates = [private for public, private in pairs]
+        publics = [public for public, private in pairs[1:] + pairs[:1]]
+
+        out = bytearray(32 * 5)
+        result = ecdh.x25519_batch(codec.encode_ints(privates, 32),
+                                   codec.encode_ints([P[0] for P in publics], 32), out)
+        self.assertTrue(result is out)
+        self.assertEquals([obj.ecdh(k, P) for k, P in zip(privates, publics)],
+                          codec.decode_ints(out, 32, 4))
+
+    def test_small_order(self):
+        zero = util.int2le(0, 32)
+        one = util.int2le(1, 32)
+        result = ecdh.x25519_batch(self.ALICE * 3, zero + self.BOB_PUBLIC + one)
+        self.assertEquals(zero + self.SHARED + zero, str(result))
+
+        self.assertEquals('', str(ecdh.x25519_batch('', '')))
+        self.assertRaises(ValueError, ecdh.x25519_batch, self.ALICE, self.BOB_PUBLIC[1:])
+        self.assertRaises(ValueError, ecdh.x25519_batch, self.ALICE * 2, self.BOB_PUBLIC)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -3,7 +3,8 @@
 
 import unittest
 from field import Field
-from curve import ShortWeierstrass, MontgomeryCurve, EdwardsCurve, TwistedEdwardsCurve, mul, mul_projective
+from curve import ShortWeierstrass, MontgomeryCurve, EdwardsCurve, TwistedEdwardsCurve, mul, mul_projective, mul_extended, mul_inverted, mul_complete, mul2_complete, \
+    precompute_extended, mul_precomputed_extended, mul_xy
 
 
 class CommonCurveTestsMixin(object):
@@ -112,6 +113,41 @@ class ProjectiveCoordinateTestsMixin(object):
                                              self.curve)))
 
 
+class ExtendedCoordinateTestsMixin(object):
+    def test_extended_single_addition(self):
+        apb = self.curve.add_points_extended(self.curve.affine_to_extended(self.A),
+                                             self.curve.affine_to_extended(self.B))
+
+        self.assertEquals(self.AplusB, self.curve.extended_to_affine(apb))
+
+    def test_extended_single_doubling(self):
+        ax2 = self.curve.double_point_extended(self.curve.affine_to_extended(self.A))
+
+        self.assertEquals(self.Ax2, self.curve.extended_to_affine(ax2))
+
+    def test_extended_neutral_point(self):
+        NP = self.curve.neutral_point_extended()
+        Aext = self.curve.affine_to_extended(self.A)
+
+        self.assertEquals(self.curve.neutral_point(), self.curve.extended_to_affine(NP))
+        self.assertEquals(self.A, self.curve.extended_to_affine(
+            self.curve.add_points_extended(Aext, NP)))
+
+    def test_multiplication_extended(self):
+        for k, P in [(self.MUL_K_1, self.MUL_P_1), (self.MUL_K_2, self.MUL_P_2)]:
+            self.assertEquals(P, self.curve.extended_to_affine(
+                mul_extended(k, self.curve.affine_to_extended(self.bp), self.curve)))
+
+    def test_multiplication_precomputed_extended(self):
+        table = precompute_extended(self.bp, 256, self.curve)
+
+        for k, P in [(self.MUL_K_1, self.MUL_P_1), (self.MUL_K_2, self.MUL_P_2)]:
+            self.assertEquals(P, self.curve.extended_to_affine(
+                mul_precomputed_extended(k, table, self.curve)))
+
+        self.assertRaises(ValueError, mul_precomputed_extended, 2**256, table, self.curve)
+
+
 class ShortWeierstrassTestCase(unittest.TestCase, CommonCurveTestsMixin, ProjectiveCoordinateTestsMixin):
 
     HAS_INF = True
@@ -145,6 +181,63 @@ class ShortWeierstrassTestCase(unittest.TestCase, CommonCurveTestsMixin, Project
         self.assertTrue(self.AplusB in self.curve.get_y(self.AplusB[0]))
         self.assertTrue(self.negB in self.curve.get_y(self.negB[0]))
 
+    def test_complete_single_addition(self):
+        apb = self.curve.add_points_complete(self.curve.affine_to_projective(self.A),
+                                             self.curve.affine_to_projective(self.B))
+
+        self.assertEquals(self.AplusB, self.curve.projective_to_affine(apb))
+
+    def test_complete_single_doubling(self):
+        Aproj = self.curve.affine_to_projective(self.A)
+
+        self.assertEquals(self.Ax2, self.curve.projective_to_affine(
+            self.curve.double_point_complete(Aproj)))
+        self.assertEquals(self.Ax2, self.curve.projective_to_affine(
+            self.curve.add_points_complete(Aproj, Aproj)))
+
+    def test_complete_exceptional_cases(self):
+        NP = self.curve.neutral_point_projective()
+        Bproj = self.curve.affine_to_projective(self.B)
+        negBproj = self.curve.affine_to_projective(self.negB)
+
+        self.assertEquals(None, self.curve.projective_to_affine(
+            self.curve.add_points_complete(Bproj, negBproj)))
+        self.assertEquals(self.B, self.curve.projective_to_affine(
+            self.curve.add_points_complete(NP, Bproj)))
+        self.assertEquals(None, self.curve.projective_to_affine(
+            self.curve.add_points_complete(NP, NP)))
+        self.assertEquals(None, self.curve.projective_to_affine(
+            self.curve.double_point_complete(NP)))
+
+    def test_multiplication_complete(self):
+        for k, P in [(self.MUL_K_1, self.MUL_P_1), (self.MUL_K_2, self.MUL_P_2)]:
+            self.assertEquals(P, self.curve.projective_to_affine(
+                mul_complete(k, self.curve.affine_to_projective(self.bp), self.curve)))
+
+        self.assertEquals(None, self.curve.projective_to_affine(
+            mul_complete(self.bp_order, self.curve.affine_to_projective(self.bp), self.curve)))
+
+    def test_double_multiplication_complete(self):
+        Aproj = self.curve.affine_to_projective(self.A)
+        bpproj = self.curve.affine_to_projective(self.bp)
+
+        self.assertEquals(
+            self.curve.add_points(mul(self.MUL_K_1, self.bp, self.curve),
+                                  mul(self.MUL_K_2, self.A, self.curve)),
+            self.curve.projective_to_affine(
+                mul2_complete(self.MUL_K_1, bpproj, self.MUL_K_2, Aproj, self.curve)))
+
+    def test_complete_general_a(self):
+        # secp256k1 has a = 0 so this takes the general formulas.
+        secp256k1 = ShortWeierstrass(0, 7, Field(2**256 - 2**32 - 977))
+        G = (0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+             0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8)
+
+        self.assertEquals(
+            mul(self.MUL_K_1, G, secp256k1),
+            secp256k1.projective_to_affine(
+                mul_complete(self.MUL_K_1, secp256k1.affine_to_projective(G), secp256k1)))
+
 
 class MontgomeryTestCase(unittest.TestCase, CommonCurveTestsMixin):
 
@@ -179,6 +272,17 @@ class MontgomeryTestCase(unittest.TestCase, CommonCurveTestsMixin):
         self.assertTrue(self.AplusB in self.curve.get_y(self.AplusB[0]))
         self.assertTrue(self.negB in self.curve.get_y(self.negB[0]))
 
+    def test_multiplication_xy(self):
+        P = self.curve.affine_to_xy(self.bp)
+        for k, Q in [(self.MUL_K_1, self.MUL_P_1), (self.MUL_K_2, self.MUL_P_2)]:
+            R0, R1 = mul_xy(k, P, self.curve)
+            self.assertEquals(Q[0], self.curve.gf.div(R0[0], R0[1]))
+
+            X, Y, Z = self.curve.recover_y_xy(self.bp, R0, R1)
+            self.assertEquals(Q, (self.curve.gf.div(X, Z), self.curve.gf.div(Y, Z)))
+
+        self.assertEquals(0, mul_xy(self.bp_order, P, self.curve)[0][1])
+
     def test_convert_to_short_weierstrass(self):
 
         # Test with Curve41417
@@ -202,7 +306,7 @@ class MontgomeryTestCase(unittest.TestCase, CommonCurveTestsMixin):
         self.assertEquals(curve41417monty_bp, P_from_monty(P_to_monty(curve41417monty_bp)))
 
 
-class EdwardsTestCase(unittest.TestCase, CommonCurveTestsMixin, ProjectiveCoordinateTestsMixin):
+class EdwardsTestCase(unittest.TestCase, CommonCurveTestsMixin, ProjectiveCoordinateTestsMixin, ExtendedCoordinateTestsMixin):
 
     HAS_INF = False
 
@@ -240,6 +344,25 @@ class EdwardsTestCase(unittest.TestCase, CommonCurveTestsMixin, ProjectiveCoordi
     def test_addition_A_plus_A_equals_doubling_A(self):
         self.assertEquals(self.Ax2, self.curve.add_points(self.A, self.A))
 
+    def test_inverted_single_addition(self):
+        apb = self.curve.add_points_inverted(self.curve.affine_to_inverted(self.A),
+                                             self.curve.affine_to_inverted(self.B))
+
+        self.assertEquals(self.AplusB, self.curve.inverted_to_affine(apb))
+
+    def test_inverted_single_doubling(self):
+        ax2 = self.curve.double_point_inverted(self.curve.affine_to_inverted(self.A))
+
+        self.assertEquals(self.Ax2, self.curve.inverted_to_affine(ax2))
+
+    def test_inverted_neutral_point(self):
+        self.assertRaises(ValueError, self.curve.affine_to_inverted, self.curve.neutral_point())
+
+    def test_multiplication_inverted(self):
+        for k, P in [(self.MUL_K_1, self.MUL_P_1), (self.MUL_K_2, self.MUL_P_2)]:
+            self.assertEquals(P, self.curve.inverted_to_affine(
+                mul_inverted(k, self.curve.affine_to_inverted(self.bp), self.curve)))
+
     def test_shitty_test_data(self):
         raise Exception('data not independently verified for Edwards Curve test case')
 
@@ -254,7 +377,7 @@ class EdwardsTestCase(unittest.TestCase, CommonCurveTestsMixin, ProjectiveCoordi
         self.assertEquals(self.bp, P_from_monty(P_to_monty(self.bp)))
 
 
-class TwistedEdwardsTestCase(unittest.TestCase, CommonCurveTestsMixin, ProjectiveCoordinateTestsMixin):
+class TwistedEdwardsTestCase(unittest.TestCase, CommonCurveTestsMixin, ProjectiveCoordinateTestsMixin, ExtendedCoordinateTestsMixin):
 
     HAS_INF = False
 
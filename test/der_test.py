@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import mmap
+import tempfile
+import unittest
+
+import blobs
+import der
+
+try:
+    from pyasn1.codec.der import decoder, encoder
+    from pyasn1.type import univ, namedtype
+except ImportError:
+    univ = None
+
+
+if univ is not None:
+    # The old pyasn1 implementation of blobs.X963. Slow, but kept around
+    # to cross check the der module against.
+
+    class X963_pyasn1(object):
+
+        class ASN1_X9_63_Private_Key(univ.Sequence):
+            componentType = namedtype.NamedTypes(
+                namedtype.NamedType('flags', univ.BitString()),
+                namedtype.NamedType('size', univ.Integer()),
+                namedtype.NamedType('x', univ.Integer()), # public x
+                namedtype.NamedType('y', univ.Integer()),
+                namedtype.NamedType('k', univ.Integer()) # private key
+                )
+
+        class ASN1_X9_63_DSA_Signature(univ.Sequence):
+            componentType = namedtype.NamedTypes(
+                namedtype.NamedType('r', univ.Integer()),
+                namedtype.NamedType('s', univ.Integer())
+                )
+
+        def decode_der_private_key(self, buf):
+            obj, rest = decoder.decode(buf, asn1Spec=self.ASN1_X9_63_Private_Key())
+
+            pub = (int(obj.getComponentByName('x')), int(obj.getComponentByName('y')))
+            priv = int(obj.getComponentByName('k'))
+
+            return pub, priv
+
+        def encode_der_private_key(self, pub, priv, byte_size):
+            obj = self.ASN1_X9_63_Private_Key()
+            obj.setComponentByName('flags', (1,)) # private key
+            obj.setComponentByName('size', byte_size)
+            obj.setComponentByName('x', pub[0])
+            obj.setComponentByName('y', pub[1])
+            obj.setComponentByName('k', priv)
+
+            return encoder.encode(obj)
+
+        def decode_der_dsa_sig(self, buf):
+            obj, rest = decoder.decode(buf, asn1Spec=self.ASN1_X9_63_DSA_Signature())
+
+            sig = (int(obj.getComponentByName('r')), int(obj.getComponentByName('s')))
+
+            return sig
+
+        def encode_der_dsa_sig(self, sig):
+            obj = self.ASN1_X9_63_DSA_Signature()
+            obj.setComponentByName('r', sig[0])
+            obj.setComponentByName('s', sig[1])
+
+            return encoder.encode(obj)
+
+    x963_pyasn1 = X963_pyasn1()
+else:
+    x963_pyasn1 = None
+
+
+# (signature, what pyasn1 encodes it as), so the byte identity is
+# checked even without pyasn1.
+PYASN1_DSA_SIGS = [
+    ((1, 2), '3006020101020102'),
+    ((127, 128), '300702017f02020080'),
+    ((2**255, 2**256 - 1), '3046022100' + '80' + '00' * 31 + '022100' + 'ff' * 32),
+    ]
+
+
+class DERTest(unittest.TestCase):
+    def test_integer(self):
+        for n, h in [(0, '020100'), (1, '020101'), (127, '02017f'),
+                     (128, '02020080'), (256, '02020100'), (-1, '0201ff'),
+                     (-128, '020180'), (-129, '0202ff7f')]:
+            self.assertEquals(h, der.encode_integer(n).encode('hex'))
+            self.assertEquals((n, len(h) // 2), der.decode_integer(h.decode('hex'), 0, len(h) // 2))
+
+    def test_length(self):
+        for n in [0, 127, 128, 255, 256, 70000]:
+            content = 'x' * n
+            self.assertEquals((0x04, len(der.encode_tlv(4, content)) - n, len(der.encode_tlv(4, content))),
+                              der.read_tlv(der.encode_tlv(4, content), 0, len(der.encode_tlv(4, content))))
+
+        self.assertEquals('8180', der.encode_length(128).encode('hex'))
+        self.assertEquals('820100', der.encode_length(256).encode('hex'))
+
+    def test_private_key(self):
+        blob = der.encode_private_key((3, 2**255), 7, 32)
+
+        self.assertEquals('0302078002012002010302210080' + '00' * 31 + '020107',
+                          blob[2:].encode('hex'))
+        self.assertEquals(((3, 2**255), 7), der.decode_private_key(blob))
+        self.assertEquals(((3, 2**255), 7), blobs.x963.decode_der_private_key(bytearray(blob)))
+
+    def test_pyasn1_vectors(self):
+        for sig, h in PYASN1_DSA_SIGS:
+            self.assertEquals(h, der.encode_dsa_sig(sig).encode('hex'))
+            self.assertEquals(sig, der.decode_dsa_sig(h.decode('hex')))
+
+    def test_dsa_sig(self):
+        sig = (2**255 + 1, 12345)
+        blob = der.encode_dsa_sig(sig)
+
+        self.assertEquals('3027022100', blob[:5].encode('hex'))
+        self.assertEquals(sig, der.decode_dsa_sig(blob))
+        self.assertEquals(sig, blobs.x963.decode_der_dsa_sig(buffer(blob)))
+
+    def test_rejects_non_canonical(self):
+        bad = [
+            '',
+            '30',
+            '30060201010201', # truncated
+            '300702010102010200', # trailing data in sequence
+            '30060201010201020000', # trailing data after sequence
+            '30800201010201020000', # indefinite length
+            '308106020101020102', # non-minimal length
+            '30820006020101020102',
+            '300702020001020102', # non-minimal integer
+            '30070202ffff020102',
+            '30050200020102', # empty integer
+            '3106020101020102', # wrong tag
+            ]
+
+        for h in bad:
+            self.assertRaises(ValueError, der.decode_dsa_sig, h.decode('hex'))
+
+        self.assertRaises(ValueError, der.decode_bit_string, '03020781'.decode('hex'), 0, 4)
+        self.assertRaises(ValueError, der.decode_bit_string, '030108'.decode('hex'), 0, 3)
+
+    def test_iter_dsa_sigs(self):
+        sigs = [(i * 2**200 + 1, 2**255 - i) for i in range(50)]
+
+        f = tempfile.TemporaryFile()
+        f.write(''.join(map(der.encode_dsa_sig, sigs)))
+        f.flush()
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self.assertEquals(sigs, list(der.iter_dsa_sigs(m)))
+        self.assertEquals(sigs[1:], list(blobs.x963.iter_der_dsa_sigs(m, len(der.encode_dsa_sig(sigs[0])))))
+        self.assertRaises(ValueError, list, der.iter_dsa_sigs(m, 0, len(m) - 1))
+
+
+@unittest.skipIf(x963_pyasn1 is None, 'pyasn1 not installed')
+class PyASN1CrossCheckTest(unittest.TestCase):
+    def test_same_output(self):
+        for sig, h in PYASN1_DSA_SIGS:
+            blob = blobs.x963.encode_der_dsa_sig(sig)
+            self.assertEquals(h, x963_pyasn1.encode_der_dsa_sig(sig).encode('hex'))
+            self.assertEquals(x963_pyasn1.encode_der_dsa_sig(sig), blob)
+            self.assertEquals(sig, x963_pyasn1.decode_der_dsa_sig(blob))
+
+        pub, priv = (2**255 + 3, 17), 2**200
+        blob = blobs.x963.encode_der_private_key(pub, priv, 32)
+        self.assertEquals(x963_pyasn1.encode_der_private_key(pub, priv, 32), blob)
+        self.assertEquals((pub, priv), x963_pyasn1.decode_der_private_key(blob))
+
+        blob = der.encode_private_key((3, 2**255), 7, 32)
+        self.assertEquals(x963_pyasn1.encode_der_private_key((3, 2**255), 7, 32), blob)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -122,6 +122,23 @@ class ECDSATest(unittest.TestCase):
                                'abcdef',
                                reference_sig))
 
+    def test_digest_and_stream(self):
+        curve_obj = asymmetric.ECC_NISTP256()
+        priv = util.be2int(self.TEST_VECTORS['key1w']['private'])
+        pub = tuple(map(util.be2int, self.TEST_VECTORS['key1w']['public']))
+        msg = self.TEST_VECTORS['msg1']['msg']
+        k = util.be2int(self.TEST_VECTORS['msg1']['k'])
+        reference_sig = tuple(map(util.be2int, self.TEST_VECTORS['msg1']['sig']))
+
+        digest = hashlib.sha256(msg).digest()
+
+        self.assertEquals(reference_sig, ecdsa.ecdsa_sign_digest(curve_obj, digest, priv, k))
+        self.assertEquals(reference_sig, ecdsa.ecdsa_sign_stream(curve_obj, hashlib.sha256, priv, iter(msg), k))
+
+        self.assertTrue(ecdsa.ecdsa_verify_digest(curve_obj, pub, digest, reference_sig))
+        self.assertTrue(ecdsa.ecdsa_verify_stream(curve_obj, hashlib.sha256, pub, msg, reference_sig))
+        self.assertTrue(not ecdsa.ecdsa_verify_stream(curve_obj, hashlib.sha256, pub, 'abcdef', reference_sig))
+
     def test_break(self):
         curve_obj = asymmetric.ECC_NISTP256()
         priv = util.be2int(self.TEST_VECTORS['key1w']['private'])
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import hashlib
+import mmap
+import tempfile
+import unittest
+
+import curve
+import eddsa
+import reference_ed25519 as ref_ed
+
+
+class Ed25519Test(unittest.TestCase):
+    def setUp(self):
+        self.ed = eddsa.Ed25519()
+        self.sk = ''.join(map(chr, range(32)))
+
+    def test_public_key_matches_reference(self):
+        self.assertEquals(ref_ed.publickey(self.sk), self.ed.publickey(self.sk))
+
+    def test_signature_matches_reference(self):
+        pk = ref_ed.publickey(self.sk)
+
+        self.assertEquals(ref_ed.signature('abc', self.sk, pk),
+                          self.ed.signature('abc', self.sk, pk))
+
+    def test_checkvalid(self):
+        pk = self.ed.publickey(self.sk)
+        sig = self.ed.signature('abc', self.sk, pk)
+
+        self.ed.checkvalid(sig, 'abc', pk)
+        self.assertRaises(Exception, self.ed.checkvalid, sig, 'abd', pk)
+
+
+    def test_checkvalid_fast(self):
+        pk = self.ed.publickey(self.sk)
+
+        for m in ['', 'abc', 'x' * 1000]:
+            sig = self.ed.signature(m, self.sk, pk)
+
+            self.ed.checkvalid_fast(sig, m, pk)
+            self.assertRaises(Exception, self.ed.checkvalid_fast, sig, m + 'x', pk)
+            self.assertRaises(Exception, self.ed.checkvalid_fast, chr(ord(sig[0]) ^ 1) + sig[1:], m, pk)
+
+        self.assertRaises(Exception, self.ed.checkvalid_fast, sig[:-1], m, pk)
+        self.assertRaises(Exception, self.ed.checkvalid_fast, sig, m, pk[:-1])
+
+    def test_checkvalid_fast_rejects_unreduced_s(self):
+        pk = self.ed.publickey(self.sk)
+        sig = self.ed.signature('abc', self.sk, pk)
+        S = self.ed.decodeint(sig[32:])
+        malleated = sig[:32] + self.ed.encodeint(S + self.ed.L)
+
+        # The reference code accepts S + L, the fast path does not.
+        self.ed.checkvalid(malleated, 'abc', pk)
+        self.assertRaises(Exception, self.ed.checkvalid_fast, malleated, 'abc', pk)
+        self.assertRaises(Exception, eddsa.VerifyingKey(pk).verify, malleated, 'abc')
+
+    def torsion_key(self):
+        """A public key a*B + T, T of order 2, and a secret key that
+        signs for it."""
+
+        a, prefix = self.ed.expand(self.sk)
+        c = self.ed.curve
+        A = c.add_points(self.ed.scalarmult(a, self.ed.bp), (0, c.gf.p - 1))
+        return self.ed.encodepoint(A)
+
+    def outcome(self, check, *args):
+        try:
+            check(*args)
+            return True
+        except Exception:
+            return False
+
+    def test_checkvalid_fast_torsion_key(self):
+        pk = self.torsion_key()
+
+        results = []
+        for i in range(8):
+            m = 'message %d' % i
+            sig = self.ed.signature(m, self.sk, pk)
+            results.append(self.outcome(self.ed.checkvalid, sig, m, pk))
+            self.assertEquals(results[-1], self.outcome(self.ed.checkvalid_fast, sig, m, pk))
+
+        # Valid exactly when h is even, so both kinds are covered.
+        self.assertTrue(True in results and False in results)
+
+    def test_verifying_key_torsion_key(self):
+        pk = self.torsion_key()
+        vk = eddsa.VerifyingKey(pk)
+
+        for i in range(8):
+            m = 'message %d' % i
+            sig = self.ed.signature(m, self.sk, pk)
+            self.assertEquals(self.outcome(self.ed.checkvalid, sig, m, pk),
+                              self.outcome(vk.verify, sig, m))
+
+    def test_scalarmult_precomputed_torsion(self):
+        c = self.ed.curve
+        P = c.add_points(self.ed.bp, (0, c.gf.p - 1))
+        table = self.ed.precompute(P)
+        for k in [1, 3, self.ed.L, self.ed.L + 1, 8 * self.ed.L - 1, 2**300 + 5]:
+            self.assertEquals(self.ed.scalarmult(k, P), self.ed.scalarmult_precomputed(k, table))
+
+
+class Ed25519KeyObjectTest(unittest.TestCase):
+    def setUp(self):
+        self.ed = eddsa.Ed25519()
+        self.sk = ''.join(map(chr, range(32)))
+
+    def test_expand(self):
+        h = self.ed.H(self.sk)
+        a = 2**(self.ed.b-2) + sum(2**i * self.ed.bit(h,i) for i in range(3,self.ed.b-2))
+
+        self.assertEquals((a, h[32:]), self.ed.expand(self.sk))
+
+    def test_scalarmult_base(self):
+        for k in [0, 1, 2, 12345, self.ed.L - 1, 2**511 + 17]:
+            self.assertEquals(curve.mul(k % self.ed.L, self.ed.bp, self.ed.curve),
+                              self.ed.scalarmult_base(k))
+
+    def test_signing_key_matches_reference(self):
+        key = eddsa.SigningKey(self.sk)
+
+        self.assertEquals(ref_ed.publickey(self.sk), key.pk)
+        self.assertEquals(ref_ed.signature('abc', self.sk, key.pk), key.sign('abc'))
+        self.assertEquals(ref_ed.signature('', self.sk, key.pk), key.sign(''))
+
+    def test_verifying_key(self):
+        key = eddsa.SigningKey(self.sk)
+        vk = key.verifying_key()
+
+        for m in ['', 'abc', 'x' * 1000]:
+            sig = key.sign(m)
+            vk.verify(sig, m)
+            self.ed.checkvalid(sig, m, vk.pk)
+
+            self.assertRaises(Exception, vk.verify, sig, m + 'x')
+            self.assertRaises(Exception, vk.verify, sig[:-1] + chr(ord(sig[-1]) ^ 1), m)
+
+        self.assertRaises(Exception, vk.verify, 'short', 'abc')
+        self.assertRaises(Exception, eddsa.VerifyingKey, 'short')
+
+
+class Ed25519phTest(unittest.TestCase):
+    # RFC 8032, 7.3. Test Vectors for Ed25519ph
+    SK = '833fe62409237b9d62ec77587520911e9a759cec1d19755b7da901b96dca3d42'.decode('hex')
+    PK = 'ec172b93ad5e563bf4932c70e1245034c35467ef2efd4d64ebf819683467e2bf'.decode('hex')
+    SIG = ('98a70222f0b8121aa9d30f813d683f809e462b469c7ff87639499bb94e6dae41'
+           '31f85042463c2a355a2003d062adf5aaa10b8c61e636062aaad11c2a26083406').decode('hex')
+
+    def setUp(self):
+        self.key = eddsa.SigningKey(self.SK)
+
+    def test_rfc8032_vector(self):
+        self.assertEquals(self.PK, self.key.pk)
+        self.assertEquals(self.SIG, self.key.sign_prehashed(hashlib.sha512('abc').digest()))
+        self.assertEquals(self.SIG, self.key.sign_stream('abc'))
+
+        vk = self.key.verifying_key()
+        vk.verify_stream(self.SIG, 'abc')
+        self.assertRaises(Exception, vk.verify_stream, self.SIG, 'abd')
+        self.assertRaises(Exception, vk.verify, self.SIG, 'abc')
+
+    def test_context(self):
+        sig = self.key.sign_stream('abc', context='foo')
+
+        self.assertNotEquals(self.SIG, sig)
+        self.key.verifying_key().verify_stream(sig, 'abc', context='foo')
+        self.assertRaises(Exception, self.key.verifying_key().verify_stream, sig, 'abc')
+        self.assertRaises(ValueError, self.key.sign_stream, 'abc', 'x' * 256)
+
+    def test_stream_sources(self):
+        data = ''.join(chr(i % 251) for i in xrange(200000))
+        expected = self.key.sign_prehashed(hashlib.sha512(data).digest())
+
+        f = tempfile.TemporaryFile()
+        f.write(data)
+        f.flush()
+        f.seek(0)
+
+        self.assertEquals(expected, self.key.sign_stream(f))
+        self.assertEquals(expected, self.key.sign_stream(
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)))
+        self.assertEquals(expected, self.key.sign_stream(
+            iter([data[:1000], data[1000:150000], data[150000:]])))
+
+
+class Ed41417Test(unittest.TestCase):
+    def setUp(self):
+        self.ed = eddsa.Ed41417()
+        self.sk = ''.join(map(chr, range(32)))
+
+    def test_scalarmult_matches_affine(self):
+        k = 2**413 + 8 * 1234567890123456789
+        self.assertEquals(curve.mul(k, self.ed.bp, self.ed.curve),
+                          self.ed.scalarmult(k, self.ed.bp))
+
+    def test_sign_and_checkvalid(self):
+        pub, priv = self.ed.generate_key_pair_from_seed(self.sk)
+        k = self.ed.generate_random_k_from_seed(self.sk)
+
+        sig = self.ed.sign('abc', k, pub, priv)
+
+        self.ed.checkvalid(sig, 'abc', self.ed.encodepoint(pub))
+        self.assertRaises(Exception, self.ed.checkvalid, sig, 'abd', self.ed.encodepoint(pub))
+
+    def test_key_objects(self):
+        key = eddsa.SigningKey(self.sk, self.ed)
+        sig = key.sign('abc')
+
+        self.ed.checkvalid(sig, 'abc', key.pk)
+        key.verifying_key().verify(sig, 'abc')
+
+
+if __name__ == '__main__':
+    unittest.main()
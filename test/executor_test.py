@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import hashlib
+import unittest
+
+import asymmetric
+import ecdh
+import ecdsa
+import eddsa
+import executor
+
+
+def _square(chunk):
+    return [x * x for x in chunk]
+
+
+class ExecutorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.ex = executor.Executor(2, max_in_flight=3, max_chunk=4)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.ex.close()
+
+    def test_order_and_backpressure(self):
+        consumed = []
+
+        def source():
+            for i in xrange(100):
+                consumed.append(i)
+                yield i
+
+        results = self.ex.imap(_square, (), source())
+
+        self.assertEquals(0, next(results))
+        # At most max_in_flight chunks of max_chunk items read ahead.
+        self.assertTrue(len(consumed) <= 3 * 4)
+        self.assertEquals([x * x for x in xrange(1, 100)], list(results))
+        self.assertEquals([], list(self.ex.imap(_square, (), [])))
+
+    def test_ed25519(self):
+        key = eddsa.SigningKey('seed')
+        messages = ['m%d' % i for i in range(10)]
+
+        sigs = list(self.ex.sign_ed25519('seed', messages))
+        self.assertEquals([key.sign(m) for m in messages], sigs)
+
+        items = [(key.pk, m, sig) for m, sig in zip(messages, sigs)]
+        items[3] = (key.pk, 'x', sigs[3])
+        self.assertEquals([True] * 3 + [False] + [True] * 6, list(self.ex.verify_ed25519(items)))
+
+    def test_ecdsa(self):
+        obj = asymmetric.ECC_NISTP256()
+        pub, priv = obj.generate_key_pair(None)
+        messages = ['m%d' % i for i in range(5)]
+
+        sigs = list(self.ex.sign_ecdsa(obj, priv, messages))
+        for m, sig in zip(messages, sigs):
+            self.assertTrue(ecdsa.ecdsa_verify_digest(obj, pub, hashlib.sha256(m).digest(), sig))
+
+        items = [(pub, m, sig) for m, sig in zip(messages, sigs)]
+        items.append((pub, 'x', sigs[0]))
+        self.assertEquals([True] * 5 + [False], list(self.ex.verify_ecdsa(obj, items)))
+
+    def test_isolated(self):
+        key = eddsa.SigningKey('seed')
+        messages = ['a', 'b', None, 'd', 'e']
+
+        results = list(self.ex.isolated(executor.JOBS['sign_ed25519'], ('seed',), messages))
+        self.assertEquals([(key.sign(m), None) for m in 'ab'], results[:2])
+        self.assertEquals([(key.sign(m), None) for m in 'de'], results[3:])
+        self.assertEquals(None, results[2][0])
+        self.assertTrue(isinstance(results[2][1], TypeError))
+
+        obj = asymmetric.ECC_NISTP256()
+        pub, priv = obj.generate_key_pair(None)
+        sig = ecdsa.ecdsa_sign_digest(obj, hashlib.sha256('m').digest(), priv)
+        items = [(pub, 'm', sig), (pub, 'm', 'not a signature'), (pub, 'm', sig)]
+        self.assertEquals([True, False, True], list(self.ex.verify_ecdsa(obj, items)))
+
+    def test_keygen_and_ecdh(self):
+        obj = asymmetric.ECC_NISTP256()
+        pairs = list(self.ex.generate_key_pairs(obj, 8))
+
+        self.assertEquals(8, len(set(priv for pub, priv in pairs)))
+        for pub, priv in pairs:
+            self.assertEquals(obj.derive_public_key(priv), pub)
+
+        my_pub, my_priv = pairs[0]
+        peers = [pub for pub, priv in pairs]
+        self.assertEquals([ecdh.ecdh(obj, my_priv, P) for P in peers],
+                          list(self.ex.ecdh(obj, my_priv, peers)))
+
+
+class InlineExecutorTest(unittest.TestCase):
+    def test_same_state(self):
+        ex = executor.InlineExecutor(4)
+        self.assertEquals(None, ex.pool)
+        self.assertEquals(0, ex.processes)
+        for name in vars(executor.Executor(0)):
+            self.assertTrue(hasattr(ex, name), name)
+
+        self.assertEquals([x * x for x in xrange(10)], list(ex.imap(_square, (), xrange(10))))
+        self.assertEquals([(1, None), (4, None)], list(ex.isolated(_square, (), [1, 2])))
+        ex.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import hashlib
+import random
+import unittest
+
+import field
+import util
+from field import Field
+
+
+class FieldTest(unittest.TestCase):
+    def setUp(self):
+        self.field = Field(2**255 - 19)
+
+    def test_inv_batch(self):
+        values = [1, 2, 3, 2**255 - 20, 121666, 9]
+
+        self.assertEquals(map(self.field.mul_inv, values), self.field.inv_batch(values))
+        self.assertEquals([self.field.mul_inv(7)], self.field.inv_batch([7]))
+        self.assertEquals([], self.field.inv_batch([]))
+
+    def test_sqrt(self):
+        # 2**255 - 19 is 1 mod 4, P-256 is 3 mod 4.
+        for gf in [self.field, Field(2**256 - 2**224 + 2**192 + 2**96 - 1)]:
+            for n in [0, 1, 4, 9, 121666, gf.p - 1]:
+                x = gf.sqrt(n)
+                if x is not None:
+                    self.assertEquals(n % gf.p, x * x % gf.p)
+
+            self.assertEquals(3, min(gf.sqrt(9), gf.p - gf.sqrt(9)))
+
+        self.assertEquals(None, Field(7).sqrt(3))
+
+    def test_addition_chain(self):
+        for e in range(1, 200) + [2**255 - 21, 2**252 - 3]:
+            chain = field.addition_chain(e)
+            self.assertEquals(pow(3, e, self.field.p), field.chain_pow(3, chain, self.field.p))
+
+        # About what ref10 needs (254 squarings and 11 multiplications).
+        self.assertTrue(len(field.addition_chain(2**255 - 21)) <= 270)
+
+        self.assertRaises(ValueError, field.addition_chain, 0)
+
+
+class ScalarFieldTest(unittest.TestCase):
+    L = 2**252 + 27742317777372353535851937790883648493
+
+    def test_reduce(self):
+        for n in [self.L, 2**256 - 2**224 + 2**192 - 89188191075325690597107910205041859247]:
+            sf = field.ScalarField(n)
+            values = [0, 1, n - 1, n, n + 1, 2 * n, n * n - 1, (n - 1) ** 2,
+                      2**512 - 1, 2**512, 2**600 + 5, -1, -n - 3]
+            values += [random.getrandbits(512) for i in xrange(200)]
+            for x in values:
+                self.assertEquals(x % n, sf.reduce(x))
+
+    def test_scalars(self):
+        sf = field.ScalarField(self.L)
+        digest = hashlib.sha512('abc').digest()
+
+        self.assertEquals(util.le2int(digest) % self.L, sf.from_le(digest))
+        self.assertEquals(util.be2int(digest) % self.L, sf.from_be(digest))
+        self.assertEquals(1, sf.mul(sf.mul_inv(12345), 12345))
+        self.assertEquals([sf.mul_inv(v) for v in (2, 3, 5)], sf.inv_batch([2, 3, 5]))
+
+    def test_clamp(self):
+        sf = field.ScalarField(self.L)
+        # Bits 3 to 254
+        self.assertEquals(2**255 - 8, sf.clamp('\xff' * 32, 3, 254))
+        self.assertEquals(2**254, sf.clamp('\0' * 32, 3, 254))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import asymmetric
+import eddsa
+import keystore
+
+
+class KeyStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'keys')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_ed25519(self):
+        keys = [eddsa.SigningKey('seed %d' % i) for i in range(40)]
+
+        store = keystore.KeyStore(self.path, 'ed25519', cache_size=4)
+        ids = store.append([k.pk for k in keys[:5]])
+        ids += store.append([k.pk for k in keys[5:]])
+        self.assertEquals(40, len(store))
+
+        for i in [0, 39, 17, 0]:
+            vk = store[ids[i]]
+            self.assertEquals(keys[i].pk, vk.pk)
+            vk.verify(keys[i].sign('abc'), 'abc')
+
+        self.assertTrue(store[ids[0]] is store[ids[0]])
+        for i in range(10):
+            store[ids[i]]
+        self.assertEquals(4, len(store._cache))
+        self.assertRaises(KeyError, lambda: store['x' * 16])
+        self.assertEquals(None, store.get('x' * 16))
+        store.close()
+
+        # Reopened, and with the index rebuilt.
+        store = keystore.KeyStore(self.path)
+        self.assertEquals('ed25519', store.scheme)
+        self.assertEquals(keys[3].pk, store[ids[3]].pk)
+        store.close()
+
+        os.unlink(self.path + '.idx')
+        store = keystore.KeyStore(self.path)
+        self.assertEquals(range(40), [store.slot(kid) for kid in ids])
+        self.assertEquals(ids, list(store.ids()))
+        store.close()
+
+    def test_partial_slot(self):
+        store = keystore.KeyStore(self.path, 'curve25519')
+        ids = store.append(['\x01' * 32, '\x02' * 32])
+        store.close()
+
+        # An append that died half way through a slot.
+        with open(self.path, 'ab') as f:
+            f.write('x' * 20)
+
+        store = keystore.KeyStore(self.path)
+        self.assertEquals(2, len(store))
+        ids += store.append(['\x03' * 32])
+        self.assertEquals([1, 2, 3], [store[kid] & 0xff for kid in ids])
+        self.assertEquals(ids, list(store.ids()))
+        store.close()
+        self.assertEquals(keystore.HEADER.size + 3 * 48, os.path.getsize(self.path))
+
+    def test_broken_index(self):
+        store = keystore.KeyStore(self.path, 'curve25519')
+        ids = store.append(['\x01' * 32, '\x02' * 32])
+        store.close()
+
+        for contents in ['', 'ECKI\x01\x00', 'garbage' * 10]:
+            with open(self.path + '.idx', 'wb') as f:
+                f.write(contents)
+            store = keystore.KeyStore(self.path)
+            self.assertEquals([0, 1], [store.slot(kid) for kid in ids])
+            store.close()
+
+    def test_validated_on_access(self):
+        store = keystore.KeyStore(self.path, 'nistp256')
+        obj = asymmetric.ECC_NISTP256()
+        pub = obj.generate_key_pair(None)[0]
+
+        good, bad = store.append([obj.canonical_binary_form_public(pub, True),
+                                  '\x02' + '\x00' * 31 + '\x01'])
+
+        self.assertEquals(pub, store[good])
+        self.assertRaises(ValueError, lambda: store[bad])
+        store.close()
+
+    def test_append_errors(self):
+        store = keystore.KeyStore(self.path, 'curve25519')
+        ids = store.append(['\x09' + '\x00' * 31], ['a' * 16])
+        self.assertEquals(9, store[ids[0]])
+
+        self.assertRaises(ValueError, store.append, ['\x00' * 31])
+        self.assertRaises(ValueError, store.append, ['\x00' * 32], ['a' * 16])
+        self.assertRaises(ValueError, store.append, ['\x00' * 32] * 2)
+        self.assertEquals(1, len(store))
+        store.close()
+
+        self.assertRaises(ValueError, keystore.KeyStore, self.path, 'ed25519')
+        self.assertRaises(ValueError, keystore.KeyStore, os.path.join(self.dir, 'new'))
+
+
+class Ed25519EncodingTest(unittest.TestCase):
+    def test_roundtrip(self):
+        obj = asymmetric.ECC_Ed25519()
+        ed = eddsa.Ed25519()
+        pk = ed.publickey('seed')
+
+        P = obj.binary_to_public(pk)
+        self.assertEquals(ed.decodepoint(pk), P)
+        self.assertEquals(pk, obj.canonical_binary_form_public(P))
+
+        self.assertRaises(ValueError, obj.binary_to_public, pk[:-1])
+        self.assertRaises(ValueError, obj.binary_to_public, '\x02' + '\x00' * 31)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+
+import asymmetric
+import ecdh
+import ecdsa
+import eddsa
+import keystore
+import metrics
+
+
+class HistogramTest(unittest.TestCase):
+    def test_buckets(self):
+        for value in range(0, 5000) + [2**30 + 12345, 2**40 - 1]:
+            low, high = metrics.bucket_bounds(metrics.bucket_index(value))
+            self.assertTrue(low <= value < high)
+            # 16 buckets per power of two
+            self.assertTrue(high - low <= max(1, low / 16))
+
+        indexes = [metrics.bucket_index(v) for v in xrange(10000)]
+        self.assertEquals(sorted(indexes), indexes)
+        self.assertEquals(range(indexes[-1] + 1), sorted(set(indexes)))
+
+    def test_percentile(self):
+        h = metrics.Histogram()
+        for i in xrange(1, 101):
+            h.record(i * 1e-3)
+
+        self.assertEquals(100, h.count)
+        self.assertAlmostEquals(5.05, h.sum)
+        self.assertAlmostEquals(0.050, h.percentile(0.5), delta=0.004)
+        self.assertAlmostEquals(0.099, h.percentile(0.99), delta=0.007)
+
+        self.assertEquals([0, 100], h.cumulative([2**10, 2**30]))
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        metrics.enable()
+
+    def tearDown(self):
+        metrics.disable()
+        metrics.reset()
+
+    def test_disable_restores(self):
+        metrics.disable()
+        self.assertFalse(metrics.enabled())
+        self.assertEquals('_sign_hash', ecdsa._sign_hash.__name__)
+        self.assertTrue(ecdsa._sign_hash.func_globals is ecdsa.__dict__)
+        self.assertTrue(ecdh.ecdh.func_globals is ecdh.__dict__)
+        self.assertTrue(eddsa.Ed25519.__dict__['checkvalid'].func_globals is eddsa.__dict__)
+
+    def test_operations(self):
+        obj = asymmetric.ECC_NISTP256()
+        public, private = obj.generate_key_pair(None)
+        digest = '\x01' * 32
+        sig = ecdsa.ecdsa_sign_digest(obj, digest, private)
+        self.assertTrue(ecdsa.ecdsa_verify_digest(obj, public, digest, sig))
+        self.assertFalse(ecdsa.ecdsa_verify_digest(obj, public, '\x02' * 32, sig))
+
+        key = eddsa.SigningKey('seed')
+        s = key.sign('message')
+        key.verifying_key().verify(s, 'message')
+        self.assertRaises(Exception, key.verifying_key().verify, s, 'other')
+
+        ops, caches = metrics.snapshot()
+        self.assertEquals(1, ops[('keygen', 'nistp256')]['calls'])
+        self.assertEquals(1, ops[('ecdsa_sign', 'nistp256')]['calls'])
+        self.assertEquals(2, ops[('ecdsa_verify', 'nistp256')]['calls'])
+        self.assertEquals(1, ops[('ecdsa_verify', 'nistp256')]['errors'])
+        self.assertEquals(1, ops[('eddsa_sign', 'ed25519')]['calls'])
+        self.assertEquals(2, ops[('eddsa_verify', 'ed25519')]['calls'])
+        self.assertEquals(1, ops[('eddsa_verify', 'ed25519')]['errors'])
+        self.assertTrue(ops[('ecdsa_sign', 'nistp256')]['p50'] > 0)
+
+    def test_keystore_cache(self):
+        directory = tempfile.mkdtemp()
+        try:
+            store = keystore.KeyStore(os.path.join(directory, 'keys'), 'curve25519')
+            kid, = store.append(['\x09' + '\0' * 31])
+            store[kid]
+            store[kid]
+            store.close()
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEquals((1, 1), metrics.snapshot()[1]['keystore'])
+
+    def test_prometheus(self):
+        asymmetric.ECC_Curve25519().ecdh(2**254 + 8, asymmetric.ECC_Curve25519.base_point)
+        text = metrics.prometheus()
+
+        self.assertTrue('# TYPE ecc_operation_seconds histogram\n' in text)
+        self.assertTrue('ecc_operation_seconds_count{curve="curve25519",op="ecdh"} 1\n' in text)
+        self.assertTrue('ecc_operation_seconds_bucket{curve="curve25519",le="+Inf",op="ecdh"} 1\n' in text)
+        self.assertTrue('ecc_operation_errors_total{curve="curve25519",op="ecdh"} 0\n' in text)
+
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'ecc.prom')
+            metrics.dump(path)
+            with open(path) as f:
+                self.assertEquals(text, f.read())
+
+            server = metrics.serve(os.path.join(directory, 'sock'))
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(os.path.join(directory, 'sock'))
+                received = sock.makefile().read()
+                sock.close()
+            finally:
+                server.shutdown()
+                server.server_close()
+            self.assertEquals(text, received)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
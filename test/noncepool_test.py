@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import threading
+import time
+import unittest
+
+import asymmetric
+import ecdsa
+import metrics
+import noncepool
+
+
+class NoncePoolTest(unittest.TestCase):
+    def setUp(self):
+        self.obj = asymmetric.ECC_NISTP256()
+        self.public, self.private = self.obj.generate_key_pair(None)
+
+    def test_presign(self):
+        n = self.obj.order
+        for k, k_inv, r in ecdsa.ecdsa_presign(self.obj, 5):
+            self.assertEquals(1, k * k_inv % n)
+            self.assertEquals(self.obj.scalarmult_base(k)[0] % n, r)
+
+        # Same signature as signing with k directly.
+        triple = ecdsa.ecdsa_presign(self.obj)[0]
+        pool = noncepool.NoncePool(self.obj, size=1, batch=1)
+        pool.close()
+        pool.take = lambda: triple
+        digest = '\x42' * 32
+        self.assertEquals(ecdsa.ecdsa_sign_digest(self.obj, digest, self.private, triple[0]),
+                          ecdsa.ecdsa_sign_digest(self.obj, digest, self.private, pool=pool))
+
+    def test_sign(self):
+        with noncepool.NoncePool(self.obj, size=8, batch=4) as pool:
+            rs = set()
+            for i in xrange(20):
+                digest = chr(i) * 32
+                sig = ecdsa.ecdsa_sign_digest(self.obj, digest, self.private, pool=pool)
+                self.assertTrue(ecdsa.ecdsa_verify_digest(self.obj, self.public, digest, sig))
+                rs.add(sig[0])
+            # Every nonce once.
+            self.assertEquals(20, len(rs))
+
+            stats = pool.stats()
+            self.assertEquals(20, stats['taken'])
+            self.assertTrue(0 <= stats['depleted'] <= 20)
+            self.assertTrue(stats['available'] <= 8)
+
+        self.assertEquals(0, pool.available())
+        self.assertRaises(ValueError, ecdsa.ecdsa_sign_digest, self.obj, '\0' * 32,
+                          self.private, 1, pool)
+        self.assertRaises(ValueError, ecdsa.ecdsa_sign_digest, asymmetric.ECC_NISTP384(),
+                          '\0' * 48, self.private, None, pool)
+
+    def test_refill(self):
+        with noncepool.NoncePool(self.obj, size=4, batch=2) as pool:
+            deadline = time.time() + 30
+            while pool.available() < 4 and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEquals(4, pool.available())
+
+            for i in xrange(4):
+                pool.take()
+            stats = pool.stats()
+            self.assertEquals(0, stats['depleted'])
+            self.assertTrue(stats['produced'] >= 4)
+            self.assertTrue(stats['refill_rate'] > 0)
+
+    def test_fork(self):
+        with noncepool.NoncePool(self.obj, size=4, batch=2) as pool:
+            queue = pool._queue
+            # As if in a forked child.
+            pool._pid = -1
+            k, k_inv, r = pool.take()
+            self.assertFalse(pool._queue is queue)
+            self.assertTrue(pool._thread.is_alive())
+
+            # Many threads noticing the fork at once restart it once.
+            pool._pid = -1
+            queue = pool._queue
+            threads = [threading.Thread(target=pool.take) for i in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            self.assertFalse(pool._queue is queue)
+            self.assertEquals(8, pool.stats()['taken'])
+
+    def test_metrics(self):
+        metrics.reset()
+        metrics.enable()
+        try:
+            pool = noncepool.NoncePool(self.obj, size=2, batch=1)
+            pool.close()
+            pool.take()
+        finally:
+            metrics.disable()
+        self.assertEquals((0, 1), metrics.snapshot()[1]['noncepool'])
+        metrics.reset()
+
+
+if __name__ == '__main__':
+    unittest.main()
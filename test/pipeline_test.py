@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import hashlib
+import itertools
+import mmap
+import tempfile
+import unittest
+
+import asymmetric
+import blobs
+import ecdsa
+import eddsa
+import executor
+import pipeline
+
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        key = eddsa.SigningKey('seed')
+        self.records = [(key.pk, 'message %d' % i, key.sign('message %d' % i)) for i in range(20)]
+        self.records[7] = (key.pk, 'tampered', self.records[7][2])
+        self.expected = [(i, i != 7) for i in range(20)]
+
+    def test_lines(self):
+        data = ''.join(pipeline.encode_line_record(*r) for r in self.records)
+        data = data.replace('\n', '\r\n', 1) + '\n\nnot hex\n'
+
+        results = list(pipeline.verify(pipeline.line_records(pipeline.read_chunks(data, 7))))
+        self.assertEquals(self.expected + [(20, False)], results)
+
+    def test_lines_pieces(self):
+        chunks = ['ab', 'c', '\r\nd', 'e\n\nf', '', 'g']
+        self.assertEquals(['abc', 'de', '', 'fg'], list(pipeline.lines(chunks)))
+        self.assertEquals(['abc', 'de', '', 'fg'],
+                          list(pipeline.lines(pipeline.read_chunks(''.join(chunks), 1))))
+
+        # CRLF, and no newline at the end.
+        self.assertEquals(['ab', 'cd'], list(pipeline.lines(['ab\r\nc', 'd\r'])))
+        self.assertEquals(['ab', 'cd'], list(pipeline.lines(['ab\r\ncd', '\r'])))
+
+        self.assertEquals(['abcd', 'ef'], list(pipeline.lines(['ab', 'cd\nef'], max_line=4)))
+        self.assertRaises(ValueError, list, pipeline.lines(['ab', 'cd', 'e\n'], max_line=4))
+        self.assertRaises(ValueError, list, pipeline.lines(['abcde\n'], max_line=4))
+        # Without a newline it stops at the limit, not at the end.
+        endless = itertools.repeat('x' * 1000)
+        self.assertRaises(ValueError, list, pipeline.lines(endless, max_line=10**5))
+
+    def test_bytearray(self):
+        data = bytearray(''.join(pipeline.encode_binary_record(*r) for r in self.records))
+        chunks = list(pipeline.read_chunks(data, 1000))
+        self.assertTrue(all(type(c) is str for c in chunks))
+        self.assertEquals(self.expected, list(pipeline.verify(pipeline.binary_records(chunks))))
+
+    def test_binary_file_and_mmap(self):
+        f = tempfile.TemporaryFile()
+        for r in self.records:
+            f.write(pipeline.encode_binary_record(*r))
+        f.flush()
+        f.seek(0)
+
+        self.assertEquals(self.expected, list(pipeline.verify(
+            pipeline.binary_records(pipeline.read_chunks(f, 100)))))
+
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.assertEquals(self.expected, list(pipeline.verify(
+            pipeline.binary_records(pipeline.read_chunks(m, 1)))))
+
+    def test_binary_errors(self):
+        data = pipeline.encode_binary_record(*self.records[0])
+
+        self.assertRaises(ValueError, list, pipeline.binary_records([data[:-1]]))
+        self.assertRaises(ValueError, list, pipeline.binary_records([data + data[:4]]))
+        self.assertRaises(ValueError, list, pipeline.binary_records([data], max_field=32))
+
+    def test_lazy(self):
+        def endless():
+            for r in itertools.cycle(self.records):
+                yield pipeline.encode_binary_record(*r)
+
+        results = pipeline.verify(pipeline.binary_records(endless()),
+                                  executor_obj=executor.InlineExecutor(8))
+        self.assertEquals([(i, i % 20 != 7) for i in range(40)],
+                          list(itertools.islice(results, 40)))
+
+    def test_ecdsa(self):
+        obj = asymmetric.ECC_NISTP256()
+        pub, priv = obj.generate_key_pair(None)
+        pk = obj.canonical_binary_form_public(pub, compressed=True)
+
+        records = []
+        for m in ['a', 'b', 'c']:
+            sig = ecdsa.ecdsa_sign_digest(obj, hashlib.sha256(m).digest(), priv)
+            records.append((pk, m, blobs.x963.encode_der_dsa_sig(sig)))
+        records.append((pk, 'x', records[0][2]))
+        records.append(('\x05', 'a', records[0][2]))
+        records.append((pk, 'a', 'not der'))
+
+        data = ''.join(pipeline.encode_line_record(*r) for r in records)
+        results = pipeline.verify(pipeline.line_records([data]), 'ecdsa', curve_obj=obj)
+
+        self.assertEquals([True, True, True, False, False, False], [ok for i, ok in results])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import os
+import subprocess
+import sys
+import unittest
+
+import asymmetric
+import eddsa
+import registry
+
+
+class RegistryTest(unittest.TestCase):
+    def test_built_once(self):
+        calls = []
+        registry.register('test.thing', lambda: calls.append(1) or object())
+
+        self.assertFalse('test.thing' in registry.built())
+        thing = registry.get('test.thing')
+        self.assertTrue(thing is registry.get('test.thing'))
+        self.assertEquals([1], calls)
+        self.assertTrue('test.thing' in registry.built())
+
+    def test_lazy(self):
+        registry.register('test.value', lambda: 42)
+
+        class Foo(object):
+            value = registry.Lazy('test.value')
+
+        self.assertEquals(42, Foo.value)
+        self.assertEquals(42, Foo().value)
+
+    def test_curves_shared(self):
+        self.assertTrue(asymmetric.ECC_Ed25519.curve is eddsa.Ed25519().curve)
+        self.assertTrue(eddsa.Ed25519().base_table() is eddsa.Ed25519().base_table())
+
+    def test_nothing_built_on_import(self):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+        out = subprocess.check_output(
+            [sys.executable, '-c', 'import asymmetric, eddsa, registry; print registry.built()'],
+            cwd=path)
+
+        self.assertEquals('[]', out.strip())
+
+    def test_no_multiprocessing_on_import(self):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+        out = subprocess.check_output(
+            [sys.executable, '-c',
+             'import sys, asymmetric, eddsa, ecdsa; print "multiprocessing" in sys.modules'],
+            cwd=path)
+
+        self.assertEquals('False', out.strip())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import asymmetric
+import blobs
+import ecdsa
+import eddsa
+import service
+
+
+class FutureTest(unittest.TestCase):
+    def test_future(self):
+        f = service.Future()
+        seen = []
+        f.add_done_callback(seen.append)
+
+        self.assertFalse(f.done())
+        self.assertRaises(RuntimeError, f.result, 0.001)
+
+        f.set_result(42)
+        self.assertTrue(f.done())
+        self.assertEquals(42, f.result())
+        self.assertEquals([f], seen)
+
+        f.add_done_callback(seen.append)
+        self.assertEquals([f, f], seen)
+
+        f = service.Future()
+        f.set_exception(ValueError('x'))
+        self.assertRaises(ValueError, f.result)
+
+
+class BatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.key = eddsa.SigningKey('seed')
+
+    def test_flush_on_size(self):
+        batcher = service.Batcher(max_batch=4, max_delay=10)
+
+        futures = [batcher.verify_ed25519(self.key.pk, m, self.key.sign(m)) for m in 'abcd']
+        self.assertEquals([True] * 4, [f.result(5) for f in futures])
+
+        m = batcher.metrics()
+        self.assertEquals(1, m['batches'])
+        self.assertEquals(1, m['flush_size'])
+        self.assertEquals(4.0, m['mean_batch_size'])
+        batcher.close()
+
+    def test_flush_on_deadline(self):
+        batcher = service.Batcher(max_batch=100, max_delay=0.01)
+
+        sig = self.key.sign('a')
+        self.assertTrue(batcher.verify_ed25519(self.key.pk, 'a', sig).result(5))
+        self.assertFalse(batcher.verify_ed25519(self.key.pk, 'b', sig).result(5))
+        self.assertEquals(self.key.sign('c'), batcher.sign_ed25519('seed', 'c').result(5))
+
+        m = batcher.metrics()
+        self.assertEquals(3, m['flush_deadline'])
+        self.assertEquals(3, m['completed'])
+        self.assertEquals(0, m['queue_depth'])
+        batcher.close()
+
+    def test_mixed_batch(self):
+        obj = asymmetric.ECC_NISTP256()
+        pub, priv = obj.generate_key_pair(None)
+        sig = ecdsa.ecdsa_sign_digest(obj, __import__('hashlib').sha256('m').digest(), priv)
+
+        batcher = service.Batcher(max_batch=3, max_delay=10)
+        futures = [batcher.verify_ecdsa(obj, pub, 'm', sig),
+                   batcher.verify_ed25519(self.key.pk, 'a', self.key.sign('a')),
+                   batcher.verify_ecdsa(asymmetric.ECC_NISTP256(), pub, 'x', sig)]
+
+        self.assertEquals([True, True, False], [f.result(5) for f in futures])
+        batcher.close()
+
+    def test_bad_request_isolated(self):
+        batcher = service.Batcher(max_batch=4, max_delay=10)
+
+        futures = [batcher.sign_ed25519('seed', m) for m in ['a', None, 'c', 'd']]
+        self.assertEquals(self.key.sign('a'), futures[0].result(5))
+        self.assertRaises(TypeError, futures[1].result, 5)
+        self.assertEquals([self.key.sign(m) for m in 'cd'], [f.result(5) for f in futures[2:]])
+
+        sig = self.key.sign('a')
+        futures = [batcher.verify_ed25519(self.key.pk, 'a', sig),
+                   batcher.verify_ed25519(self.key.pk, 'a', sig[:10]),
+                   batcher.verify_ed25519('short', 'a', sig),
+                   batcher.verify_ed25519(self.key.pk, 'a', sig)]
+        self.assertEquals([True, False, False, True], [f.result(5) for f in futures])
+
+        m = batcher.metrics()
+        self.assertEquals(2, m['batches'])
+        self.assertEquals(7, m['completed'])
+        self.assertEquals(1, m['failed'])
+        batcher.close()
+
+
+class UnixServerTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'sock')
+        self.server = service.UnixServer(self.path, service.Batcher(max_delay=0.01))
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.server.batcher.close()
+        shutil.rmtree(self.dir)
+
+    def test_requests(self):
+        client = service.Client(self.path)
+        key = eddsa.SigningKey('seed')
+
+        sig = client.call(op='sign_ed25519', sk='seed'.encode('hex'), msg='abc'.encode('hex'))['sig']
+        self.assertEquals(key.sign('abc').encode('hex'), sig)
+
+        self.assertEquals({'ok': True}, client.call(
+            op='verify_ed25519', pk=key.pk.encode('hex'), msg='abc'.encode('hex'), sig=sig))
+        self.assertEquals({'ok': False}, client.call(
+            op='verify_ed25519', pk=key.pk.encode('hex'), msg='abd'.encode('hex'), sig=sig))
+
+        obj = asymmetric.ECC_NISTP256()
+        pub, priv = obj.generate_key_pair(None)
+        der = blobs.x963.encode_der_dsa_sig(
+            ecdsa.ecdsa_sign_digest(obj, __import__('hashlib').sha256('m').digest(), priv))
+        self.assertEquals({'ok': True}, client.call(
+            op='verify_ecdsa', curve='nistp256', public=obj.canonical_binary_form_public(pub).encode('hex'),
+            msg='m'.encode('hex'), sig=der.encode('hex')))
+        self.assertEquals({'ok': False}, client.call(
+            op='verify_ecdsa', curve='nistp256', public='04'.encode('hex'),
+            msg='m'.encode('hex'), sig=der.encode('hex')))
+
+        self.assertEquals(4, client.call(op='metrics')['completed'])
+        self.assertRaises(ValueError, client.call, op='nope')
+        client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
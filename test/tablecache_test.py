@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import asymmetric
+import curve
+import eddsa
+import tablecache
+
+
+class TableCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.old = os.environ.get('ECC_TABLE_CACHE')
+        os.environ['ECC_TABLE_CACHE'] = self.dir
+
+        self.ed = eddsa.Ed25519()
+        self.calls = []
+
+    def tearDown(self):
+        if self.old is None:
+            del os.environ['ECC_TABLE_CACHE']
+        else:
+            os.environ['ECC_TABLE_CACHE'] = self.old
+        shutil.rmtree(self.dir)
+
+    def table(self, P=None, name='test'):
+        P = P or self.ed.bp
+
+        def build():
+            self.calls.append(1)
+            return [Q[:2] for Q in curve.precompute_extended(P, 16, self.ed.curve)]
+
+        return tablecache.cached_table(name, self.ed.curve, P, 16, build,
+                                       self.ed.curve.affine_to_extended)
+
+    def test_roundtrip(self):
+        expected = curve.precompute_extended(self.ed.bp, 16, self.ed.curve)
+
+        self.assertEquals(expected, list(self.table()))
+        self.assertEquals(expected, list(self.table()))
+        self.assertEquals(1, len(self.calls))
+        self.assertTrue(isinstance(self.table(), tablecache.TableView))
+
+        t = self.table()
+        self.assertEquals(16, len(t))
+        self.assertEquals(expected[-1], t[-1])
+        self.assertRaises(IndexError, lambda: t[16])
+
+    def test_rebuilt_when_corrupt(self):
+        expected = list(self.table())
+        path = os.path.join(self.dir, 'test.tbl')
+
+        with open(path, 'r+b') as f:
+            f.seek(100)
+            c = f.read(1)
+            f.seek(100)
+            f.write(chr(ord(c) ^ 1))
+
+        self.assertEquals(expected, list(self.table()))
+        self.assertEquals(2, len(self.calls))
+
+        open(path, 'wb').close()
+        self.assertEquals(expected, list(self.table()))
+        self.assertEquals(3, len(self.calls))
+
+    def test_rejected_file_closed(self):
+        self.table()
+        path = os.path.join(self.dir, 'test.tbl')
+        with open(path, 'r+b') as f:
+            f.write('XXXX')
+
+        maps = []
+        mmap = tablecache.mmap.mmap
+
+        def record(*args, **kwargs):
+            maps.append(mmap(*args, **kwargs))
+            return maps[-1]
+
+        tablecache.mmap.mmap = record
+        try:
+            self.table()
+        finally:
+            tablecache.mmap.mmap = mmap
+
+        self.assertEquals(2, len(self.calls))
+        # The rejected map, and the one of the rebuilt file.
+        self.assertEquals(2, len(maps))
+        self.assertRaises(ValueError, len, maps[0])
+        self.assertTrue(len(maps[1]) > 0)
+
+    def test_rebuilt_when_params_change(self):
+        self.table()
+        P = self.ed.scalarmult(2, self.ed.bp)
+
+        self.assertEquals(curve.precompute_extended(P, 16, self.ed.curve), list(self.table(P)))
+        self.assertEquals(2, len(self.calls))
+
+    def test_base_tables(self):
+        ed = eddsa.Ed25519()
+        table = ed.build_base_table()
+        self.assertTrue(isinstance(table, tablecache.TableView))
+        self.assertEquals(ed.precompute(ed.bp), list(table))
+
+        obj = asymmetric.ECC_NISTP256()
+        table = obj.build_base_table()
+        self.assertTrue(isinstance(table, tablecache.TableView))
+        self.assertEquals(obj.scalarmult(12345, obj.base_point),
+                          obj.curve.projective_to_affine(curve.mul_precomputed(
+                              12345, table, obj.curve.neutral_point_projective(),
+                              obj.curve.add_points_complete)))
+
+        self.assertEquals(2, len(os.listdir(self.dir)))
+
+    def test_file_replaced(self):
+        # As if another process replaced the file between save and load.
+        load = tablecache.load
+        tablecache.load = lambda path, fp, convert: None
+        try:
+            table = self.table()
+        finally:
+            tablecache.load = load
+
+        self.assertEquals(curve.precompute_extended(self.ed.bp, 16, self.ed.curve), list(table))
+
+    def test_public_key_tables(self):
+        key = eddsa.SigningKey('hot key')
+        sig = key.sign('abc')
+
+        vk = eddsa.VerifyingKey(key.pk, cached=True)
+        self.assertTrue(isinstance(vk.table, tablecache.TableView))
+        vk.verify(sig, 'abc')
+        self.assertEquals(key.verifying_key().table, list(vk.table))
+
+        names = os.listdir(self.dir)
+        self.assertTrue(any(name.startswith('ed25519.key.') for name in names))
+
+        eddsa.VerifyingKey(key.pk, cached=True).verify(sig, 'abc')
+        self.assertEquals(names, os.listdir(self.dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 # Copyright (C) 2015 Björn Edström <be@bjrn.se>
 
+import hashlib
+import io
+import os
 import unittest
 
 import util
@@ -56,6 +59,61 @@ class UtilTest(unittest.TestCase):
             r = util.randint(1, 6)
             self.assertTrue(r in [1, 2, 3, 4, 5, 6])
 
+    def test_random_pool(self):
+        pool = util.RandomPool(bufsize=64)
+
+        self.assertEquals(10, len(pool.bytes(10)))
+        self.assertEquals(100, len(pool.bytes(100)))
+        self.assertNotEquals(pool.bytes(16), pool.bytes(16))
+
+        seen = set(pool.randint(1, 6) for i in xrange(1000))
+        self.assertEquals(set([1, 2, 3, 4, 5, 6]), seen)
+
+        self.assertEquals([5, 5], pool.scalars(2, 6, 5))
+        self.assertRaises(ValueError, pool.scalars, 1, 1)
+
+        order = 2**252 + 27742317777372353535851937790883648493
+        keys = pool.scalars(500, order)
+        self.assertEquals(500, len(keys))
+        self.assertEquals(500, len(set(keys)))
+        self.assertTrue(all(1 <= k < order for k in keys))
+
+        # Rejection sampling: with 2^k + 1 values about half are
+        # rejected, but the result is still uniform.
+        counts = [0] * 5
+        for v in pool.scalars(5000, 5, 0):
+            counts[v] += 1
+        self.assertTrue(min(counts) > 800)
+
+    def test_random_pool_fork(self):
+        pool = util.RandomPool()
+        pool.bytes(1)
+
+        r, w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(r)
+            os.write(w, pool.bytes(32))
+            os._exit(0)
+
+        os.close(w)
+        child = os.read(r, 32)
+        os.close(r)
+        os.waitpid(pid, 0)
+
+        self.assertEquals(32, len(child))
+        self.assertNotEquals(pool.bytes(32), child)
+
+    def test_hash_stream(self):
+        data = ''.join(chr(i % 256) for i in xrange(10000))
+        expected = hashlib.sha256(data).hexdigest()
+
+        for source in [data, bytearray(data), io.BytesIO(data),
+                       iter([data[:10], data[10:9000], data[9000:]])]:
+            self.assertEquals(expected, util.hash_stream(hashlib.sha256(), source, 1000).hexdigest())
+
+        self.assertEquals(hashlib.sha256('').hexdigest(), util.hash_stream(hashlib.sha256(), []).hexdigest())
+
 
 if __name__ == '__main__':
     unittest.main()
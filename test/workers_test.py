@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+import pickle
+import unittest
+
+import asymmetric
+import eddsa
+import registry
+import tablecache
+import workers
+
+
+def _check(args):
+    sig, m, pk = args
+
+    table = registry.get('ed25519.base_table')
+    try:
+        eddsa.VerifyingKey(pk).verify(sig, m)
+        ok = True
+    except Exception:
+        ok = False
+
+    return ok, isinstance(table, tablecache.TableView), type(table.buf).__name__
+
+
+class WorkersTest(unittest.TestCase):
+    def test_pool(self):
+        key = eddsa.SigningKey('seed')
+        items = [(key.sign(m), m, key.pk) for m in ['a', 'b', 'c', 'd']]
+        items.append((items[0][0], 'x', key.pk))
+
+        p = workers.pool(2, ['ed25519.base_table', 'ed25519'])
+        try:
+            results = p.map(_check, items)
+        finally:
+            p.close()
+            p.join()
+
+        self.assertEquals([True] * 4 + [False], [r[0] for r in results])
+        for ok, is_view, buf_type in results:
+            self.assertTrue(is_view)
+            self.assertEquals('c_char_Array_%d' % len(registry.get('ed25519.base_table').buf),
+                              buf_type)
+
+    def test_shared_table(self):
+        table = registry.get('nistp256.base_table')
+        view = workers.SharedTable(table).view()
+
+        self.assertEquals(list(table), list(view))
+
+    def test_pickle(self):
+        ed = eddsa.Ed25519()
+        monty, to_monty, from_monty = ed.curve.to_montgomery()
+        to_monty, from_monty = pickle.loads(pickle.dumps((to_monty, from_monty)))
+
+        P = ed.scalarmult(7, ed.bp)
+        self.assertEquals(P, from_monty(to_monty(P)))
+
+        weiss, to_weiss, from_weiss = pickle.loads(pickle.dumps(monty.to_short_weierstrass()))
+        Q = to_monty(P)
+        self.assertEquals(Q, from_weiss(to_weiss(Q)))
+
+        for c in [ed.curve, asymmetric.ECC_NISTP256.curve, asymmetric.ECC_Curve41417.curve]:
+            self.assertEquals(tablecache.fingerprint(c, None, 0),
+                              tablecache.fingerprint(pickle.loads(pickle.dumps(c)), None, 0))
+
+        ed2 = pickle.loads(pickle.dumps(ed))
+        self.assertEquals(ed.publickey('x'), ed2.publickey('x'))
+
+
+if __name__ == '__main__':
+    unittest.main()
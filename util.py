@@ -1,61 +1,131 @@
 # -*- coding: utf-8 -*-
 # Copyright (C) 2015 Björn Edström <be@bjrn.se>
 
-import random
+import binascii
+import mmap
+import os
+import threading
 
 
 def le2int(buf):
     """little endian buffer to integer."""
-    integer = 0
-    shift = 0
-    for byte in buf:
-        integer |= ord(byte) << shift
-        shift += 8
-    return integer
+    if not len(buf):
+        return 0
+    return int(binascii.hexlify(buf[::-1]), 16)
 
 
 def be2int(buf):
     """big endian buffer to integer."""
-    integer = 0
-    for byte in buf:
-        integer <<= 8
-        integer |= ord(byte)
-    return integer
+    if not len(buf):
+        return 0
+    return int(binascii.hexlify(buf), 16)
 
 
 def int2le(integer, pad):
     """integer to little endian buffer."""
-    buf = []
-    while integer:
-        buf.append(chr(integer & 0xff))
-        integer >>= 8
-        pad -= 1
-    if pad < 0:
-        raise ValueError('data too long to pad further')
-    while pad > 0:
-        buf.append('\x00')
-        pad -= 1
-    return ''.join(buf)
+    return int2be(integer, pad)[::-1]
 
 
 def int2be(integer, pad):
     """integer to big endian buffer."""
-    buf = []
-    while integer:
-        buf.insert(0, chr(integer & 0xff))
-        integer >>= 8
-        pad -= 1
-    if pad < 0:
+    if integer >> (8 * pad):
         raise ValueError('data too long to pad further')
-    while pad > 0:
-        buf.insert(0, '\x00')
-        pad -= 1
-    return ''.join(buf)
+    if pad == 0:
+        return ''
+    return binascii.unhexlify('%0*x' % (2 * pad, integer))
+
+
+class RandomPool(object):
+    """Random numbers from os.urandom, read bufsize bytes at a time so
+    there isn't a system call per scalar.
+
+    Integers in a range are made by rejection sampling: take just
+    enough random bits and try again if the value is out of range, so
+    there is no modulo bias.
+
+    The buffer is thrown away if the process id changes, so a forked
+    child never reuses bytes its parent also has.
+    """
+
+    def __init__(self, bufsize=4096):
+        self.bufsize = bufsize
+        self._lock = threading.Lock()
+        self._buf = ''
+        self._pos = 0
+        self._pid = os.getpid()
+
+    def bytes(self, n):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._buf, self._pos = '', 0
+                self._pid = os.getpid()
+
+            if len(self._buf) - self._pos < n:
+                self._buf = self._buf[self._pos:] + os.urandom(max(self.bufsize, n))
+                self._pos = 0
+
+            data = self._buf[self._pos:self._pos + n]
+            self._pos += n
+            return data
+
+    def below(self, n):
+        """Uniform in [0, n)."""
+
+        return self.scalars(1, n, 0)[0]
+
+    def randint(self, a, b):
+        """Uniform in [a, b]."""
+
+        return a + self.below(b - a + 1)
+
+    def scalars(self, count, order, low=1):
+        """count integers uniform in [low, order), for example private
+        keys or nonces mod the group order. The random bytes for all of
+        them are read at once."""
+
+        size = order - low
+        if size <= 0:
+            raise ValueError('empty range')
+        if size == 1:
+            return [low] * count
+
+        bits = count_bits(size - 1)
+        nbytes = (bits + 7) // 8
+        mask = (1 << bits) - 1
+
+        result = []
+        while len(result) < count:
+            # Most tries succeed (at least half), so ask for a bit more
+            # than what is missing.
+            need = count - len(result)
+            data = self.bytes(nbytes * (need + need // 4 + 1))
+            for offset in xrange(0, len(data), nbytes):
+                v = be2int(data[offset:offset + nbytes]) & mask
+                if v < size:
+                    result.append(low + v)
+                    if len(result) == count:
+                        break
+
+        return result
+
+
+_pool = RandomPool()
+
+
+def random_bytes(n):
+    return _pool.bytes(n)
 
 
 def randint(a, b):
-    # XXX: This is not cryptographically secure.
-    return random.randint(a, b)
+    """Uniform in [a, b], from os.urandom."""
+
+    return _pool.randint(a, b)
+
+
+def scalars(count, order):
+    """count integers uniform in [1, order)."""
+
+    return _pool.scalars(count, order)
 
 
 def count_bits(n):
@@ -64,3 +134,39 @@ def count_bits(n):
         n >>= 1
         cnt += 1
     return cnt
+
+
+def hash_stream(h, source, bufsize=2**16):
+    """Feed everything in source to the hash object h, bufsize bytes at
+    a time, and return h.
+
+    source can be a string, bytearray or mmap (hashed in place), a
+    file object (read with readinto into a single reused buffer) or
+    any iterable of string chunks.
+    """
+
+    if isinstance(source, (str, bytearray, buffer, mmap.mmap)):
+        for offset in xrange(0, len(source), bufsize):
+            h.update(buffer(source, offset, bufsize))
+
+    elif hasattr(source, 'readinto'):
+        buf = bytearray(bufsize)
+        view = memoryview(buf)
+        while True:
+            n = source.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+
+    elif hasattr(source, 'read'):
+        while True:
+            chunk = source.read(bufsize)
+            if not chunk:
+                break
+            h.update(chunk)
+
+    else:
+        for chunk in source:
+            h.update(chunk)
+
+    return h
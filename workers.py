@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Copyright (C) 2015 Björn Edström <be@bjrn.se>
+
+"""Process pools sharing precomputed tables.
+
+The tables are built once in the parent process and copied into
+shared memory. The layout is the tablecache file format, so every
+coordinate takes exactly width bytes. Each worker wraps the shared
+memory in a TableView and puts it in its registry, so nothing is
+copied or rebuilt in the workers.
+
+    pool = workers.pool(4, ['ed25519.base_table'])
+    pool.map(verify, items)
+
+XXX: Python 2 has no multiprocessing.shared_memory, so this uses a
+sharedctypes.RawArray. That only reaches processes started by
+multiprocessing itself (as arguments), not arbitrary ones.
+"""
+
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+
+import registry
+import tablecache
+
+
+class SharedTable(object):
+    """A table file in shared memory."""
+
+    def __init__(self, table):
+        data = buffer(table.buf)[:]
+
+        self.array = RawArray('c', len(data))
+        self.array.raw = data
+        self.convert = table.convert
+
+    def view(self):
+        table = tablecache.from_buffer(self.array, self.convert)
+        if table is None:
+            raise ValueError('corrupt shared table')
+        return table
+
+
+def share(names):
+    """Builds the registry entries names in this process. The result is
+    for attach() in a worker.
+
+    Tables go into shared memory, anything else (curves etc) is passed
+    as is and must be picklable.
+    """
+
+    shared = []
+    for name in names:
+        value = registry.get(name)
+        if isinstance(value, tablecache.TableView):
+            value = SharedTable(value)
+        shared.append((name, value))
+
+    return shared
+
+
+def attach(shared):
+    """Puts everything from share() in the registry of this process."""
+
+    for name, value in shared:
+        if isinstance(value, SharedTable):
+            value = value.view()
+        registry.put(name, value)
+
+
+def _init_worker(shared, initializer, initargs):
+    attach(shared)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def pool(processes=None, names=(), initializer=None, initargs=()):
+    """A multiprocessing.Pool where every worker has the registry
+    entries names from this process."""
+
+    return multiprocessing.Pool(processes, _init_worker,
+                                (share(names), initializer, initargs))